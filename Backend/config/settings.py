@@ -143,6 +143,149 @@ CORS_ALLOW_ALL_ORIGINS = True
 ML_MODELS_DIR = BASE_DIR / "ml_models"
 ML_MODELS_DIR.mkdir(exist_ok=True)
 
+# Rows (forecasts + details) written per bulk_create transaction during generation
+FORECAST_PERSIST_BATCH_SIZE = int(os.environ.get("FORECAST_PERSIST_BATCH_SIZE", 5000))
+
+# Per-day forecast paths: "rows" (one ForecastDetail per day) or "packed"
+# (float32 arrays on the Forecast; convert old rows with convert_forecast_details)
+FORECAST_DETAIL_STORAGE = os.environ.get("FORECAST_DETAIL_STORAGE", "rows")
+
+# Rolling-origin backtest run on every generation to fill mae / rmse / mape / accuracy:
+# FOLDS origins, each scored on the following HORIZON days. Runs served from the
+# incremental state (FORECAST_INCREMENTAL_STATE) skip it to avoid a history scan.
+FORECAST_BACKTEST_ENABLED = os.environ.get("FORECAST_BACKTEST_ENABLED", "True") == "True"
+FORECAST_BACKTEST_FOLDS = int(os.environ.get("FORECAST_BACKTEST_FOLDS", 3))
+FORECAST_BACKTEST_HORIZON = int(os.environ.get("FORECAST_BACKTEST_HORIZON", 14))
+
+# Ensemble combination: "mean" (equal weights) or "weighted" (member weights learned per
+# product or category from holdout error, divided by 1 + COST_PENALTY * fit seconds;
+# members under MIN_WEIGHT are no longer fitted until the next recalibration)
+FORECAST_ENSEMBLE_MODE = os.environ.get("FORECAST_ENSEMBLE_MODE", "mean")
+FORECAST_ENSEMBLE_WEIGHT_SCOPE = os.environ.get("FORECAST_ENSEMBLE_WEIGHT_SCOPE", "product")
+FORECAST_ENSEMBLE_MIN_WEIGHT = float(os.environ.get("FORECAST_ENSEMBLE_MIN_WEIGHT", 0.05))
+FORECAST_ENSEMBLE_COST_PENALTY = float(os.environ.get("FORECAST_ENSEMBLE_COST_PENALTY", 0))
+FORECAST_ENSEMBLE_RECALIBRATE_DAYS = int(os.environ.get("FORECAST_ENSEMBLE_RECALIBRATE_DAYS", 7))
+
+# Empirical prediction intervals and lead-time demand quantiles from one-step residuals:
+# INTERVAL is the central coverage of the per-day bounds, QUANTILE_LEVELS the lead-time
+# quantiles stored on each forecast (comma-separated). Runs served from the incremental
+# state keep fixed-multiplier bounds, since residuals would need a history scan.
+FORECAST_QUANTILES_ENABLED = os.environ.get("FORECAST_QUANTILES_ENABLED", "True") == "True"
+FORECAST_INTERVAL = float(os.environ.get("FORECAST_INTERVAL", 0.8))
+FORECAST_QUANTILE_LEVELS = tuple(
+    float(q) for q in os.environ.get("FORECAST_QUANTILE_LEVELS", "0.5,0.8,0.9,0.95,0.98,0.99").split(","))
+
+# Probability of covering lead-time demand that optimize sizes safety stock for
+INVENTORY_SERVICE_LEVEL = float(os.environ.get("INVENTORY_SERVICE_LEVEL", 0.95))
+
+# Hierarchical reconciliation across Product.category: none, bottom_up, top_down
+# or mint. SKUs with fewer history records than FORECAST_TOP_DOWN_MAX_RECORDS
+# skip per-SKU fits and get a share (over the last FORECAST_TOP_DOWN_SHARE_DAYS
+# days) of their category forecast.
+FORECAST_RECONCILIATION = os.environ.get("FORECAST_RECONCILIATION", "none")
+FORECAST_TOP_DOWN_MAX_RECORDS = int(os.environ.get("FORECAST_TOP_DOWN_MAX_RECORDS", 0))
+FORECAST_TOP_DOWN_SHARE_DAYS = int(os.environ.get("FORECAST_TOP_DOWN_SHARE_DAYS", 90))
+
+# ADI / CV² demand classification: intermittent and lumpy products skip the
+# ensemble and use Croston-family engines ("auto": SBA for intermittent, TSB
+# for lumpy, or croston / sba / tsb for both). Stored classes are reused for
+# FORECAST_DEMAND_RECLASSIFY_DAYS.
+FORECAST_INTERMITTENT_ROUTING = os.environ.get("FORECAST_INTERMITTENT_ROUTING", "True") == "True"
+FORECAST_INTERMITTENT_METHOD = os.environ.get("FORECAST_INTERMITTENT_METHOD", "auto")
+FORECAST_DEMAND_RECLASSIFY_DAYS = int(os.environ.get("FORECAST_DEMAND_RECLASSIFY_DAYS", 7))
+
+# Forecast granularity: "day", or "week" / "month" to resample history into
+# calendar buckets and forecast periods. With FORECAST_DISAGGREGATE the period
+# forecasts are split back into days by day-of-week profile; otherwise one
+# detail point is stored per period.
+FORECAST_GRANULARITY = os.environ.get("FORECAST_GRANULARITY", "day")
+FORECAST_DISAGGREGATE = os.environ.get("FORECAST_DISAGGREGATE", "True") == "True"
+
+# Days without a HistoricalDemand record between a product's first and last
+# record: "zero" (no demand), "ffill", "interpolate" or "none" (leave the gap,
+# which shifts the weekly season of the engines).
+FORECAST_FILL_POLICY = os.environ.get("FORECAST_FILL_POLICY", "zero")
+
+# Products per progress step of a forecast job (see run_forecast_worker)
+FORECAST_JOB_CHUNK_SIZE = int(os.environ.get("FORECAST_JOB_CHUNK_SIZE", 500))
+# A running job that has not reported progress for FORECAST_JOB_STALE_SECONDS
+# (longer than any single chunk or XGBoost heartbeat interval takes) is assumed dead:
+# its open forecasts are failed and the job is requeued, or failed after
+# FORECAST_JOB_MAX_ATTEMPTS claims
+FORECAST_JOB_STALE_SECONDS = int(os.environ.get("FORECAST_JOB_STALE_SECONDS", 1800))
+FORECAST_JOB_MAX_ATTEMPTS = int(os.environ.get("FORECAST_JOB_MAX_ATTEMPTS", 3))
+
+# Serve moving average / smoothing / trend / seasonal naive from per-product
+# state updated on insert instead of re-reading the history
+FORECAST_INCREMENTAL_STATE = os.environ.get("FORECAST_INCREMENTAL_STATE", "True") == "True"
+
+# Where generation reads history: "database" or "snapshot" (Arrow files written
+# by the export_history_snapshot command, requires pyarrow; generation logs a
+# warning when the database has changed since the last export)
+FORECAST_HISTORY_SOURCE = os.environ.get("FORECAST_HISTORY_SOURCE", "database")
+FORECAST_HISTORY_SNAPSHOT_DIR = BASE_DIR / "history_snapshots"
+
+# Process pool for Holt-Winters / Prophet / ARIMA fits (0 workers = run serially in the request)
+FORECAST_PARALLEL_WORKERS = int(os.environ.get("FORECAST_PARALLEL_WORKERS", 0))
+FORECAST_PARALLEL_CHUNK_SIZE = int(os.environ.get("FORECAST_PARALLEL_CHUNK_SIZE", 8))
+FORECAST_FIT_TIMEOUT = float(os.environ.get("FORECAST_FIT_TIMEOUT", 30))  # seconds per model fit
+
+# ARIMA (p, d, q) order, e.g. "1,1,1"
+FORECAST_ARIMA_ORDER = tuple(int(x) for x in os.environ.get("FORECAST_ARIMA_ORDER", "1,1,1").split(","))
+
+# Catalog-wide XGBoost model: boosting rounds, tree depth, learning rate, training
+# threads (0 = all cores) and how many trailing days of history become training rows
+FORECAST_XGBOOST_ROUNDS = int(os.environ.get("FORECAST_XGBOOST_ROUNDS", 200))
+FORECAST_XGBOOST_MAX_DEPTH = int(os.environ.get("FORECAST_XGBOOST_MAX_DEPTH", 6))
+FORECAST_XGBOOST_LEARNING_RATE = float(os.environ.get("FORECAST_XGBOOST_LEARNING_RATE", 0.1))
+FORECAST_XGBOOST_THREADS = int(os.environ.get("FORECAST_XGBOOST_THREADS", 0))
+FORECAST_XGBOOST_TRAIN_DAYS = int(os.environ.get("FORECAST_XGBOOST_TRAIN_DAYS", 180))
+
+# Fitted-model cache, keyed by product / model / history fingerprint
+FORECAST_MODEL_CACHE_ENABLED = os.environ.get("FORECAST_MODEL_CACHE_ENABLED", "True") == "True"
+FORECAST_MODEL_CACHE_DIR = ML_MODELS_DIR / "cache"
+FORECAST_MODEL_CACHE_MAX_BYTES = int(os.environ.get("FORECAST_MODEL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Response cache for dashboard reads (accuracy report, low stock alert, forecast list).
+# Writes (often from run_forecast_worker or another gunicorn worker) invalidate
+# entries by bumping version keys in the cache itself, so every process must
+# share it: "file" (one host) or "redis" (RESPONSE_CACHE_REDIS_URL). "locmem" is
+# per process and only right for a single-process server.
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "True") == "True"
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "file")
+RESPONSE_CACHE_DIR = BASE_DIR / "response_cache"
+RESPONSE_CACHE_REDIS_URL = os.environ.get("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/1")
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 300))  # seconds
+RESPONSE_CACHE_TTLS = {
+    'accuracy_report': RESPONSE_CACHE_TTL,
+    'low_stock_alert': int(os.environ.get("RESPONSE_CACHE_LOW_STOCK_TTL", 60)),
+    'forecast_list': int(os.environ.get("RESPONSE_CACHE_FORECAST_LIST_TTL", 60)),
+}
+
+RESPONSE_CACHE_BACKENDS = {
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": RESPONSE_CACHE_DIR,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": RESPONSE_CACHE_REDIS_URL,
+    },
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "responses",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": RESPONSE_CACHE_BACKENDS[RESPONSE_CACHE_BACKEND],
+}
+
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
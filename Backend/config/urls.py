@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.views.generic import TemplateView
 from rest_framework.routers import DefaultRouter
-from forecasting.views import ProductViewSet, HistoricalDemandViewSet, ForecastViewSet
+from forecasting.views import ProductViewSet, HistoricalDemandViewSet, ForecastViewSet, ForecastJobViewSet
 from inventory.views import InventoryLevelViewSet, StockMovementViewSet
 from procurement.views import SupplierViewSet, ProcurementOrderViewSet
 
@@ -10,6 +10,7 @@ router = DefaultRouter()
 router.register(r'products', ProductViewSet)
 router.register(r'historical-demand', HistoricalDemandViewSet)
 router.register(r'forecasts', ForecastViewSet)
+router.register(r'forecast-jobs', ForecastJobViewSet)
 router.register(r'inventory', InventoryLevelViewSet)
 router.register(r'stock-movements', StockMovementViewSet)
 router.register(r'suppliers', SupplierViewSet)
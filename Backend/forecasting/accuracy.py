@@ -0,0 +1,200 @@
+"""
+Materialized forecast accuracy report.
+
+ForecastAccuracySummary holds sum / count totals of each metric for
+completed forecasts per (algorithm, category, month). The report reads
+that table, whose size depends on the number of algorithms, categories and
+months rather than the number of forecasts, and rolls it up in Python.
+
+Totals are maintained in two ways:
+  * ForecastWriter adds the metrics of the forecasts it completes
+    (add_completed), in the same transaction as the forecasts themselves.
+  * Single-row saves / deletes (signals) and recategorized products
+    recompute the affected groups from Forecast (schedule_refresh) once
+    the transaction commits.
+rebuild_summary recomputes the whole table with one grouped aggregate.
+"""
+import threading
+from collections import defaultdict
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Forecast, ForecastAccuracySummary
+
+# (report name, Forecast field, summary field prefix)
+METRICS = (
+    ('accuracy', 'accuracy_score', 'accuracy'),
+    ('mae', 'mae', 'mae'),
+    ('rmse', 'rmse', 'rmse'),
+    ('mape', 'mape', 'mape'),
+)
+TOTAL_FIELDS = ['forecast_count'] + [f'{p}_{s}' for _, _, p in METRICS for s in ('sum', 'count')]
+
+_pending = threading.local()
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _empty_totals():
+    return dict.fromkeys(TOTAL_FIELDS, 0)
+
+
+# Maintenance ------------------------------------------------------------
+
+def _add_totals(deltas):
+    """Add {(algorithm, category, month): totals} onto the summary rows"""
+    for (algorithm, category, month), totals in deltas.items():
+        key = {'algorithm': algorithm, 'category': category, 'month': month}
+        increments = {field: F(field) + value for field, value in totals.items() if value}
+        if ForecastAccuracySummary.objects.filter(**key).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                ForecastAccuracySummary.objects.create(**key, **totals)
+        except IntegrityError:
+            # Created concurrently; add onto that row instead
+            ForecastAccuracySummary.objects.filter(**key).update(**increments)
+
+
+def add_completed(forecasts):
+    """
+    Count newly completed forecasts into the summary.
+
+    forecasts: iterable of (forecast, category) for rows that were not
+    completed before. Call inside the transaction that writes them.
+    """
+    deltas = defaultdict(_empty_totals)
+    for forecast, category in forecasts:
+        if forecast.status != 'completed':
+            continue
+        totals = deltas[(forecast.algorithm, category, month_start(forecast.forecast_date))]
+        totals['forecast_count'] += 1
+        for _, field, prefix in METRICS:
+            value = getattr(forecast, field)
+            if value is not None:
+                totals[f'{prefix}_sum'] += value
+                totals[f'{prefix}_count'] += 1
+    if deltas:
+        _add_totals(deltas)
+
+
+def _grouped_totals(queryset):
+    """One grouped aggregate over completed forecasts -> {(algorithm, category, month): totals}"""
+    aggregates = {'forecast_count': Count('id')}
+    for _, field, prefix in METRICS:
+        aggregates[f'{prefix}_sum'] = Sum(field)
+        aggregates[f'{prefix}_count'] = Count(field)
+    rows = (
+        queryset.filter(status='completed')
+        .annotate(month=TruncMonth('forecast_date'), category=F('product__category'))
+        .order_by()
+        .values('algorithm', 'category', 'month')
+        .annotate(**aggregates)
+    )
+    return {
+        (row['algorithm'], row['category'], row['month']): {field: row[field] or 0 for field in TOTAL_FIELDS}
+        for row in rows
+    }
+
+
+def refresh_groups(keys=(), categories=()):
+    """
+    Recompute summary rows exactly from Forecast.
+
+    keys: (algorithm, category, month) groups; categories: whole categories.
+    """
+    scope = Q()
+    for algorithm, category, month in keys:
+        scope |= Q(algorithm=algorithm, product__category=category,
+                   forecast_date__gte=month, forecast_date__lt=_next_month(month))
+    if categories:
+        scope |= Q(product__category__in=categories)
+    if not scope:
+        return
+
+    summary_scope = Q(category__in=categories) if categories else Q()
+    for algorithm, category, month in keys:
+        summary_scope |= Q(algorithm=algorithm, category=category, month=month)
+
+    with transaction.atomic():
+        totals = _grouped_totals(Forecast.objects.filter(scope))
+        ForecastAccuracySummary.objects.filter(summary_scope).delete()
+        ForecastAccuracySummary.objects.bulk_create([
+            ForecastAccuracySummary(algorithm=algorithm, category=category, month=month, **values)
+            for (algorithm, category, month), values in totals.items()
+        ])
+
+
+def _refresh_pending():
+    keys = getattr(_pending, 'keys', set())
+    categories = getattr(_pending, 'categories', set())
+    _pending.keys, _pending.categories = set(), set()
+    if keys or categories:
+        refresh_groups(keys, categories)
+
+
+def schedule_refresh(keys=(), categories=()):
+    """Refresh these groups once the current transaction commits (deduplicated per thread)"""
+    if not hasattr(_pending, 'keys'):
+        _pending.keys, _pending.categories = set(), set()
+    _pending.keys.update(keys)
+    _pending.categories.update(categories)
+    # Every call registers a callback; the first to run drains the set, so
+    # keys left behind by a rolled-back transaction are picked up later
+    transaction.on_commit(_refresh_pending)
+
+
+def rebuild_summary(forecast_model=Forecast, summary_model=ForecastAccuracySummary):
+    """Recompute the whole summary table (models are overridable for migrations)"""
+    totals = _grouped_totals(forecast_model.objects.all())
+    with transaction.atomic():
+        summary_model.objects.all().delete()
+        summary_model.objects.bulk_create([
+            summary_model(algorithm=algorithm, category=category, month=month, **values)
+            for (algorithm, category, month), values in totals.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+# Report -----------------------------------------------------------------
+
+def _averages(totals):
+    report = {'total_forecasts': totals['forecast_count']}
+    for name, _, prefix in METRICS:
+        count = totals[f'{prefix}_count']
+        report[f'avg_{name}'] = totals[f'{prefix}_sum'] / count if count else None
+    return report
+
+
+def _breakdown(rows, key, label):
+    groups = defaultdict(_empty_totals)
+    for row in rows:
+        totals = groups[key(row)]
+        for field in TOTAL_FIELDS:
+            totals[field] += row[field]
+    return [{label: value, **_averages(totals)} for value, totals in sorted(groups.items())]
+
+
+def accuracy_report():
+    """Overall averages plus breakdowns by algorithm, category and month, from one query"""
+    rows = list(ForecastAccuracySummary.objects.filter(forecast_count__gt=0)
+                .values('algorithm', 'category', 'month', *TOTAL_FIELDS))
+    overall = _empty_totals()
+    for row in rows:
+        for field in TOTAL_FIELDS:
+            overall[field] += row[field]
+    return {
+        **_averages(overall),
+        'by_algorithm': _breakdown(rows, lambda r: r['algorithm'], 'algorithm'),
+        'by_category': _breakdown(rows, lambda r: r['category'], 'category'),
+        'by_month': _breakdown(rows, lambda r: r['month'].strftime('%Y-%m'), 'month'),
+    }
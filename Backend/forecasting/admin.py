@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, HistoricalDemand, Forecast, ForecastDetail
+from .models import Product, HistoricalDemand, Forecast, ForecastDetail, ForecastJob, EnsembleWeights, DemandClassification
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -20,3 +20,20 @@ class ForecastAdmin(admin.ModelAdmin):
     search_fields = ['product__name']
 
 admin.site.register(ForecastDetail)
+
+@admin.register(ForecastJob)
+class ForecastJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'algorithm', 'status', 'products_done', 'products_skipped', 'products_failed', 'created_at']
+    list_filter = ['status', 'algorithm']
+
+@admin.register(EnsembleWeights)
+class EnsembleWeightsAdmin(admin.ModelAdmin):
+    list_display = ['scope', 'key', 'weights', 'pruned', 'calibrated_at']
+    list_filter = ['scope']
+    search_fields = ['key']
+
+@admin.register(DemandClassification)
+class DemandClassificationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'demand_class', 'adi', 'cv2', 'method', 'classified_at']
+    list_filter = ['demand_class', 'method']
+    search_fields = ['product__name']
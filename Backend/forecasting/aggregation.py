@@ -0,0 +1,187 @@
+"""
+Temporal aggregation: forecasting at weekly or monthly granularity.
+
+With FORECAST_GRANULARITY = "week" or "month", HistoricalDemand is resampled
+into calendar buckets (ISO weeks starting on Monday, or calendar months) in
+one grouped database query, or with a vectorized groupby when history comes
+from the Arrow snapshot. The result has the load_history() shape, with one
+record per bucket dated at its start, so every engine runs unchanged on 7-30x
+fewer points and forecasts periods instead of days. Buckets after the last
+complete one (e.g. the current week) are dropped so a partial period does not
+read as a demand drop.
+
+The forecast horizon is the calendar periods covering forecast_date ..
+forecast_date + horizon - 1. Period forecasts are spread over their days with
+each product's day-of-week demand profile; with FORECAST_DISAGGREGATE the
+daily paths are stored, otherwise one row per period (its share inside the
+horizon, so the totals are the same either way).
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg, Max, Sum
+from django.db.models.functions import ExtractIsoWeekDay, TruncMonth, TruncWeek
+
+from .history import group_columns
+from .models import HistoricalDemand
+
+GRANULARITIES = ('day', 'week', 'month')
+PERIOD_DAYS = {'day': 1, 'week': 7, 'month': 30}
+PATH_FIELDS = ('forecast', 'lower_bound', 'upper_bound')
+
+
+def aggregation_settings(granularity=None, disaggregate=None):
+    """(granularity, disaggregate); arguments override FORECAST_GRANULARITY / FORECAST_DISAGGREGATE"""
+    granularity = granularity or getattr(settings, 'FORECAST_GRANULARITY', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularity must be one of {', '.join(GRANULARITIES)}, got '{granularity}'")
+    if disaggregate is None:
+        disaggregate = getattr(settings, 'FORECAST_DISAGGREGATE', True)
+    return granularity, disaggregate
+
+
+def bucket_start(dates, granularity):
+    """Start date of the bucket of each datetime64[D] date"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday, so Monday-based weekday = (days + 3) % 7
+        return dates - ((dates.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    if granularity == 'month':
+        return dates.astype('datetime64[M]').astype('datetime64[D]')
+    return dates
+
+
+def next_bucket(starts, granularity):
+    """Start of the bucket after each bucket start"""
+    starts = np.asarray(starts, dtype='datetime64[D]')
+    if granularity == 'week':
+        return starts + np.timedelta64(7, 'D')
+    if granularity == 'month':
+        return (starts.astype('datetime64[M]') + 1).astype('datetime64[D]')
+    return starts + np.timedelta64(1, 'D')
+
+
+def period_starts(start, n_periods, granularity):
+    """Dates of n consecutive path points from `start`: days, or bucket starts after the first"""
+    start = np.datetime64(start, 'D')
+    if granularity == 'month':
+        starts = (start.astype('datetime64[M]') + np.arange(n_periods)).astype('datetime64[D]')
+    else:
+        starts = bucket_start(start, granularity) + np.arange(n_periods) * PERIOD_DAYS[granularity]
+    if n_periods:
+        starts[0] = start
+    return starts.astype(object).tolist()
+
+
+def weekday_profiles(product_ids):
+    """
+    (n_products, 7) relative demand per weekday (Monday first, mean 1), from
+    one grouped query over the daily history; flat for products without demand.
+    """
+    row_of = {pid: i for i, pid in enumerate(product_ids)}
+    profiles = np.zeros((len(product_ids), 7))
+    rows = (
+        HistoricalDemand.objects.filter(product_id__in=list(product_ids))
+        .annotate(weekday=ExtractIsoWeekDay('date'))
+        .values_list('product_id', 'weekday')
+        .annotate(mean=Avg('quantity_demanded'))
+        .order_by()
+    )
+    for pid, weekday, mean in rows:
+        profiles[row_of[pid], weekday - 1] = mean or 0
+    totals = profiles.sum(axis=1, keepdims=True)
+    return np.where(totals > 0, profiles * 7 / np.where(totals > 0, totals, 1), 1.0)
+
+
+class TemporalAggregation:
+    """Period grid of one generation run and the conversion of its forecasts back to the horizon"""
+
+    def __init__(self, granularity, forecast_date, horizon_days, disaggregate=True):
+        self.granularity = granularity
+        self.disaggregate = disaggregate
+        days = np.datetime64(forecast_date, 'D') + np.arange(horizon_days)
+        first = bucket_start(days[0], granularity)
+        full = np.arange(first, next_bucket(bucket_start(days[-1], granularity), granularity), dtype='datetime64[D]')
+        buckets = bucket_start(full, granularity)
+        new = np.r_[True, buckets[1:] != buckets[:-1]]
+        # Every day of the periods touched by the horizon, with its period and weekday
+        self.full_period = np.cumsum(new) - 1
+        self.full_period_starts = np.flatnonzero(new)
+        self.full_weekday = (full.astype(np.int64) + 3) % 7
+        self.n_periods = len(self.full_period_starts)
+        offset = int((days[0] - first).astype(np.int64))
+        self.horizon = slice(offset, offset + horizon_days)
+        self.day_period = self.full_period[self.horizon]
+        self.horizon_period_starts = np.flatnonzero(np.r_[True, self.day_period[1:] != self.day_period[:-1]])
+
+    def periods(self, days):
+        """Whole periods covering `days` days (backtest horizons and holdouts)"""
+        return max(1, math.ceil(days / PERIOD_DAYS[self.granularity]))
+
+    def _complete_before(self, last_date):
+        """Buckets starting before this date end on or before last_date"""
+        return bucket_start(np.datetime64(last_date, 'D') + 1, self.granularity)
+
+    def load_history(self, product_ids=None):
+        """Bucketed history from one grouped query, in load_history() shape"""
+        queryset = HistoricalDemand.objects.all()
+        if product_ids is not None:
+            queryset = queryset.filter(product_id__in=list(product_ids))
+        last = queryset.aggregate(last=Max('date'))['last']
+        if last is None:
+            return {}
+        trunc = TruncWeek if self.granularity == 'week' else TruncMonth
+        rows = list(
+            queryset.filter(date__lt=self._complete_before(last).item())
+            .annotate(bucket=trunc('date'))
+            .values_list('product_id', 'bucket')
+            .annotate(total=Sum('quantity_demanded'))
+            .order_by('product_id', 'bucket')
+        )
+        return group_columns(
+            np.array([r[0] for r in rows], dtype=object),
+            np.array([r[1] for r in rows], dtype='datetime64[D]'),
+            np.array([r[2] for r in rows], dtype=np.float64),
+        )
+
+    def resample(self, history):
+        """Bucket a daily load_history() result with one vectorized groupby over the catalog"""
+        pids = [pid for pid, (dates, _) in history.items() if len(dates)]
+        if not pids:
+            return {}
+        dates = np.concatenate([history[pid][0] for pid in pids])
+        quantities = np.concatenate([history[pid][1] for pid in pids])
+        codes = np.repeat(np.arange(len(pids)), [len(history[pid][0]) for pid in pids])
+        keep = dates < self._complete_before(dates.max())
+        dates, quantities, codes = dates[keep], quantities[keep], codes[keep]
+        if not len(dates):
+            return {}
+        buckets = bucket_start(dates, self.granularity)
+        # Series are date-sorted, so each (product, bucket) group is one contiguous run
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])])
+        return group_columns(
+            np.array(pids, dtype=object)[codes[starts]], buckets[starts], np.add.reduceat(quantities, starts))
+
+    def expand(self, results, product_ids):
+        """
+        Period results -> horizon paths: daily (weekday-profile split) when
+        disaggregating, otherwise each period's share inside the horizon.
+        """
+        ids = [pid for pid in product_ids if pid in results]
+        if not ids:
+            return results
+        weights = weekday_profiles(ids)[:, self.full_weekday]
+        totals = np.add.reduceat(weights, self.full_period_starts, axis=1)
+        share = (weights / totals[:, self.full_period])[:, self.horizon]
+        granularity = 'day' if self.disaggregate else self.granularity
+        paths = {}
+        for field in PATH_FIELDS:
+            periods = np.stack([np.asarray(results[pid][field], dtype=np.float64) for pid in ids])
+            daily = periods[:, self.day_period] * share
+            paths[field] = daily if self.disaggregate else np.add.reduceat(daily, self.horizon_period_starts, axis=1)
+        expanded = dict(results)
+        for i, pid in enumerate(ids):
+            expanded[pid] = {**results[pid], **{field: paths[field][i] for field in PATH_FIELDS},
+                             'granularity': granularity}
+        return expanded
@@ -0,0 +1,112 @@
+"""
+Calendar alignment of demand series.
+
+HistoricalDemand has no row for a day without a record, and the engines only
+see the rows that exist, so a missing day silently shifts every later
+observation (and the 7-day season of seasonal naive / Holt-Winters) by one.
+Here a set of products is laid on one dense daily grid in a single scatter
+(history_matrix) and the gaps are filled per FORECAST_FILL_POLICY:
+
+  * zero: a missing day had no demand;
+  * ffill: a missing day repeats the last recorded demand;
+  * interpolate: linear between the recorded days around the gap;
+  * none: keep the gaps (the previous behaviour).
+
+Only gaps between a product's first and last record are filled; days after
+its last record are unknown rather than zero. Generation aligns one chunk
+at a time (AlignedPanel): the panel engines, the backtester and the
+intermittent router read the aligned matrix by day offset, and per-product
+engines read dense series sliced from its rows.
+"""
+import numpy as np
+from django.conf import settings
+
+from .history import history_matrix
+
+FILL_POLICIES = ('none', 'zero', 'ffill', 'interpolate')
+
+
+def fill_policy(policy=None):
+    """Gap fill policy; `policy` overrides FORECAST_FILL_POLICY"""
+    policy = policy or getattr(settings, 'FORECAST_FILL_POLICY', 'zero')
+    if policy not in FILL_POLICIES:
+        raise ValueError(f"Fill policy must be one of {', '.join(FILL_POLICIES)}, got '{policy}'")
+    return policy
+
+
+def fill_gaps(matrix, mask, policy='zero'):
+    """
+    Fill the gaps of every series of a (series x days) panel at once.
+
+    Returns (filled, valid): valid is True from each series' first to its
+    last record, and filled holds the recorded or filled demand there (0
+    elsewhere). With policy 'none' the inputs are returned unchanged.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    mask = np.asarray(mask, dtype=bool)
+    if policy == 'none':
+        return matrix, mask
+    n_series, n_days = matrix.shape
+    cols = np.arange(n_days)
+    rows = np.arange(n_series)[:, None]
+    # Last recorded column at or before each day, first recorded column at or after it
+    prev = np.maximum.accumulate(np.where(mask, cols, -1), axis=1)
+    nxt = np.minimum.accumulate(np.where(mask, cols, n_days)[:, ::-1], axis=1)[:, ::-1]
+    valid = (prev >= 0) & (nxt < n_days)
+
+    if policy == 'zero':
+        filled = np.where(mask, matrix, 0.0)
+    else:
+        before = np.maximum(prev, 0)
+        filled = matrix[rows, before]
+        if policy == 'interpolate':
+            after = np.minimum(nxt, n_days - 1)
+            span = after - before
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t = np.where(span > 0, (cols - before) / span, 0.0)
+            filled = filled + t * (matrix[rows, after] - filled)
+    return np.where(valid, filled, 0.0), valid
+
+
+def align_series(dates, quantities, policy='zero'):
+    """One date-sorted series made dense from its first to its last record"""
+    if policy == 'none' or not len(dates):
+        return dates, quantities
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    cols = (dates - dates[0]).astype(np.int64)
+    matrix = np.zeros((1, cols[-1] + 1))
+    mask = np.zeros(matrix.shape, dtype=bool)
+    matrix[0, cols] = quantities
+    mask[0, cols] = True
+    filled, _ = fill_gaps(matrix, mask, policy)
+    return dates[0] + np.arange(matrix.shape[1]), filled[0]
+
+
+def align_matrix(history, product_ids, policy='zero'):
+    """history_matrix() of these products with the gaps filled: (matrix, valid, start_date)"""
+    matrix, mask, start = history_matrix(history, product_ids)
+    filled, valid = fill_gaps(matrix, mask, policy)
+    return filled, valid, start
+
+
+class AlignedPanel:
+    """The aligned matrix of one set of products, shared by every engine that works on them"""
+
+    def __init__(self, history, product_ids, policy='zero'):
+        """history: load_history() result; policy: fill policy ('none' keeps the records only)"""
+        self.product_ids = list(product_ids)
+        self.matrix, self.mask, self.start = align_matrix(history, self.product_ids, policy)
+        self.index = {pid: i for i, pid in enumerate(self.product_ids)}
+
+    def rows(self, product_ids):
+        """(matrix, mask, start_date) of some of the products, without another scatter"""
+        if list(product_ids) == self.product_ids:
+            return self.matrix, self.mask, self.start
+        rows = [self.index[pid] for pid in product_ids]
+        return self.matrix[rows], self.mask[rows], self.start
+
+    def series(self, product_id):
+        """(dates, quantities) of one product's recorded and filled days"""
+        i = self.index[product_id]
+        cols = np.flatnonzero(self.mask[i])
+        return self.start + cols, self.matrix[i, cols]
@@ -0,0 +1,233 @@
+"""
+Vectorized rolling-origin backtesting.
+
+Each algorithm is refit at K forecast origins spaced `horizon` days apart at
+the end of the history, and scored on the `horizon` days after each origin,
+for every series of a (products x days) panel at once. The fits share their
+work across the overlapping training windows:
+
+  * moving average and linear trend read window sums from prefix sums of y
+    and x * y, so every origin costs O(1) per series;
+  * exponential smoothing runs the smoother once over the whole history and
+    reads its level at each origin;
+  * seasonal naive slices the last season before each origin;
+  * Croston / SBA / TSB run their recursion once and read it at each origin.
+
+Per-origin fits follow the same rules (window shrinking, fallbacks to the
+moving average on short series) as PanelForecaster / DemandForecaster.
+Ensemble scores the average of its cheap members; Holt-Winters and Prophet
+are not refit per fold, so forecasts whose ensemble includes them store
+these metrics with metrics_partial set.
+"""
+import numpy as np
+from django.conf import settings
+
+from .history import MIN_HISTORY_RECORDS
+from .ml_engine import INTERMITTENT_ALGORITHMS, croston_levels
+from .panel import PANEL_ALGORITHMS, right_justify
+
+DEFAULT_FOLDS = 3
+DEFAULT_HORIZON = 14
+MA_WINDOW = 7
+ES_ALPHA = 0.3
+SEASON_LENGTH = 7
+
+
+def backtest_settings():
+    """(enabled, folds, horizon) from settings"""
+    return (
+        getattr(settings, 'FORECAST_BACKTEST_ENABLED', True),
+        getattr(settings, 'FORECAST_BACKTEST_FOLDS', DEFAULT_FOLDS),
+        getattr(settings, 'FORECAST_BACKTEST_HORIZON', DEFAULT_HORIZON),
+    )
+
+
+# Engines that score themselves on a holdout instead of the rolling-origin backtest
+HOLDOUT_SCORED_ALGORITHMS = ('arima', 'xgboost')
+
+
+def backtest_algorithm(algorithm):
+    """The algorithm whose backtest stands in for `algorithm` (others run as the ensemble)"""
+    return algorithm if algorithm in PANEL_ALGORITHMS + INTERMITTENT_ALGORITHMS else 'ensemble'
+
+
+class RollingOriginBacktester:
+    """Scores cheap forecasting methods over K holdout folds for many series at once"""
+
+    def __init__(self, matrix, mask=None, folds=DEFAULT_FOLDS, horizon=DEFAULT_HORIZON,
+                 min_train=MIN_HISTORY_RECORDS):
+        """
+        matrix / mask: (n_series, n_days) demand panel, as for PanelForecaster
+        folds: number of forecast origins; horizon: days scored after each origin
+        min_train: observations a series needs before an origin for that fold to count
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if mask is None:
+            mask = np.ones(matrix.shape, dtype=bool)
+        self.values, self.counts = right_justify(matrix, np.asarray(mask, dtype=bool))
+        n_series, n_days = self.values.shape
+        self.horizon = horizon
+        self.first_col = n_days - self.counts
+
+        # Origins from the most recent backwards; fold k trains on columns < origin
+        self.origins = np.array(
+            [n_days - k * horizon for k in range(1, folds + 1) if n_days - k * horizon > 0], dtype=np.int64)
+        self.n_train = np.maximum(self.origins[None, :] - self.first_col[:, None], 0)  # (series, folds)
+        self.fold_valid = self.n_train >= min_train
+
+        # Shared prefix sums over the full history (zeros before each first observation)
+        cols = np.arange(n_days, dtype=np.float64)
+        zeros = np.zeros((n_series, 1))
+        self._csum = np.concatenate((zeros, np.cumsum(self.values, axis=1)), axis=1)
+        self._cxsum = np.concatenate((zeros, np.cumsum(self.values * cols[None, :], axis=1)), axis=1)
+        self._es_levels = None
+        self._croston_levels = {}
+
+        # Actuals after each origin: (series, folds, horizon)
+        steps = self.origins[:, None] + np.arange(horizon)[None, :]
+        self.actual = self.values[:, steps] if len(self.origins) else np.zeros((n_series, 0, horizon))
+
+    # Per-origin fits, each returning (series, folds, horizon) -------------
+
+    def _window_sum(self, end, length):
+        rows = np.arange(self.values.shape[0])[:, None]
+        return self._csum[rows, end] - self._csum[rows, end - length]
+
+    def moving_average(self):
+        n = self.n_train
+        w = np.where(n < MA_WINDOW, np.maximum(1, n // 2), MA_WINDOW)
+        level = self._window_sum(self.origins[None, :], w) / w
+        return np.repeat(level[:, :, None], self.horizon, axis=2)
+
+    def exponential_smoothing(self):
+        if self._es_levels is None:
+            n_series, n_days = self.values.shape
+            levels = np.zeros((n_series, n_days))
+            level = np.zeros(n_series)
+            for t in range(n_days):
+                y = self.values[:, t]
+                level = np.where(t == self.first_col, y,
+                                 np.where(t > self.first_col, ES_ALPHA * y + (1 - ES_ALPHA) * level, 0.0))
+                levels[:, t] = level
+            self._es_levels = levels
+        level = self._es_levels[:, self.origins - 1]
+        return np.repeat(level[:, :, None], self.horizon, axis=2)
+
+    def linear_trend(self):
+        n = self.n_train.astype(np.float64)
+        rows = np.arange(self.values.shape[0])[:, None]
+        sum_y = self._csum[rows, self.origins[None, :]]
+        sum_xy = self._cxsum[rows, self.origins[None, :]] - self.first_col[:, None] * sum_y
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        with np.errstate(invalid='ignore', divide='ignore'):
+            denom = n * sum_xx - sum_x ** 2
+            m = np.where(denom != 0, (n * sum_xy - sum_x * sum_y) / denom, 0.0)
+            b = np.where(n > 0, (sum_y - m * sum_x) / n, 0.0)
+        future_x = n[:, :, None] + np.arange(self.horizon)[None, None, :]
+        forecast = np.maximum(m[:, :, None] * future_x + b[:, :, None], 0)
+        return np.where((self.n_train < 2)[:, :, None], self.moving_average(), forecast)
+
+    def seasonal_naive(self):
+        start = np.maximum(self.origins - SEASON_LENGTH, 0)
+        # Clipped for panels shorter than a season; those folds fall back to the moving average below
+        cols = np.minimum(start[:, None] + np.arange(SEASON_LENGTH)[None, :], self.values.shape[1] - 1)
+        season = self.values[:, cols]  # (series, folds, season)
+        reps = (self.horizon // SEASON_LENGTH) + 1
+        forecast = np.tile(season, (1, 1, reps))[:, :, :self.horizon]
+        return np.where((self.n_train < SEASON_LENGTH)[:, :, None], self.moving_average(), forecast)
+
+    def intermittent(self, method):
+        if method not in self._croston_levels:
+            self._croston_levels[method] = croston_levels(self.values, self.first_col, method)
+        level = self._croston_levels[method][:, self.origins - 1]
+        return np.repeat(level[:, :, None], self.horizon, axis=2)
+
+    def ensemble(self):
+        """Average of the cheap members only (see the module docstring)"""
+        return np.mean([self.fold_forecasts(a) for a in PANEL_ALGORITHMS], axis=0)
+
+    def fold_forecasts(self, algorithm):
+        """(series, folds, horizon) forecasts made at each origin"""
+        if algorithm == 'moving_avg':
+            return self.moving_average()
+        elif algorithm == 'exp_smoothing':
+            return self.exponential_smoothing()
+        elif algorithm == 'linear_trend':
+            return self.linear_trend()
+        elif algorithm == 'seasonal_naive':
+            return self.seasonal_naive()
+        elif algorithm in INTERMITTENT_ALGORITHMS:
+            return self.intermittent(algorithm)
+        elif algorithm == 'ensemble':
+            return self.ensemble()
+        raise ValueError(f"Algorithm '{algorithm}' is not supported by the backtester")
+
+    # Scoring ------------------------------------------------------------
+
+    def evaluate(self, algorithm):
+        """
+        Per-series mae / rmse / mape (fraction) / accuracy arrays over all valid
+        folds. NaN where a series has no valid fold.
+        """
+        if not len(self.origins):
+            return self.score(None)
+        return self.score(self.fold_forecasts(algorithm))
+
+    def latest_fold_mae(self, fold_forecasts):
+        """Per-series MAE on the most recent fold only (NaN where it is not valid)"""
+        if not len(self.origins):
+            return np.full(self.values.shape[0], np.nan)
+        mae = np.abs(fold_forecasts[:, 0] - self.actual[:, 0]).mean(axis=1)
+        return np.where(self.fold_valid[:, 0], mae, np.nan)
+
+    def score(self, fold_forecasts):
+        """Metrics of arbitrary (series, folds, horizon) forecasts, see evaluate()"""
+        if fold_forecasts is None or not len(self.origins):
+            return score_forecasts(np.zeros((self.values.shape[0], 0)), None, None)
+        valid = np.broadcast_to(self.fold_valid[:, :, None], fold_forecasts.shape)
+        return score_forecasts(fold_forecasts, self.actual, valid)
+
+    def metrics(self, algorithm=None, scores=None):
+        """
+        One {'mae', 'rmse', 'mape', 'accuracy'} dict per series; None values when untested.
+
+        scores: output of evaluate() / score() to convert instead of evaluating `algorithm`
+        """
+        return metric_dicts(self.evaluate(algorithm) if scores is None else scores)
+
+
+def score_forecasts(forecasts, actual, valid):
+    """
+    Per-series mae / rmse / mape (fraction) / accuracy of forecasts against
+    actuals, over every axis but the first and only where `valid` is set.
+    NaN where a series has nothing to score.
+    """
+    n_series = forecasts.shape[0]
+    if actual is None:
+        empty = np.full(n_series, np.nan)
+        return {'mae': empty, 'rmse': empty, 'mape': empty, 'accuracy': empty}
+
+    axes = tuple(range(1, forecasts.ndim))
+    error = forecasts - actual
+    n = valid.sum(axis=axes).astype(np.float64)
+    nonzero = valid & (actual != 0)
+    n_nonzero = nonzero.sum(axis=axes)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mae = np.where(valid, np.abs(error), 0).sum(axis=axes) / n
+        rmse = np.sqrt(np.where(valid, error ** 2, 0).sum(axis=axes) / n)
+        ape = np.where(nonzero, np.abs(error) / np.where(nonzero, actual, 1), 0)
+        # Same convention as mean_absolute_percentage_error: 0 when every actual is 0
+        mape = np.where(n_nonzero > 0, ape.sum(axis=axes) / np.maximum(n_nonzero, 1), 0.0)
+    mape = np.where(n > 0, mape, np.nan)
+    accuracy = np.maximum(0, 100 - mape * 100)
+    return {'mae': mae, 'rmse': rmse, 'mape': mape, 'accuracy': accuracy}
+
+
+def metric_dicts(scores):
+    """Per-series score arrays -> one metrics dict per series, None where NaN"""
+    n_series = len(scores['mae'])
+    return [
+        {name: (None if np.isnan(values[i]) else float(values[i])) for name, values in scores.items()}
+        for i in range(n_series)
+    ]
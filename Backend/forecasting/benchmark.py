@@ -0,0 +1,189 @@
+"""
+Forecast pipeline benchmarks on synthetic catalogs.
+
+Each run builds a throwaway catalog with the seed_historical_data generator,
+times the pipeline stages (load, fit, backtest, persist, serialize per
+algorithm, plus inventory optimize) and rolls everything back. Results are plain JSON so
+they can be stored as a baseline and compared on later runs.
+"""
+import platform
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from .alignment import AlignedPanel
+from .backtest import backtest_settings
+from .generation import backtest_chunk
+from .global_model import forecast_catalog
+from .history import load_history
+from .management.commands.seed_historical_data import synthetic_demand
+from .ml_engine import DemandForecaster
+from .models import Product, HistoricalDemand, Forecast
+from .panel import PanelForecaster, PANEL_ALGORITHMS
+from .persistence import ForecastWriter
+from .serializers import ForecastSerializer
+
+DEFAULT_ALGORITHMS = ['moving_avg', 'exp_smoothing', 'linear_trend', 'seasonal_naive', 'ensemble']
+SKU_PREFIX = 'BENCH-'
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def _timed(record):
+    start = time.perf_counter()
+    yield
+    record['seconds'] = round(time.perf_counter() - start, 6)
+
+
+def _build_catalog(n_products, days, seed):
+    """Insert synthetic products, history and inventory; returns the products"""
+    from inventory.models import InventoryLevel
+
+    rng = np.random.default_rng(seed)
+    products = Product.objects.bulk_create([
+        Product(
+            name=f'Benchmark {i}',
+            sku=f'{SKU_PREFIX}{i:06d}',
+            category=f'Bench {i % 20}',
+            current_price=Decimal('10.00'),
+            lead_time_days=int(rng.integers(1, 30)),
+        )
+        for i in range(n_products)
+    ], batch_size=5000)
+
+    chunk = max(1, 200000 // max(days, 1))
+    for start in range(0, n_products, chunk):
+        batch = products[start:start + chunk]
+        dates, demand, sales = synthetic_demand(len(batch), days, date.today(), rng=rng)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=p, date=d, quantity_demanded=int(q), actual_sales=int(a))
+            for p, qty_row, sale_row in zip(batch, demand, sales)
+            for d, q, a in zip(dates, qty_row, sale_row)
+        ], batch_size=5000)
+
+    InventoryLevel.objects.bulk_create([
+        InventoryLevel(
+            product=p, current_stock=100, minimum_stock_level=10, maximum_stock_level=500,
+            safety_stock=5, reorder_quantity=50, holding_cost_per_unit=Decimal('1.00'),
+        )
+        for p in products
+    ], batch_size=5000)
+    return products
+
+
+def _fit(algorithm, products, panel, horizon):
+    if algorithm in PANEL_ALGORITHMS:
+        return PanelForecaster(panel.matrix, panel.mask).forecast(algorithm=algorithm, horizon_days=horizon)
+    if algorithm == 'xgboost':
+        return list(forecast_catalog(panel, horizon_days=horizon).values())
+    return [
+        DemandForecaster.from_arrays(*panel.series(p.id)).forecast(algorithm=algorithm, horizon_days=horizon)
+        for p in products
+    ]
+
+
+def _optimize():
+    from inventory.views import InventoryLevelViewSet
+
+    request = APIRequestFactory().post('/api/inventory/optimize/', {}, format='json')
+    return InventoryLevelViewSet.as_view({'post': 'optimize'})(request)
+
+
+def run_benchmark(n_products, days, algorithms=None, horizon=30, seed=0,
+                  batch_size=None, serialize_limit=1000):
+    """Time every stage for one catalog size; returns a list of result records"""
+    algorithms = algorithms or DEFAULT_ALGORITHMS
+    results = []
+
+    def record(stage, algorithm=None, **extra):
+        entry = {'products': n_products, 'days': days, 'algorithm': algorithm, 'stage': stage, **extra}
+        results.append(entry)
+        return entry
+
+    try:
+        with transaction.atomic():
+            with _timed(record('setup', rows=n_products * days)):
+                products = _build_catalog(n_products, days, seed)
+
+            with _timed(record('load', rows=n_products * days)):
+                history = load_history(product_ids=[p.id for p in products])
+                panel = AlignedPanel(history, [p.id for p in products])
+
+            forecast_date = timezone.now().date()
+            for algorithm in algorithms:
+                with _timed(record('fit', algorithm)):
+                    fitted = _fit(algorithm, products, panel, horizon)
+
+                with _timed(record('backtest', algorithm)):
+                    backtest_chunk(panel, [p.id for p in products], algorithm, *backtest_settings()[1:])
+
+                writer = ForecastWriter(batch_size=batch_size)
+                created = []
+                entry = record('persist', algorithm)
+                with _timed(entry):
+                    for product, result in zip(products, fitted):
+                        # XGBoost leaves out series it could not train on, as in generation
+                        if result is None:
+                            continue
+                        created.append(writer.add(product, algorithm, forecast_date, horizon, result).id)
+                    writer.flush()
+                entry['rows'] = writer.rows_written
+                entry['skipped'] = len(products) - len(created)
+
+                # Same queries as the list view
+                page = (Forecast.objects.select_related('product').prefetch_related('details')
+                        .filter(id__in=created[:serialize_limit]))
+                entry = record('serialize', algorithm, rows=min(len(created), serialize_limit))
+                with _timed(entry):
+                    ForecastSerializer(page, many=True).data
+
+            with _timed(record('optimize', rows=n_products)):
+                _optimize()
+
+            raise _Rollback()
+    except _Rollback:
+        pass
+    return results
+
+
+def benchmark_metadata():
+    import django
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'timestamp': timezone.now().isoformat(),
+    }
+
+
+def _key(entry):
+    return (entry['products'], entry['days'], entry['algorithm'], entry['stage'])
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_delta=0.05):
+    """
+    Stages slower than baseline by more than `tolerance` (fraction) and
+    `min_delta` seconds. Entries missing from the baseline are ignored.
+    """
+    previous = {_key(e): e for e in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        base = previous.get(_key(entry))
+        if base is None or entry['stage'] == 'setup':
+            continue
+        delta = entry['seconds'] - base['seconds']
+        if delta > min_delta and entry['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append({**entry, 'baseline_seconds': base['seconds'],
+                                'slowdown': round(entry['seconds'] / base['seconds'], 3) if base['seconds'] else None})
+    return regressions
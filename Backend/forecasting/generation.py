@@ -0,0 +1,373 @@
+"""
+Forecast generation pipeline shared by the API and the background job worker.
+
+Loads history in bulk, creates a 'pending' Forecast per eligible product and
+then works through the catalog in chunks, moving each chunk through
+'generating' to 'completed' / 'failed'.
+"""
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .aggregation import TemporalAggregation, aggregation_settings
+from .alignment import AlignedPanel, fill_policy
+from .backtest import HOLDOUT_SCORED_ALGORITHMS, RollingOriginBacktester, backtest_algorithm, backtest_settings
+from .global_model import forecast_catalog
+from .hierarchy import HierarchyReconciler, hierarchy_settings
+from .history import load_history, history_counts, MIN_HISTORY_RECORDS
+from .ml_engine import DemandForecaster, INTERMITTENT_ALGORITHMS, forecast_intermittent
+from .models import Forecast, Product
+from .panel import PanelForecaster, PANEL_ALGORITHMS
+from .parallel import WorkerPool, fit_expensive_models, parallel_enabled
+from .model_cache import default_model_cache
+from .persistence import ForecastWriter, create_pending_forecasts, fail_open_forecasts, mark_generating
+from .quantiles import ResidualQuantiles, quantile_settings
+from .snapshot import default_snapshot, HAS_PYARROW
+from .state import STATE_ALGORITHMS, load_states, forecast_from_state
+from . import intermittent, weighted_ensemble
+
+logger = logging.getLogger(__name__)
+
+
+def generation_chunk_size():
+    return getattr(settings, 'FORECAST_JOB_CHUNK_SIZE', 500)
+
+
+def incremental_state_enabled():
+    return getattr(settings, 'FORECAST_INCREMENTAL_STATE', True)
+
+
+def read_history(product_ids=None):
+    """History from the configured source: the database or the Arrow snapshot"""
+    if getattr(settings, 'FORECAST_HISTORY_SOURCE', 'database') == 'snapshot':
+        snapshot = default_snapshot()
+        if HAS_PYARROW and snapshot.exists():
+            if not snapshot.is_current():
+                logger.warning("History snapshot is behind the database, run export_history_snapshot")
+            return snapshot.load_history(product_ids=product_ids)
+        logger.warning("History snapshot unavailable, reading from the database")
+    return load_history(product_ids=product_ids)
+
+
+def read_bucketed_history(aggregation, product_ids=None):
+    """Weekly / monthly history: grouped in the database, or resampled from the Arrow snapshot"""
+    if getattr(settings, 'FORECAST_HISTORY_SOURCE', 'database') == 'snapshot':
+        return aggregation.resample(read_history(product_ids=product_ids))
+    return aggregation.load_history(product_ids=product_ids)
+
+
+def backtest_chunk(panel, product_ids, algorithm, folds, horizon):
+    """Rolling-origin metrics for one chunk of products (rows of an AlignedPanel), {product_id: metrics}"""
+    matrix, mask, _ = panel.rows(product_ids)
+    backtester = RollingOriginBacktester(matrix, mask, folds=folds, horizon=horizon)
+    scored = backtest_algorithm(algorithm)
+    metrics = backtester.metrics(scored)
+    # The ensemble backtest leaves out Holt-Winters / Prophet whenever they are installed
+    if scored == 'ensemble' and weighted_ensemble.available_expensive_members():
+        metrics = [{**m, 'metrics_partial': True} for m in metrics]
+    return dict(zip(product_ids, metrics))
+
+
+def generate_forecasts(product_ids=None, algorithm='ensemble', horizon=30,
+                       batch_size=None, parallel=None, progress=None, ensemble_mode=None,
+                       reconciliation=None, granularity=None, disaggregate=None, fill=None, job=None):
+    """
+    Generate forecasts for the given products (all products if None).
+
+    ensemble_mode: 'mean' or 'weighted', overrides FORECAST_ENSEMBLE_MODE
+    for the ensemble algorithm.
+    reconciliation: 'none', 'bottom_up', 'top_down' or 'mint', overrides
+    FORECAST_RECONCILIATION (see hierarchy).
+    granularity / disaggregate: 'day', 'week' or 'month' and whether period
+    forecasts are split back into days, override FORECAST_GRANULARITY /
+    FORECAST_DISAGGREGATE (see aggregation).
+    fill: gap fill policy of daily history ('zero', 'ffill', 'interpolate' or
+    'none'), overrides FORECAST_FILL_POLICY (see alignment).
+    job: ForecastJob the created forecasts belong to, if run from the queue.
+
+    progress: optional callable(done=, skipped=, failed=, total=) invoked
+    as each chunk is written (or fitted, ahead of reconciliation) and
+    periodically during XGBoost training; an exception it raises aborts the run.
+    Returns a summary dict with created forecast ids, skipped products,
+    failure count, persistence stats, the reconciled hierarchy totals and
+    the number of products routed to the intermittent-demand engines.
+    """
+    if product_ids:
+        products = list(Product.objects.filter(id__in=product_ids))
+    else:
+        products = list(Product.objects.all())
+
+    forecast_date = timezone.now().date()
+    hierarchy_config = hierarchy_settings(reconciliation)
+    granularity, disaggregate = aggregation_settings(granularity, disaggregate)
+    fill = fill_policy(fill)
+    aggregation = None
+    if granularity != 'day':
+        if algorithm == 'xgboost' or hierarchy_config['method'] != 'none':
+            raise ValueError("XGBoost and hierarchical reconciliation need daily granularity")
+        aggregation = TemporalAggregation(granularity, forecast_date, horizon, disaggregate=disaggregate)
+
+    # States are kept with the configured fill policy; an override reads history instead
+    use_state = (algorithm in STATE_ALGORITHMS and incremental_state_enabled() and aggregation is None
+                 and fill == fill_policy())
+    if use_state:
+        # Cheap methods run from the incrementally maintained state, no history scan
+        states = load_states(products)
+        counts = {pid: state.n_records for pid, state in states.items()}
+    else:
+        history_ids = [p.id for p in products] if product_ids else None
+        history = read_bucketed_history(aggregation, history_ids) if aggregation else read_history(history_ids)
+        counts = history_counts(history)
+    # Each chunk is laid on a dense daily grid once (see alignment); period buckets are left as they are
+    align = 'none' if aggregation else fill
+
+    def chunk_panel(chunk):
+        return None if use_state else AlignedPanel(history, [p.id for p in chunk], align)
+
+    skipped_products = []
+    eligible = []
+    for product in products:
+        hist_count = counts.get(product.id, 0)
+        if hist_count < MIN_HISTORY_RECORDS:
+            skipped_products.append({
+                'product': product.name,
+                'reason': f'Insufficient historical data ({hist_count} records, need at least {MIN_HISTORY_RECORDS})'
+            })
+        else:
+            eligible.append(product)
+
+    use_pool = algorithm not in PANEL_ALGORITHMS + INTERMITTENT_ALGORITHMS and parallel_enabled(parallel)
+    ensemble_config = weighted_ensemble.ensemble_settings(ensemble_mode)
+    intermittent_config = intermittent.intermittent_settings()
+    route_intermittent = algorithm == 'ensemble' and intermittent_config['enabled'] and aggregation is None
+    weighted = algorithm == 'ensemble' and ensemble_config['mode'] == 'weighted'
+    model_cache = default_model_cache()
+    # One process pool serves every chunk of the run
+    pool = WorkerPool() if use_pool else None
+
+    created_forecasts = []
+    failed = 0
+    routed_count = 0
+    chunk_size = generation_chunk_size()
+    run_backtest, backtest_folds, backtest_horizon = backtest_settings()
+    run_quantiles, quantile_levels, interval = quantile_settings()
+    # Engines forecast periods when aggregating; residual quantiles need daily history
+    model_horizon = horizon
+    if aggregation:
+        model_horizon = aggregation.n_periods
+        backtest_horizon = aggregation.periods(backtest_horizon)
+        run_quantiles = False
+    # Residual quantiles need the full series; the state path keeps its fixed-multiplier bounds
+    if use_state:
+        run_quantiles = False
+
+    def report():
+        if progress:
+            progress(done=len(created_forecasts), skipped=len(skipped_products),
+                     failed=failed, total=len(products))
+
+    holdout = backtest_horizon if run_backtest else None
+    # The incremental state path never scans history, so it keeps the state's own error estimates
+    use_backtest = run_backtest and not weighted and not use_state and algorithm not in HOLDOUT_SCORED_ALGORITHMS
+
+    writer = ForecastWriter(batch_size=batch_size)
+    pending = create_pending_forecasts(eligible, algorithm, forecast_date, horizon, batch_size=batch_size, job=job)
+    try:
+        # Hierarchy: long-tail SKUs (and every SKU in top_down mode) skip per-SKU fits
+        reconciler = None
+        fitted = eligible
+        if hierarchy_config['method'] != 'none' and eligible:
+            reconciler = HierarchyReconciler(eligible, method=hierarchy_config['method'], algorithm=algorithm,
+                                             share_days=hierarchy_config['share_days'], fill=fill)
+            if hierarchy_config['method'] == 'top_down':
+                fitted = []
+            else:
+                fitted = [p for p in eligible if counts.get(p.id, 0) >= hierarchy_config['top_down_max_records']]
+
+        catalog_results = {}
+        if algorithm == 'xgboost' and fitted:
+            # One global model for every fitted product, trained before the chunks are written
+            # Training reports progress as a heartbeat; it can outlast the stale-job timeout
+            catalog_results = forecast_catalog(chunk_panel(fitted), horizon_days=horizon, holdout=holdout,
+                                               heartbeat=report)
+            untrained = sum(1 for result in catalog_results.values() if result is None)
+            if untrained:
+                logger.info(f"XGBoost: {untrained} products lack training history, using the ensemble for them")
+
+        def fit_chunk(chunk, panel):
+            """Base forecasts with error metrics for one chunk and its AlignedPanel -> (results, errors)"""
+            nonlocal routed_count
+            routed = {}
+            if route_intermittent:
+                # Intermittent / lumpy series skip the ensemble and its expensive fits
+                methods = intermittent.route_chunk(panel, chunk, intermittent_config)
+                if methods:
+                    routed = intermittent.forecast_chunk(
+                        panel, [p for p in chunk if p.id in methods], methods, model_horizon, backtest_folds, holdout)
+                    routed_count += len(routed)
+                    chunk = [p for p in chunk if p.id not in methods]
+                    if not chunk:
+                        return routed, {}
+            chunk_ids = [p.id for p in chunk]
+            panel_results = {}
+            expensive_results = {}
+            if catalog_results:
+                panel_results = {pid: catalog_results[pid] for pid in chunk_ids if catalog_results[pid] is not None}
+            elif use_state:
+                panel_results = {
+                    pid: forecast_from_state(states[pid], algorithm, horizon_days=model_horizon)
+                    for pid in chunk_ids
+                }
+            elif algorithm in PANEL_ALGORITHMS:
+                # Cheap methods are computed for the whole chunk in one vectorized pass
+                matrix, mask, _ = panel.rows(chunk_ids)
+                results = PanelForecaster(matrix, mask).forecast(algorithm=algorithm, horizon_days=model_horizon)
+                panel_results = dict(zip(chunk_ids, results))
+            elif algorithm in INTERMITTENT_ALGORITHMS:
+                matrix, mask, _ = panel.rows(chunk_ids)
+                results = forecast_intermittent(matrix, mask, method=algorithm, horizon_days=model_horizon)
+                panel_results = dict(zip(chunk_ids, results))
+            elif weighted:
+                # Learned member weights; the results already carry backtest metrics
+                panel_results = weighted_ensemble.forecast_chunk(
+                    panel, chunk, model_horizon, backtest_folds, backtest_horizon,
+                    pool=pool, model_cache=model_cache, config=ensemble_config,
+                )
+            elif use_pool:
+                # Holt-Winters / Prophet (or ARIMA) fits run in the process pool
+                members = [['arima']] * len(chunk_ids) if algorithm == 'arima' else None
+                fits = fit_expensive_models(
+                    [panel.series(pid) for pid in chunk_ids], model_horizon,
+                    product_ids=chunk_ids, model_cache=model_cache, members=members, holdout=holdout,
+                    pool=pool,
+                )
+                expensive_results = dict(zip(chunk_ids, fits))
+
+            # Real error metrics replace the engines' placeholder ones
+            metrics = {}
+            if use_backtest:
+                metrics = backtest_chunk(panel, chunk_ids, algorithm, backtest_folds, backtest_horizon)
+
+            results, errors = {}, {}
+            for product in chunk:
+                try:
+                    if product.id in panel_results:
+                        result = panel_results[product.id]
+                    else:
+                        dates, quantities = panel.series(product.id)
+                        forecaster = DemandForecaster.from_arrays(
+                            dates, quantities, product_id=product.id, model_cache=model_cache)
+                        if algorithm == 'xgboost':
+                            # Too short for the global model: the cheap ensemble members stand in
+                            result = forecaster.forecast(algorithm='ensemble', horizon_days=model_horizon,
+                                                         expensive_results={})
+                            result['algorithm'] = 'ensemble'
+                        else:
+                            result = forecaster.forecast(
+                                algorithm=algorithm,
+                                horizon_days=model_horizon,
+                                expensive_results=expensive_results.get(product.id),
+                                holdout=holdout,
+                            )
+                    results[product.id] = {**result, **metrics.get(product.id, {})}
+                except Exception as e:
+                    logger.error(f"Forecast generation error for {product.name}: {str(e)}")
+                    errors[product.id] = str(e)
+            results.update(routed)
+            return results, errors
+
+        def write_chunk(chunk, results, errors, panel):
+            """Apply quantiles to one chunk's results, persist them and report progress"""
+            nonlocal failed
+            chunk_ids = [p.id for p in chunk]
+            if aggregation:
+                results = aggregation.expand(results, chunk_ids)
+
+            # Empirical residual intervals and lead-time quantiles replace the fixed multipliers
+            quantiles = None
+            if run_quantiles:
+                matrix, mask, _ = panel.rows(chunk_ids)
+                algorithms = [results.get(pid, {}).get('algorithm', algorithm) for pid in chunk_ids]
+                quantiles = ResidualQuantiles(matrix, mask, algorithms, [p.lead_time_days for p in chunk],
+                                              levels=quantile_levels, interval=interval)
+
+            for i, product in enumerate(chunk):
+                forecast = pending[product.id]
+                error = errors.get(product.id)
+                if error is None:
+                    try:
+                        result = results[product.id]
+                        if quantiles:
+                            result = quantiles.apply(i, result)
+                        writer.add(product, result.get('algorithm', algorithm), forecast_date, horizon, result,
+                                   forecast=forecast)
+                        created_forecasts.append(forecast.id)
+                        continue
+                    except Exception as e:
+                        logger.error(f"Forecast generation error for {product.name}: {str(e)}")
+                        error = str(e)
+                writer.add_failed(product, algorithm, forecast_date, error, forecast=forecast)
+                failed += 1
+
+            # Reported before the write, so a job reclaimed in the meantime stops without writing
+            report()
+            writer.flush()
+
+        report()
+        if reconciler is None:
+            for start in range(0, len(eligible), chunk_size):
+                chunk = eligible[start:start + chunk_size]
+                mark_generating([pending[p.id] for p in chunk])
+                panel = chunk_panel(chunk)
+                write_chunk(chunk, *fit_chunk(chunk, panel), panel)
+        else:
+            # Every base forecast is needed before reconciling, so fit all chunks first
+            base, errors = {}, {}
+            for start in range(0, len(fitted), chunk_size):
+                chunk = fitted[start:start + chunk_size]
+                mark_generating([pending[p.id] for p in chunk])
+                results, chunk_errors = fit_chunk(chunk, chunk_panel(chunk))
+                base.update(results)
+                errors.update(chunk_errors)
+                # Nothing is written until every chunk is fitted; keep the job's heartbeat going
+                report()
+            fitted_ids = {p.id for p in fitted}
+            mark_generating([pending[p.id] for p in eligible if p.id not in fitted_ids])
+
+            sku_panel = None
+            if hierarchy_config['method'] == 'mint':
+                eligible_ids = [p.id for p in eligible]
+                sku_panel = AlignedPanel(read_history(product_ids=eligible_ids) if use_state else history,
+                                         eligible_ids, fill)
+            reconciled = reconciler.reconcile(base, horizon, panel=sku_panel)
+            for start in range(0, len(eligible), chunk_size):
+                chunk = eligible[start:start + chunk_size]
+                write_chunk(chunk, reconciled, errors, chunk_panel(chunk) if run_quantiles else None)
+    except Exception as e:
+        # Nothing else would move the rows this run inserted out of pending / generating
+        ids = [f.id for f in pending.values()]
+        for start in range(0, len(ids), chunk_size):
+            fail_open_forecasts(Forecast.objects.filter(id__in=ids[start:start + chunk_size]),
+                                f"Forecast generation aborted: {str(e)}")
+        raise
+    finally:
+        if pool is not None:
+            pool.close()
+
+    cache_stats = None
+    if model_cache:
+        cache_stats = model_cache.counters()
+        model_cache.save_stats()
+
+    return {
+        'created_forecasts': created_forecasts,
+        'skipped': skipped_products,
+        'failed': failed,
+        'total_products': len(products),
+        'persistence': writer.stats(),
+        'model_cache': cache_stats,
+        'hierarchy': reconciler.summary() if reconciler else None,
+        'routed_intermittent': routed_count,
+        'granularity': granularity,
+    }
@@ -0,0 +1,239 @@
+"""
+Catalog-wide XGBoost forecaster (optional, needs xgboost).
+
+One gradient-boosted model is trained across every product instead of one
+model per SKU. Features are built for the whole (products x days) panel in
+one vectorized pass:
+
+  * demand lags (LAGS days back) and trailing means (WINDOWS), all scaled by
+    the product's mean demand so products of different volume share trees;
+  * day of week and the product's log mean demand;
+  * numeric HistoricalDemand.external_factors, one column per factor name
+    (missing values, including every future day, are left to XGBoost's
+    missing-value handling).
+
+Training uses the multithreaded CPU `hist` tree method. The horizon is
+forecast recursively, one day at a time for all products at once, feeding
+predictions back in as lags. Intervals come from each product's in-sample
+residual RMSE. With a holdout, a first model trained without the last
+`holdout` days scores every product before the final model is fitted.
+Products with no training row (fewer than MIN_TRAIN_COL + 1 days in the
+training window) get no result; the caller forecasts them another way.
+An optional heartbeat callable is invoked at most every HEARTBEAT_SECONDS
+during training and prediction, so long runs keep a queued job alive.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .backtest import metric_dicts, score_forecasts
+from .history import factor_matrix, load_external_factors
+
+try:
+    import xgboost as xgb
+    HAS_XGBOOST = True
+except ImportError:
+    HAS_XGBOOST = False
+
+logger = logging.getLogger(__name__)
+
+LAGS = (1, 2, 7, 14, 28)
+WINDOWS = (7, 28)
+MIN_TRAIN_COL = 7  # days a product needs before its first training row
+INTERVAL_Z = 1.2816  # 80% prediction intervals
+HEARTBEAT_SECONDS = 30
+
+
+def xgboost_settings():
+    """Booster parameters and training size limits from settings"""
+    return {
+        'rounds': getattr(settings, 'FORECAST_XGBOOST_ROUNDS', 200),
+        'max_depth': getattr(settings, 'FORECAST_XGBOOST_MAX_DEPTH', 6),
+        'learning_rate': getattr(settings, 'FORECAST_XGBOOST_LEARNING_RATE', 0.1),
+        'threads': getattr(settings, 'FORECAST_XGBOOST_THREADS', 0) or os.cpu_count(),
+        'train_days': getattr(settings, 'FORECAST_XGBOOST_TRAIN_DAYS', 180),
+    }
+
+
+def _require_xgboost():
+    if not HAS_XGBOOST:
+        raise RuntimeError("xgboost is required for XGBoost forecasts (pip install xgboost)")
+
+
+class _Heartbeat:
+    """Calls `beat` when HEARTBEAT_SECONDS have passed since the last call"""
+
+    def __init__(self, beat=None):
+        self.beat = beat
+        self.last = time.monotonic()
+
+    def __call__(self):
+        if self.beat and time.monotonic() - self.last >= HEARTBEAT_SECONDS:
+            self.beat()
+            self.last = time.monotonic()
+
+
+if HAS_XGBOOST:
+    class _TrainingHeartbeat(xgb.callback.TrainingCallback):
+        def __init__(self, heartbeat):
+            super().__init__()
+            self.heartbeat = heartbeat
+
+        def after_iteration(self, model, epoch, evals_log):
+            self.heartbeat()
+            return False
+
+
+class GlobalXGBoostForecaster:
+    """One XGBoost model over a (products x days) demand panel"""
+
+    def __init__(self, matrix, mask, start_date, factors=None, config=None, heartbeat=None):
+        """
+        matrix / mask / start_date: a history_matrix() or AlignedPanel.rows() result
+        factors: optional (n_series, n_days, n_factors) factor_matrix() array
+        heartbeat: optional callable invoked periodically while training / predicting
+        """
+        _require_xgboost()
+        self.config = config or xgboost_settings()
+        self.heartbeat = _Heartbeat(heartbeat)
+        mask = np.asarray(mask, dtype=bool)
+        self.values = np.where(mask, matrix, np.nan).astype(np.float32)
+        self.mask = mask
+        self.start_date = start_date
+        n_series, n_days = self.values.shape
+        self.factors = factors if factors is not None else np.full((n_series, n_days, 0), np.nan, np.float32)
+        self.first_col = np.where(mask.any(axis=1), mask.argmax(axis=1), n_days)
+
+    def _features(self, z, cols, level, first=0):
+        """
+        Features of columns `cols` of the scaled panel `z`, (n_series, len(cols), n_features).
+
+        z may be a slice of the panel starting at column `first`; only columns
+        before each target feed its lags and windows.
+        """
+        n_series = z.shape[0]
+        pad = max(LAGS + WINDOWS)
+        padded = np.concatenate((np.full((n_series, pad), np.nan, np.float32), z), axis=1)
+        observed = np.isfinite(padded)
+        csum = np.concatenate((np.zeros((n_series, 1)), np.cumsum(np.where(observed, padded, 0), axis=1)), axis=1)
+        ccount = np.concatenate((np.zeros((n_series, 1)), np.cumsum(observed, axis=1)), axis=1)
+        at = cols - first + pad  # column of each target in the padded slice
+
+        features = [padded[:, at - k] for k in LAGS]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for w in WINDOWS:
+                count = ccount[:, at] - ccount[:, at - w]
+                features.append(np.where(count > 0, (csum[:, at] - csum[:, at - w]) / count, np.nan))
+        day = self.start_date + cols.astype('timedelta64[D]')
+        dow = (day.astype('datetime64[D]').astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        features.append(np.broadcast_to(dow[None, :], (n_series, len(cols))))
+        features.append(np.broadcast_to(np.log1p(level)[:, None], (n_series, len(cols))))
+
+        known = cols < self.factors.shape[1]
+        factor_cols = np.full((n_series, len(cols), self.factors.shape[2]), np.nan, np.float32)
+        factor_cols[:, known] = self.factors[:, cols[known]]
+        return np.concatenate(
+            [np.stack(features, axis=2).astype(np.float32), factor_cols], axis=2)
+
+    def _train(self, end):
+        """
+        Fit on columns < end; returns (booster, per-series level, per-series
+        residual rmse, per-series flag of having any training row)
+        """
+        observed = self.mask[:, :end]
+        count = observed.sum(axis=1)
+        level = np.where(observed, self.values[:, :end], 0).sum(axis=1) / np.maximum(count, 1)
+        scale = np.maximum(level, 1.0)
+        z = self.values[:, :end] / scale[:, None]
+
+        cols = np.arange(max(0, end - self.config['train_days']), end)
+        X = self._features(z, cols, level)
+        target = z[:, cols]
+        rows = np.isfinite(target) & (cols[None, :] >= (self.first_col + MIN_TRAIN_COL)[:, None])
+        if not rows.any():
+            raise ValueError("Not enough history to train the XGBoost model")
+
+        params = {
+            'objective': 'reg:squarederror',
+            'tree_method': 'hist',
+            'device': 'cpu',
+            'max_depth': self.config['max_depth'],
+            'learning_rate': self.config['learning_rate'],
+            'nthread': self.config['threads'],
+        }
+        train = xgb.QuantileDMatrix(X[rows], label=target[rows], missing=np.nan, nthread=self.config['threads'])
+        booster = xgb.train(params, train, num_boost_round=self.config['rounds'],
+                            callbacks=[_TrainingHeartbeat(self.heartbeat)])
+
+        # In-sample residual RMSE per series, in demand units, for the intervals
+        residual = np.full(target.shape, np.nan, np.float32)
+        residual[rows] = (booster.inplace_predict(X[rows]) - target[rows])
+        sq = np.where(rows, residual ** 2, 0).sum(axis=1)
+        n = rows.sum(axis=1)
+        rmse = np.where(n > 0, np.sqrt(sq / np.maximum(n, 1)), 0.0) * scale
+        return booster, level, rmse, n > 0
+
+    def _predict(self, booster, end, level, horizon_days):
+        """Recursive forecast of the `horizon_days` columns from `end`, in demand units"""
+        scale = np.maximum(level, 1.0)
+        z = np.concatenate(
+            (self.values[:, :end] / scale[:, None], np.full((len(scale), horizon_days), np.nan, np.float32)),
+            axis=1)
+        pad = max(LAGS + WINDOWS)
+        for h in range(horizon_days):
+            # Only the trailing `pad` columns feed the features of the next day
+            first = max(0, end + h - pad)
+            X = self._features(z[:, first:end + h + 1], np.array([end + h]), level, first=first)[:, 0]
+            z[:, end + h] = np.maximum(booster.inplace_predict(X), 0)
+            self.heartbeat()
+        return z[:, end:] * scale[:, None]
+
+    def forecast(self, horizon_days=30, holdout=None):
+        """
+        One result dict per series, None for series without training history;
+        metrics come from the holdout (None without one)
+        """
+        n_series, n_days = self.values.shape
+        scores = score_forecasts(np.zeros((n_series, 0)), None, None)
+        if holdout and n_days > holdout:
+            end = n_days - holdout
+            try:
+                booster, level, _, _ = self._train(end)
+                predicted = self._predict(booster, end, level, holdout)
+                actual = self.values[:, end:]
+                scores = score_forecasts(predicted, np.nan_to_num(actual), np.isfinite(actual))
+            except ValueError as e:
+                logger.warning(f"XGBoost holdout skipped: {str(e)}")
+
+        try:
+            booster, level, rmse, trained = self._train(n_days)
+        except ValueError as e:
+            logger.warning(f"XGBoost model not trained: {str(e)}")
+            return [None] * n_series
+        forecast = self._predict(booster, n_days, level, horizon_days)
+        width = INTERVAL_Z * rmse[:, None]
+        lower = np.maximum(forecast - width, 0)
+        upper = forecast + width
+        metrics = metric_dicts(scores)
+        return [
+            {'forecast': forecast[i], 'lower_bound': lower[i], 'upper_bound': upper[i], **metrics[i]}
+            if trained[i] else None
+            for i in range(n_series)
+        ]
+
+
+def forecast_catalog(panel, horizon_days=30, holdout=None, heartbeat=None):
+    """
+    Train one model over an AlignedPanel's products and forecast them all, {product_id: result or None}
+
+    heartbeat: optional callable invoked periodically during the run (see the module docstring)
+    """
+    _require_xgboost()
+    product_ids = panel.product_ids
+    matrix, mask, start = panel.matrix, panel.mask, panel.start
+    factors = factor_matrix(load_external_factors(product_ids), product_ids, start, matrix.shape[1])
+    model = GlobalXGBoostForecaster(matrix, mask, start, factors, heartbeat=heartbeat)
+    return dict(zip(product_ids, model.forecast(horizon_days=horizon_days, holdout=holdout)))
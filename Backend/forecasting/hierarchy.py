@@ -0,0 +1,228 @@
+"""
+Hierarchical forecasting over Product.category.
+
+The hierarchy has three levels: the total, each category and each SKU.
+Category demand comes from one grouped HistoricalDemand query (daily sums per
+category, the total being their sum) and both aggregate levels are forecast
+with the panel engine. SKU base forecasts come from the normal pipeline, and
+the levels are then reconciled so that SKUs add up to their category and
+categories to the total:
+
+  * bottom_up: SKU forecasts are kept and the aggregates are their sums;
+  * top_down: each category forecast is split over its SKUs by their share
+    of the category's demand over the last FORECAST_TOP_DOWN_SHARE_DAYS
+    days, so no per-SKU model is fitted at all;
+  * mint: minimum-trace reconciliation with W the diagonal of one-step
+    residual variances (WLS):  y~ = y^ - W C' (C W C')^-1 C y^, where
+    C = [I | -A] and A is the sparse (aggregates x SKUs) summing matrix.
+    C W C' is only (categories + 1) square, so this scales with the catalog.
+
+SKUs with fewer than FORECAST_TOP_DOWN_MAX_RECORDS history records (the long
+tail) skip per-SKU fits in every mode and start from their top-down share.
+Reconciled SKU forecasts are clipped at zero and their bounds move with them.
+"""
+import warnings
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+
+from .alignment import fill_gaps
+from .models import HistoricalDemand
+from .panel import PanelForecaster, PANEL_ALGORITHMS
+from .quantiles import one_step_residuals
+
+try:
+    import scipy.sparse as sparse
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+RECONCILIATION_METHODS = ('none', 'bottom_up', 'top_down', 'mint')
+DEFAULT_SHARE_DAYS = 90
+PATH_FIELDS = ('forecast', 'lower_bound', 'upper_bound')
+METRIC_FIELDS = ('mae', 'rmse', 'mape', 'accuracy')
+
+
+def hierarchy_settings(method=None):
+    """Reconciliation configuration; `method` overrides FORECAST_RECONCILIATION"""
+    config = {
+        'method': method or getattr(settings, 'FORECAST_RECONCILIATION', 'none'),
+        'top_down_max_records': getattr(settings, 'FORECAST_TOP_DOWN_MAX_RECORDS', 0),
+        'share_days': getattr(settings, 'FORECAST_TOP_DOWN_SHARE_DAYS', DEFAULT_SHARE_DAYS),
+    }
+    if config['method'] not in RECONCILIATION_METHODS:
+        raise ValueError(
+            f"Reconciliation must be one of {', '.join(RECONCILIATION_METHODS)}, got '{config['method']}'")
+    return config
+
+
+def load_category_history(product_ids):
+    """
+    Daily demand per category of these products, from one grouped query.
+
+    Returns (categories, matrix, mask, start_date) on a shared daily grid,
+    like history_matrix.
+    """
+    rows = list(
+        HistoricalDemand.objects.filter(product_id__in=list(product_ids))
+        .values_list('product__category', 'date')
+        .annotate(total=Sum('quantity_demanded'))
+        .order_by()
+    )
+    categories = sorted({category for category, _, _ in rows})
+    if not rows:
+        return categories, np.zeros((0, 0)), np.zeros((0, 0), dtype=bool), None
+    row_of = {category: i for i, category in enumerate(categories)}
+    dates = np.array([d for _, d, _ in rows], dtype='datetime64[D]')
+    start = dates.min()
+    cols = (dates - start).astype(np.int64)
+    matrix = np.zeros((len(categories), int(cols.max()) + 1))
+    mask = np.zeros(matrix.shape, dtype=bool)
+    category_rows = np.array([row_of[category] for category, _, _ in rows])
+    matrix[category_rows, cols] = [total for _, _, total in rows]
+    mask[category_rows, cols] = True
+    return categories, matrix, mask, start
+
+
+def load_demand_totals(product_ids, since):
+    """Total demand per product since `since`, from one grouped query"""
+    return dict(
+        HistoricalDemand.objects.filter(product_id__in=list(product_ids), date__gte=since)
+        .values_list('product_id')
+        .annotate(total=Sum('quantity_demanded'))
+        .order_by()
+    )
+
+
+class HierarchyReconciler:
+    """Total / category / SKU hierarchy of one generation run"""
+
+    def __init__(self, products, method='bottom_up', algorithm='ensemble', share_days=DEFAULT_SHARE_DAYS,
+                 fill='none'):
+        if method == 'mint' and not HAS_SCIPY:
+            raise RuntimeError("scipy is required for MinT reconciliation (pip install scipy)")
+        self.method = method
+        self.algorithm = algorithm
+        self.ids = [p.id for p in products]
+        self.categories = sorted({p.category for p in products})
+        index = {category: i for i, category in enumerate(self.categories)}
+        self.sku_category = np.array([index[p.category] for p in products], dtype=np.int64)
+        n_skus, n_categories = len(self.ids), len(self.categories)
+
+        # Aggregate series: row 0 is the total, row 1 + c category c
+        categories, matrix, mask, start = load_category_history(self.ids)
+        rows = np.array([index[category] for category in categories], dtype=np.int64)
+        category_matrix = np.zeros((n_categories, matrix.shape[1]))
+        category_mask = np.zeros(category_matrix.shape, dtype=bool)
+        category_matrix[rows] = matrix
+        category_mask[rows] = mask
+        category_matrix, category_mask = fill_gaps(category_matrix, category_mask, fill)
+        self.agg_matrix = np.vstack((category_matrix.sum(axis=0), category_matrix))
+        self.agg_mask = np.vstack((category_mask.any(axis=0), category_mask))
+
+        # Each SKU's share of its category's recent demand (equal shares for a silent category)
+        if start is not None:
+            end = (start + np.timedelta64(matrix.shape[1] - 1, 'D')).item()
+            totals = load_demand_totals(self.ids, end - timedelta(days=share_days - 1))
+        else:
+            totals = {}
+        sku_total = np.array([float(totals.get(pid, 0)) for pid in self.ids])
+        category_total = np.bincount(self.sku_category, weights=sku_total, minlength=n_categories)
+        category_size = np.bincount(self.sku_category, minlength=n_categories)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.shares = np.where(category_total[self.sku_category] > 0,
+                                   sku_total / category_total[self.sku_category],
+                                   1 / category_size[self.sku_category])
+
+        # Summing matrix: every SKU feeds the total and its category
+        self.summing = None
+        if HAS_SCIPY:
+            self.summing = sparse.csr_matrix(
+                (np.ones(2 * n_skus), (np.r_[np.zeros(n_skus, np.int64), 1 + self.sku_category],
+                                       np.r_[np.arange(n_skus), np.arange(n_skus)])),
+                shape=(n_categories + 1, n_skus))
+        self.aggregates = None
+        self.top_down_count = 0
+
+    def _aggregate_forecasts(self, horizon):
+        """Panel forecasts of the total and categories: the run's algorithm, or the cheap-member mean"""
+        panel = PanelForecaster(self.agg_matrix, self.agg_mask)
+        algorithms = [self.algorithm] if self.algorithm in PANEL_ALGORITHMS else PANEL_ALGORITHMS
+        runs = [panel.forecast(algorithm=a, horizon_days=horizon) for a in algorithms]
+        return {
+            field: np.mean([[np.asarray(r[field], dtype=np.float64) for r in run] for run in runs], axis=0)
+            for field in PATH_FIELDS
+        }
+
+    @staticmethod
+    def _variances(matrix, mask, algorithm):
+        """One-step residual variance per series; the mean level (Poisson-like) when untested"""
+        residuals = one_step_residuals(matrix, mask, algorithm)
+        enough = np.isfinite(residuals).sum(axis=1) >= 2
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN rows
+            variance = np.nanvar(residuals, axis=1) if residuals.shape[1] else np.zeros(len(matrix))
+        level = np.where(mask, matrix, 0).sum(axis=1) / np.maximum(mask.sum(axis=1), 1)
+        return np.where(enough & (variance > 0), variance, np.maximum(level, 1.0))
+
+    def _mint(self, sku_forecast, agg_forecast, panel):
+        """WLS minimum-trace reconciliation of SKU forecasts against the aggregate ones"""
+        sku_matrix, sku_mask, _ = panel.rows(self.ids)
+        w_skus = self._variances(sku_matrix, sku_mask, self.algorithm)
+        w_aggs = self._variances(self.agg_matrix, self.agg_mask, self.algorithm)
+        A = self.summing
+        cwc = np.diag(w_aggs) + (A @ sparse.diags(w_skus) @ A.T).toarray()
+        incoherence = agg_forecast - A @ sku_forecast
+        lam = np.linalg.solve(cwc, incoherence)
+        return sku_forecast + w_skus[:, None] * (A.T @ lam)
+
+    def reconcile(self, base, horizon, panel=None):
+        """
+        Coherent SKU forecasts.
+
+        base: {product_id: result} SKU base forecasts; SKUs without one (long
+        tail, top_down mode, failed fits) start from their top-down share
+        panel: AlignedPanel of the SKUs, used by mint
+        Returns {product_id: result} for every SKU of the hierarchy.
+        """
+        agg = self._aggregate_forecasts(horizon)
+        top_down = {field: self.shares[:, None] * agg[field][1 + self.sku_category] for field in PATH_FIELDS}
+        has_base = np.array([self.method != 'top_down' and pid in base for pid in self.ids], dtype=bool)
+        self.top_down_count = int((~has_base).sum())
+
+        paths = {field: top_down[field].copy() for field in PATH_FIELDS}
+        for i in np.flatnonzero(has_base):
+            for field in PATH_FIELDS:
+                paths[field][i] = base[self.ids[i]][field]
+
+        forecast = paths['forecast']
+        if self.method == 'mint' and len(self.ids):
+            forecast = np.maximum(self._mint(forecast, agg['forecast'], panel), 0)
+        shift = forecast - paths['forecast']
+        if self.summing is not None:
+            self.aggregates = self.summing @ forecast
+        else:
+            self.aggregates = np.vstack((forecast.sum(axis=0), [
+                forecast[self.sku_category == c].sum(axis=0) for c in range(len(self.categories))]))
+
+        results = {}
+        for i, pid in enumerate(self.ids):
+            result = dict(base[pid]) if has_base[i] else dict.fromkeys(METRIC_FIELDS)
+            result['forecast'] = forecast[i]
+            result['lower_bound'] = np.maximum(paths['lower_bound'][i] + shift[i], 0)
+            result['upper_bound'] = np.maximum(paths['upper_bound'][i] + shift[i], forecast[i])
+            results[pid] = result
+        return results
+
+    def summary(self):
+        """Method, top-down SKU count and the coherent horizon totals per level"""
+        summary = {'method': self.method, 'top_down_products': self.top_down_count}
+        if self.aggregates is not None:
+            totals = self.aggregates.sum(axis=1)
+            summary['total'] = round(float(totals[0]), 2)
+            summary['categories'] = {
+                category: round(float(total), 2) for category, total in zip(self.categories, totals[1:])
+            }
+        return summary
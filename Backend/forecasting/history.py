@@ -0,0 +1,142 @@
+"""
+Bulk loading of historical demand for forecast generation.
+
+Pulls the history of many products in one ordered query and groups it into
+per-product NumPy arrays, instead of one count + one values() query per product.
+"""
+import numpy as np
+
+from .models import HistoricalDemand
+
+HISTORY_CHUNK_SIZE = 5000
+MIN_HISTORY_RECORDS = 5
+
+
+def fetch_columns(queryset, chunk_size=HISTORY_CHUNK_SIZE):
+    """
+    Stream (product_id, date, quantity_demanded) for a HistoricalDemand
+    queryset, ordered by product and date, into three column arrays.
+    """
+    rows = (
+        queryset
+        .order_by('product_id', 'date')
+        .values_list('product_id', 'date', 'quantity_demanded')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    # Accumulate columns rather than per-row records
+    pids, dates, quantities = [], [], []
+    for pid, d, qty in rows:
+        pids.append(pid)
+        dates.append(d)
+        quantities.append(qty)
+
+    return (
+        np.array(pids, dtype=object),
+        np.array(dates, dtype='datetime64[D]'),
+        np.array(quantities, dtype=np.float64),
+    )
+
+
+def group_columns(pid_arr, date_arr, qty_arr):
+    """Split product-ordered columns into {product_id: (dates, quantities)}"""
+    if not len(pid_arr):
+        return {}
+    # Rows are ordered by product, so groups are contiguous runs
+    starts = np.concatenate(([0], np.flatnonzero(pid_arr[1:] != pid_arr[:-1]) + 1))
+    ends = np.append(starts[1:], len(pid_arr))
+    return {
+        pid_arr[s]: (date_arr[s:e], qty_arr[s:e])
+        for s, e in zip(starts, ends)
+    }
+
+
+def load_history(product_ids=None, chunk_size=HISTORY_CHUNK_SIZE):
+    """
+    Load demand history for the given products (all products if None).
+
+    Returns a dict {product_id: (dates, quantities)} where dates is a
+    datetime64[D] array and quantities a float64 array, both sorted by date.
+    Products without any history are absent from the result.
+    """
+    queryset = HistoricalDemand.objects.all()
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=list(product_ids))
+    return group_columns(*fetch_columns(queryset, chunk_size=chunk_size))
+
+
+def history_counts(history):
+    """Number of records per product in a load_history() result"""
+    return {pid: len(qty) for pid, (_, qty) in history.items()}
+
+
+def history_matrix(history, product_ids):
+    """
+    Arrange a load_history() result on a shared daily grid.
+
+    Returns (matrix, mask, start_date): matrix is (len(product_ids), n_days)
+    float64 demand, mask is True where a record exists and start_date is the
+    datetime64[D] of column 0.
+    """
+    series = [history.get(pid) for pid in product_ids]
+    present = [s for s in series if s is not None and len(s[0])]
+    if not present:
+        return np.zeros((len(product_ids), 0)), np.zeros((len(product_ids), 0), dtype=bool), None
+
+    start = min(d[0] for d, _ in present)
+    end = max(d[-1] for d, _ in present)
+    n_days = int((end - start).astype(int)) + 1
+
+    # One scatter over the concatenated series of every product
+    lengths = [0 if s is None else len(s[0]) for s in series]
+    rows = np.repeat(np.arange(len(product_ids)), lengths)
+    cols = (np.concatenate([d for d, _ in present]) - start).astype(np.int64)
+    matrix = np.zeros((len(product_ids), n_days))
+    mask = np.zeros((len(product_ids), n_days), dtype=bool)
+    matrix[rows, cols] = np.concatenate([q for _, q in present])
+    mask[rows, cols] = True
+    return matrix, mask, start
+
+
+def load_external_factors(product_ids=None):
+    """
+    Numeric external_factors of the given products (all products if None).
+
+    Returns {factor name: (product_ids, dates, values)} column arrays; booleans
+    count as 0 / 1 and non-numeric values are ignored.
+    """
+    queryset = HistoricalDemand.objects.exclude(external_factors={})
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=list(product_ids))
+    columns = {}
+    rows = queryset.values_list('product_id', 'date', 'external_factors').iterator(chunk_size=HISTORY_CHUNK_SIZE)
+    for pid, d, factors in rows:
+        for name, value in factors.items():
+            if isinstance(value, (bool, int, float)):
+                pids, dates, values = columns.setdefault(name, ([], [], []))
+                pids.append(pid)
+                dates.append(d)
+                values.append(float(value))
+    return {
+        name: (np.array(pids, dtype=object), np.array(dates, dtype='datetime64[D]'), np.array(values))
+        for name, (pids, dates, values) in sorted(columns.items())
+    }
+
+
+def factor_matrix(factors, product_ids, start_date, n_days):
+    """
+    Arrange load_external_factors() columns on the history_matrix() grid.
+
+    Returns a float32 (len(product_ids), n_days, n_factors) array, NaN where a
+    factor was not recorded.
+    """
+    out = np.full((len(product_ids), n_days, len(factors)), np.nan, dtype=np.float32)
+    if start_date is None or not factors:
+        return out
+    row_of = {pid: row for row, pid in enumerate(product_ids)}
+    for k, (pids, dates, values) in enumerate(factors.values()):
+        rows = np.array([row_of.get(pid, -1) for pid in pids], dtype=np.int64)
+        cols = (dates - start_date).astype(np.int64)
+        keep = (rows >= 0) & (cols >= 0) & (cols < n_days)
+        out[rows[keep], cols[keep], k] = values[keep]
+    return out
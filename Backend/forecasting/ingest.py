@@ -0,0 +1,185 @@
+"""
+Streaming ingestion of historical demand from CSV or NDJSON.
+
+Rows are parsed one line at a time, checked with lightweight validation
+instead of DRF serializers, mapped SKU -> product id through an in-memory
+dict and upserted on (product, date) with batched bulk_create calls. A bad
+row or a failed batch is reported and skipped without aborting the load.
+
+Accepted fields: sku or product (id), date (YYYY-MM-DD), quantity_demanded,
+actual_sales (defaults to quantity_demanded) and optional external_factors
+(JSON object; a JSON string in CSV).
+"""
+import csv
+import json
+import logging
+from datetime import date
+
+from django.db import transaction
+
+from .models import Product, HistoricalDemand
+from .state import record_demand
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_ERRORS_PER_BATCH = 50
+FORMATS = ('csv', 'ndjson')
+
+
+class RowError(ValueError):
+    """A single input row failed validation"""
+
+
+def iter_csv_rows(lines):
+    """Yield (line_number, dict) from an iterable of CSV text lines"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_ndjson_rows(lines):
+    """Yield (line_number, dict) from an iterable of NDJSON text lines"""
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, RowError(f'Invalid JSON: {str(e)}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError('Expected a JSON object')
+            continue
+        yield line_number, row
+
+
+def _non_negative_int(row, name, default=None):
+    value = row.get(name)
+    if value in (None, ''):
+        if default is None:
+            raise RowError(f'{name} is required')
+        return default
+    try:
+        number = float(value) if isinstance(value, str) else value
+        # "3" and 3.0 are fine, "3.7" or true are not silently truncated
+        if isinstance(number, bool) or not float(number).is_integer():
+            raise ValueError(value)
+        number = int(number)
+    except (TypeError, ValueError, OverflowError):
+        raise RowError(f'{name} must be an integer')
+    if number < 0:
+        raise RowError(f'{name} must be >= 0')
+    return number
+
+
+class DemandIngester:
+    """Validates rows and upserts them into HistoricalDemand in batches"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.sku_map = dict(Product.objects.values_list('sku', 'id'))
+        self.product_ids = {str(pid): pid for pid in self.sku_map.values()}
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_rejected = 0
+        self.batches = []
+
+    def _to_instance(self, row):
+        sku = row.get('sku')
+        if sku:
+            product_id = self.sku_map.get(str(sku).strip())
+            if product_id is None:
+                raise RowError(f'Unknown SKU {sku!r}')
+        elif row.get('product'):
+            product_id = self.product_ids.get(str(row['product']).strip())
+            if product_id is None:
+                raise RowError(f"Unknown product {row['product']!r}")
+        else:
+            raise RowError('sku or product is required')
+
+        try:
+            day = date.fromisoformat(str(row.get('date', '')).strip())
+        except ValueError:
+            raise RowError('date must be YYYY-MM-DD')
+
+        quantity = _non_negative_int(row, 'quantity_demanded')
+        sales = _non_negative_int(row, 'actual_sales', default=quantity)
+
+        factors = row.get('external_factors') or {}
+        if isinstance(factors, str):
+            try:
+                factors = json.loads(factors)
+            except ValueError:
+                raise RowError('external_factors must be a JSON object')
+        if not isinstance(factors, dict):
+            raise RowError('external_factors must be a JSON object')
+
+        return HistoricalDemand(
+            product_id=product_id,
+            date=day,
+            quantity_demanded=quantity,
+            actual_sales=sales,
+            external_factors=factors,
+        )
+
+    def ingest(self, rows):
+        """Consume (line_number, row) pairs; returns the load report"""
+        pending = {}
+        errors = []
+        for line_number, row in rows:
+            self.rows_read += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                instance = self._to_instance(row)
+            except RowError as e:
+                self.rows_rejected += 1
+                if len(errors) < MAX_ERRORS_PER_BATCH:
+                    errors.append({'line': line_number, 'error': str(e)})
+                continue
+            # Later rows for the same (product, date) win within a batch
+            pending[(instance.product_id, instance.date)] = instance
+            if len(pending) >= self.batch_size:
+                self._write_batch(list(pending.values()), errors)
+                pending, errors = {}, []
+        if pending or errors:
+            self._write_batch(list(pending.values()), errors)
+        return self.report()
+
+    def _write_batch(self, instances, errors):
+        batch = {'batch': len(self.batches) + 1, 'rows': len(instances), 'written': 0, 'errors': errors}
+        if instances:
+            try:
+                with transaction.atomic():
+                    HistoricalDemand.objects.bulk_create(
+                        instances,
+                        update_conflicts=True,
+                        unique_fields=['product', 'date'],
+                        update_fields=['quantity_demanded', 'actual_sales', 'external_factors'],
+                    )
+                    record_demand(instances)
+                batch['written'] = len(instances)
+                self.rows_written += len(instances)
+            except Exception as e:
+                logger.error(f"Historical demand ingest batch {batch['batch']} failed: {str(e)}")
+                self.rows_rejected += len(instances)
+                batch['errors'] = errors + [{'line': None, 'error': f'Batch failed: {str(e)}'}]
+        self.batches.append(batch)
+
+    def report(self):
+        return {
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'rows_rejected': self.rows_rejected,
+            'batches': self.batches,
+        }
+
+
+def ingest_lines(lines, file_format='csv', batch_size=DEFAULT_BATCH_SIZE):
+    """Parse and load an iterable of text lines in the given format"""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported format '{file_format}', expected one of {', '.join(FORMATS)}")
+    rows = iter_csv_rows(lines) if file_format == 'csv' else iter_ndjson_rows(lines)
+    return DemandIngester(batch_size=batch_size).ingest(rows)
@@ -0,0 +1,136 @@
+"""
+Demand classification and the intermittent-demand fast path.
+
+Each product's series is classified in one vectorized pass over the demand
+matrix with the Syntetos-Boylan scheme:
+
+  * ADI, the average number of periods between non-zero demands;
+  * CV², the squared coefficient of variation of the non-zero demands;
+
+    smooth (ADI < 1.32, CV² < 0.49), erratic (ADI < 1.32, CV² >= 0.49),
+    intermittent (ADI >= 1.32, CV² < 0.49), lumpy (ADI >= 1.32, CV² >= 0.49).
+
+Periods are days on the aligned daily grid (see alignment), as for every
+other engine. Intermittent and lumpy products skip the ensemble (and its
+Holt-Winters / Prophet fits) and are forecast with the vectorized Croston family in ml_engine: SBA for
+intermittent and TSB for lumpy series by default (FORECAST_INTERMITTENT_METHOD).
+Classes are kept in DemandClassification, so later runs route products
+without reclassifying them until FORECAST_DEMAND_RECLASSIFY_DAYS have passed.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .backtest import RollingOriginBacktester
+from .ml_engine import INTERMITTENT_ALGORITHMS, forecast_intermittent
+from .models import DemandClassification
+
+logger = logging.getLogger(__name__)
+
+ADI_CUTOFF = 1.32
+CV2_CUTOFF = 0.49
+ROUTED_CLASSES = ('intermittent', 'lumpy')
+AUTO_METHODS = {'intermittent': 'sba', 'lumpy': 'tsb'}
+
+
+def intermittent_settings():
+    """Routing configuration from settings"""
+    config = {
+        'enabled': getattr(settings, 'FORECAST_INTERMITTENT_ROUTING', True),
+        'method': getattr(settings, 'FORECAST_INTERMITTENT_METHOD', 'auto'),
+        'reclassify_days': getattr(settings, 'FORECAST_DEMAND_RECLASSIFY_DAYS', 7),
+    }
+    if config['method'] != 'auto' and config['method'] not in INTERMITTENT_ALGORITHMS:
+        raise ValueError(
+            f"FORECAST_INTERMITTENT_METHOD must be 'auto' or one of {', '.join(INTERMITTENT_ALGORITHMS)}, "
+            f"got '{config['method']}'")
+    return config
+
+
+def classify_demand(matrix, mask=None):
+    """
+    ADI / CV² classes of every series of a (series x days) panel.
+
+    Returns (classes, adi, cv2) arrays; adi is inf for series without any
+    demand, which count as intermittent.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    mask = np.ones(matrix.shape, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    periods = mask.sum(axis=1)
+    demand = mask & (matrix > 0)
+    n_demands = demand.sum(axis=1)
+    sizes = np.where(demand, matrix, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        adi = np.where(n_demands > 0, periods / n_demands, np.inf)
+        mean = sizes.sum(axis=1) / n_demands
+        variance = np.where(demand, (matrix - mean[:, None]) ** 2, 0.0).sum(axis=1) / n_demands
+        cv2 = np.where(n_demands > 0, variance / mean ** 2, 0.0)
+    sporadic = adi >= ADI_CUTOFF
+    variable = cv2 >= CV2_CUTOFF
+    classes = np.select(
+        [~sporadic & ~variable, ~sporadic & variable, sporadic & ~variable],
+        ['smooth', 'erratic', 'intermittent'], default='lumpy')
+    return classes, adi, cv2
+
+
+def routed_method(demand_class, method='auto'):
+    """Intermittent engine for a demand class, None when the product stays on the ensemble"""
+    if demand_class not in ROUTED_CLASSES:
+        return None
+    return AUTO_METHODS[demand_class] if method == 'auto' else method
+
+
+def route_chunk(panel, products, config=None):
+    """
+    Intermittent engine per product of a chunk, {product_id: method} for the
+    routed ones. Products without a fresh stored class are classified (one
+    pass over their rows of the chunk's AlignedPanel) and the classes saved.
+    """
+    config = config or intermittent_settings()
+    ids = [p.id for p in products]
+    cutoff = timezone.now() - timedelta(days=config['reclassify_days'])
+    stored = {
+        c.product_id: c for c in DemandClassification.objects.filter(product_id__in=ids, classified_at__gte=cutoff)
+    }
+    stale = [pid for pid in ids if pid not in stored]
+    if stale:
+        matrix, mask, _ = panel.rows(stale)
+        classes, adi, cv2 = classify_demand(matrix, mask)
+        now = timezone.now()
+        rows = [
+            DemandClassification(
+                product_id=pid, demand_class=str(cls), adi=None if np.isinf(a) else float(a), cv2=float(c),
+                method=routed_method(str(cls), config['method']), classified_at=now,
+            )
+            for pid, cls, a, c in zip(stale, classes, adi, cv2)
+        ]
+        DemandClassification.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['product'],
+            update_fields=['demand_class', 'adi', 'cv2', 'method', 'classified_at', 'updated_at'],
+        )
+        stored.update({row.product_id: row for row in rows})
+    return {pid: stored[pid].method for pid in ids if stored[pid].method}
+
+
+def forecast_chunk(panel, products, methods, horizon, folds, holdout=None):
+    """
+    Croston-family forecasts for routed products, {product_id: result}.
+
+    panel: AlignedPanel holding (at least) these products
+
+    methods: {product_id: method}. Results record their engine under
+    'algorithm' and carry rolling-origin metrics when `holdout` is given.
+    """
+    results = {}
+    for method in sorted(set(methods.values())):
+        ids = [p.id for p in products if methods[p.id] == method]
+        matrix, mask, _ = panel.rows(ids)
+        forecasts = forecast_intermittent(matrix, mask, method=method, horizon_days=horizon)
+        if holdout:
+            backtester = RollingOriginBacktester(matrix, mask, folds=folds, horizon=holdout)
+            forecasts = [{**f, **m} for f, m in zip(forecasts, backtester.metrics(method))]
+        results.update({pid: {**f, 'algorithm': method} for pid, f in zip(ids, forecasts)})
+    return results
@@ -0,0 +1,145 @@
+"""
+DB-backed forecast job queue.
+
+The generate endpoint enqueues a ForecastJob; the run_forecast_worker
+management command claims queued jobs one at a time and runs them through
+the generation pipeline, recording progress on the job row.
+
+Every progress report is also a heartbeat. A running job whose heartbeat is
+older than FORECAST_JOB_STALE_SECONDS lost its worker: the next claim fails
+the forecasts it left open and requeues it (or fails it once it has been
+claimed FORECAST_JOB_MAX_ATTEMPTS times). Every later write of the original
+worker is conditional on the claim it holds (status and attempt number), so
+a reclaimed run stops at its next heartbeat instead of finishing the job.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .generation import generate_forecasts
+from .models import ForecastJob
+from .persistence import fail_open_forecasts
+
+logger = logging.getLogger(__name__)
+
+
+class JobReclaimed(RuntimeError):
+    """The job was recovered as stale while this worker was still running it"""
+
+
+def enqueue_job(algorithm, horizon, product_ids=None, **options):
+    """Create a queued job; product_ids of None/[] means all products"""
+    return ForecastJob.objects.create(
+        algorithm=algorithm,
+        forecast_horizon_days=horizon,
+        product_ids=[str(pid) for pid in (product_ids or [])],
+        options={k: v for k, v in options.items() if v is not None},
+    )
+
+
+def held_claim(job):
+    """The job row, as long as this worker's claim on it still stands"""
+    return ForecastJob.objects.filter(id=job.id, status='running', attempts=job.attempts)
+
+
+def fail_job(job, error_message):
+    """Mark a job and the forecasts it left pending / generating as failed"""
+    if held_claim(job).update(status='failed', error_message=error_message, finished_at=timezone.now()):
+        fail_open_forecasts(job.forecasts.all(), error_message)
+
+
+def recover_stale_jobs():
+    """Requeue (or fail, out of attempts) running jobs whose worker stopped reporting"""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'FORECAST_JOB_STALE_SECONDS', 1800))
+    max_attempts = getattr(settings, 'FORECAST_JOB_MAX_ATTEMPTS', 3)
+    recovered = 0
+    running = ForecastJob.objects.filter(status='running')
+    candidates = running.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+    for job in candidates:
+        # Conditional on the stale heartbeat so only one worker recovers the job
+        stale = running.filter(id=job.id, heartbeat_at=job.heartbeat_at)
+        last_seen = job.heartbeat_at or job.started_at
+        message = f"Worker stopped responding (no progress since {last_seen.isoformat()})"
+        if job.attempts >= max_attempts:
+            if stale.update(status='failed', error_message=message, finished_at=timezone.now()):
+                fail_open_forecasts(job.forecasts.all(), message)
+                recovered += 1
+        elif stale.update(status='queued', error_message=message, products_done=0, products_skipped=0,
+                          products_failed=0):
+            fail_open_forecasts(job.forecasts.all(), message)
+            recovered += 1
+    if recovered:
+        logger.warning(f"Recovered {recovered} stale forecast jobs")
+    return recovered
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to 'running' and return it"""
+    recover_stale_jobs()
+    while True:
+        job = ForecastJob.objects.filter(status='queued').order_by('created_at').first()
+        if job is None:
+            return None
+        # Conditional UPDATE so two workers never claim the same job
+        now = timezone.now()
+        claimed = ForecastJob.objects.filter(id=job.id, status='queued').update(
+            status='running', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    """Run a claimed job to completion, recording progress as it goes"""
+    def progress(done, skipped, failed, total):
+        updated = held_claim(job).update(
+            products_done=done,
+            products_skipped=skipped,
+            products_failed=failed,
+            total_products=total,
+            heartbeat_at=timezone.now(),
+        )
+        if not updated:
+            raise JobReclaimed(f"Forecast job {job.id} was reclaimed by another worker")
+
+    try:
+        summary = generate_forecasts(
+            product_ids=job.product_ids or None,
+            algorithm=job.algorithm,
+            horizon=job.forecast_horizon_days,
+            batch_size=job.options.get('batch_size'),
+            parallel=job.options.get('parallel'),
+            progress=progress,
+            ensemble_mode=job.options.get('ensemble_mode'),
+            reconciliation=job.options.get('reconciliation'),
+            granularity=job.options.get('granularity'),
+            disaggregate=job.options.get('disaggregate'),
+            fill=job.options.get('fill'),
+            job=job,
+        )
+    except JobReclaimed as e:
+        # The forecasts this run left open were failed on the way out; the job is someone else's now
+        logger.warning(str(e))
+        return
+    except Exception as e:
+        logger.error(f"Forecast job {job.id} failed: {str(e)}")
+        fail_job(job, str(e))
+        return
+
+    completed = held_claim(job).update(
+        status='completed',
+        skipped=summary['skipped'],
+        result={
+            'total_forecasted': len(summary['created_forecasts']),
+            'persistence': summary['persistence'],
+            'model_cache': summary['model_cache'],
+            'hierarchy': summary['hierarchy'],
+        },
+        finished_at=timezone.now(),
+    )
+    if not completed:
+        logger.warning(f"Forecast job {job.id} was reclaimed before it finished, result discarded")
@@ -0,0 +1,71 @@
+"""
+Management command to benchmark the forecasting pipeline on synthetic catalogs.
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from forecasting.benchmark import (
+    run_benchmark, benchmark_metadata, compare_to_baseline, DEFAULT_ALGORITHMS,
+)
+
+
+class Command(BaseCommand):
+    help = 'Time load / fit / persist / serialize / optimize on synthetic catalogs (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int, nargs='+', default=[100, 1000],
+            help='Catalog sizes to benchmark (default: 100 1000)'
+        )
+        parser.add_argument(
+            '--days', type=int, nargs='+', default=[90, 365],
+            help='History lengths in days (default: 90 365)'
+        )
+        parser.add_argument(
+            '--algorithms', nargs='+', default=DEFAULT_ALGORITHMS,
+            help=f'Algorithms to time (default: {" ".join(DEFAULT_ALGORITHMS)})'
+        )
+        parser.add_argument('--horizon', type=int, default=30, help='Forecast horizon in days (default: 30)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data')
+        parser.add_argument('--output', default='benchmark_results.json', help='Where to write results')
+        parser.add_argument('--baseline', help='Baseline results file to compare against')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed slowdown vs baseline as a fraction (default: 0.25)'
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for n_products in options['products']:
+            for days in options['days']:
+                self.stdout.write(f'  Benchmarking {n_products} products x {days} days...')
+                runs = run_benchmark(
+                    n_products, days,
+                    algorithms=options['algorithms'],
+                    horizon=options['horizon'],
+                    seed=options['seed'],
+                )
+                for entry in runs:
+                    self.stdout.write(
+                        f"    {entry['stage']:<10} {entry['algorithm'] or '':<15} {entry['seconds']:>10.4f}s"
+                    )
+                results.extend(runs)
+
+        with open(options['output'], 'w') as fh:
+            json.dump({'meta': benchmark_metadata(), 'results': results}, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"\nResults written to {options['output']}"))
+
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline: {e}')
+            regressions = compare_to_baseline(results, baseline, tolerance=options['tolerance'])
+            for r in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"  {r['products']}x{r['days']} {r['stage']} {r['algorithm'] or ''}: "
+                    f"{r['seconds']:.4f}s vs {r['baseline_seconds']:.4f}s baseline"
+                ))
+            if regressions:
+                raise CommandError(f'{len(regressions)} stage(s) regressed beyond {options["tolerance"]:.0%}')
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,30 @@
+"""
+Management command to pack existing ForecastDetail rows into Forecast.path_data.
+"""
+from django.core.management.base import BaseCommand
+from forecasting.paths import convert_details, CONVERT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Convert per-day ForecastDetail rows into packed float32 paths on their forecasts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=CONVERT_BATCH_SIZE,
+            help='Forecasts converted per transaction'
+        )
+        parser.add_argument(
+            '--keep-rows', action='store_true',
+            help='Leave the ForecastDetail rows in place after packing'
+        )
+
+    def handle(self, *args, **options):
+        stats = convert_details(batch_size=max(1, options['batch_size']), keep_rows=options['keep_rows'])
+
+        if stats['skipped']:
+            self.stdout.write(self.style.WARNING(
+                f"  ⚠ {stats['skipped']} forecasts have non-consecutive detail dates and were left as rows"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"\nDone! Packed {stats['converted']} forecasts, deleted {stats['rows_deleted']} detail rows"
+        ))
@@ -0,0 +1,51 @@
+"""
+Management command to stream historical demand from a CSV or NDJSON file.
+"""
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from forecasting.ingest import ingest_lines, DEFAULT_BATCH_SIZE, FORMATS
+
+
+class Command(BaseCommand):
+    help = 'Upsert historical demand from a CSV or NDJSON file ("-" for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or "-" to read stdin')
+        parser.add_argument(
+            '--format', choices=FORMATS, default=None,
+            help='Input format (default: from the file extension, else csv)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk upsert (default: {DEFAULT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+        if path == '-':
+            report = ingest_lines(sys.stdin, file_format=file_format, batch_size=options['batch_size'])
+        else:
+            try:
+                fh = open(path, encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(str(e))
+            with fh:
+                report = ingest_lines(fh, file_format=file_format, batch_size=options['batch_size'])
+
+        for batch in report['batches']:
+            line = f"  Batch {batch['batch']}: {batch['written']}/{batch['rows']} rows written"
+            if batch['errors']:
+                self.stdout.write(self.style.WARNING(f"{line}, {len(batch['errors'])} errors"))
+                for err in batch['errors']:
+                    self.stdout.write(f"    line {err['line']}: {err['error']}")
+            else:
+                self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\nDone! {report['rows_written']} rows written, "
+            f"{report['rows_rejected']} rejected of {report['rows_read']} read."
+        ))
@@ -0,0 +1,15 @@
+"""
+Management command to recompute the materialized accuracy report from all forecasts.
+"""
+from django.core.management.base import BaseCommand
+from forecasting.accuracy import rebuild_summary
+from forecasting import response_cache
+
+
+class Command(BaseCommand):
+    help = 'Recompute ForecastAccuracySummary (per algorithm / category / month) from completed forecasts'
+
+    def handle(self, *args, **options):
+        groups = rebuild_summary()
+        response_cache.invalidate('forecasts')
+        self.stdout.write(self.style.SUCCESS(f"Done! Rebuilt {groups} accuracy summary groups"))
@@ -0,0 +1,41 @@
+"""
+Management command that runs queued forecast generation jobs.
+"""
+import time
+from django.core.management.base import BaseCommand
+from forecasting.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued forecast jobs from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain the queue and exit instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        self.stdout.write('Forecast worker started')
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            self.stdout.write(f'  Running job {job.id} ({job.algorithm})')
+            run_job(job)
+            job.refresh_from_db()
+            self.stdout.write(
+                f'  Job {job.id} {job.status}: {job.products_done} done, '
+                f'{job.products_skipped} skipped, {job.products_failed} failed'
+            )
@@ -1,10 +1,47 @@
 """
 Management command to seed historical demand data for all products.
 """
-import random
 from datetime import date, timedelta
+import numpy as np
 from django.core.management.base import BaseCommand
 from forecasting.models import Product, HistoricalDemand
+from forecasting.state import record_demand
+
+
+def synthetic_demand(n_series, days, end_date, rng=None):
+    """
+    Generate realistic demand with trend and weekly / monthly seasonality.
+
+    Returns (dates, demand, sales): the `days` dates ending the day before
+    end_date, and (n_series, days) integer arrays of demand and actual sales.
+    """
+    rng = rng or np.random.default_rng()
+    dates = [end_date - timedelta(days=days - i) for i in range(days)]
+    i = np.arange(days)
+
+    base_demand = rng.uniform(50, 500, (n_series, 1))
+    trend = rng.uniform(-0.5, 2.0, (n_series, 1))  # slight upward trend
+    seasonality_amplitude = rng.uniform(10, 50, (n_series, 1))
+    noise_level = rng.uniform(5, 30, (n_series, 1))
+
+    # Base + trend
+    demand = base_demand + trend * i
+
+    # Weekly seasonality (lower on weekends)
+    weekday = np.array([d.weekday() for d in dates])
+    demand = demand * np.where(weekday >= 5, 0.6, np.where(weekday == 0, 0.85, 1.0))
+
+    # Monthly seasonality
+    demand += seasonality_amplitude * np.sin(2 * np.pi * i / 30)
+
+    # Random noise
+    demand += rng.normal(0, 1, (n_series, days)) * noise_level
+
+    # Ensure non-negative
+    demand = np.maximum(1, demand)
+
+    sales = np.rint(demand * rng.uniform(0.85, 1.05, (n_series, days))).astype(int)
+    return dates, np.rint(demand).astype(int), sales
 
 
 class Command(BaseCommand):
@@ -43,44 +80,19 @@ class Command(BaseCommand):
             if force:
                 HistoricalDemand.objects.filter(product=product).delete()
 
-            # Generate realistic demand data with trends and seasonality
-            base_demand = random.uniform(50, 500)
-            trend = random.uniform(-0.5, 2.0)  # slight upward trend
-            seasonality_amplitude = random.uniform(10, 50)
-            noise_level = random.uniform(5, 30)
-
-            records = []
-            for i in range(days):
-                d = today - timedelta(days=days - i)
-                day_of_week = d.weekday()
-
-                # Base + trend
-                demand = base_demand + (trend * i)
-
-                # Weekly seasonality (lower on weekends)
-                if day_of_week >= 5:
-                    demand *= 0.6
-                elif day_of_week == 0:
-                    demand *= 0.85
-
-                # Monthly seasonality
-                import math
-                demand += seasonality_amplitude * math.sin(2 * math.pi * i / 30)
-
-                # Random noise
-                demand += random.gauss(0, noise_level)
-
-                # Ensure non-negative
-                demand = max(1, demand)
-
-                records.append(HistoricalDemand(
+            dates, demand, sales = synthetic_demand(1, days, today)
+            records = [
+                HistoricalDemand(
                     product=product,
                     date=d,
-                    quantity_demanded=round(demand),
-                    actual_sales=round(demand * random.uniform(0.85, 1.05)),
-                ))
+                    quantity_demanded=int(qty),
+                    actual_sales=int(sold),
+                )
+                for d, qty, sold in zip(dates, demand[0], sales[0])
+            ]
 
             HistoricalDemand.objects.bulk_create(records, ignore_conflicts=True)
+            record_demand(records)
             self.stdout.write(
                 self.style.SUCCESS(
                     f'  ✓ {product.name}: Created {len(records)} historical records'
@@ -0,0 +1,30 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="forecast",
+            name="algorithm",
+            field=models.CharField(
+                choices=[
+                    ("arima", "ARIMA"),
+                    ("xgboost", "XGBoost"),
+                    ("prophet", "Prophet"),
+                    ("moving_avg", "Moving Average"),
+                    ("exp_smoothing", "Exponential Smoothing"),
+                    ("linear_trend", "Linear Trend"),
+                    ("seasonal_naive", "Seasonal Naive"),
+                    ("ensemble", "Ensemble"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:10
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0002_forecast_panel_algorithms"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ForecastJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "algorithm",
+                    models.CharField(
+                        choices=[
+                            ("arima", "ARIMA"),
+                            ("xgboost", "XGBoost"),
+                            ("prophet", "Prophet"),
+                            ("moving_avg", "Moving Average"),
+                            ("exp_smoothing", "Exponential Smoothing"),
+                            ("linear_trend", "Linear Trend"),
+                            ("seasonal_naive", "Seasonal Naive"),
+                            ("ensemble", "Ensemble"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("forecast_horizon_days", models.IntegerField(default=30)),
+                (
+                    "product_ids",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="Empty list means all products",
+                    ),
+                ),
+                (
+                    "options",
+                    models.JSONField(
+                        blank=True, default=dict, help_text="batch_size, parallel, etc."
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                    ),
+                ),
+                ("total_products", models.IntegerField(default=0)),
+                ("products_done", models.IntegerField(default=0)),
+                ("products_skipped", models.IntegerField(default=0)),
+                ("products_failed", models.IntegerField(default=0)),
+                ("skipped", models.JSONField(blank=True, default=list)),
+                ("result", models.JSONField(blank=True, default=dict)),
+                ("error_message", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="forecasting_status_3530d5_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0003_forecastjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ForecasterState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("n_obs", models.IntegerField(default=0)),
+                ("last_date", models.DateField(blank=True, null=True)),
+                (
+                    "recent_values",
+                    models.JSONField(
+                        default=list,
+                        help_text="Trailing observations (moving average / seasonal window)",
+                    ),
+                ),
+                ("es_alpha", models.FloatField(default=0.3)),
+                ("es_level", models.FloatField(default=0)),
+                ("sum_y", models.FloatField(default=0)),
+                ("sum_xy", models.FloatField(default=0)),
+                (
+                    "is_stale",
+                    models.BooleanField(
+                        default=False, help_text="Rebuild from history before next use"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="forecaster_state",
+                        to="forecasting.product",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:13
+
+from django.db import migrations, models
+
+
+def populate_summary(apps, schema_editor):
+    from forecasting.accuracy import rebuild_summary
+
+    rebuild_summary(apps.get_model("forecasting", "Forecast"),
+                    apps.get_model("forecasting", "ForecastAccuracySummary"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0004_forecasterstate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ForecastAccuracySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "algorithm",
+                    models.CharField(
+                        choices=[
+                            ("arima", "ARIMA"),
+                            ("xgboost", "XGBoost"),
+                            ("prophet", "Prophet"),
+                            ("moving_avg", "Moving Average"),
+                            ("exp_smoothing", "Exponential Smoothing"),
+                            ("linear_trend", "Linear Trend"),
+                            ("seasonal_naive", "Seasonal Naive"),
+                            ("ensemble", "Ensemble"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("category", models.CharField(max_length=100)),
+                (
+                    "month",
+                    models.DateField(help_text="First day of the forecast_date month"),
+                ),
+                ("forecast_count", models.IntegerField(default=0)),
+                ("accuracy_sum", models.FloatField(default=0)),
+                ("accuracy_count", models.IntegerField(default=0)),
+                ("mae_sum", models.FloatField(default=0)),
+                ("mae_count", models.IntegerField(default=0)),
+                ("rmse_sum", models.FloatField(default=0)),
+                ("rmse_count", models.IntegerField(default=0)),
+                ("mape_sum", models.FloatField(default=0)),
+                ("mape_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["month", "algorithm", "category"],
+                "unique_together": {("algorithm", "category", "month")},
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0005_forecastaccuracysummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecast",
+            name="path_data",
+            field=models.BinaryField(
+                blank=True,
+                help_text="float32 predicted/lower/upper, 3 x horizon",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="forecast",
+            name="path_start",
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0006_forecast_packed_paths"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EnsembleWeights",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[("product", "Product"), ("category", "Category")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="Product id or category name", max_length=100
+                    ),
+                ),
+                (
+                    "weights",
+                    models.JSONField(
+                        default=dict, help_text="Member -> weight, summing to 1"
+                    ),
+                ),
+                (
+                    "errors",
+                    models.JSONField(
+                        default=dict, help_text="Member -> holdout MAE at calibration"
+                    ),
+                ),
+                (
+                    "fit_seconds",
+                    models.JSONField(
+                        default=dict, help_text="Member -> average fit time per series"
+                    ),
+                ),
+                (
+                    "pruned",
+                    models.JSONField(
+                        default=list,
+                        help_text="Members skipped until the next calibration",
+                    ),
+                ),
+                ("calibrated_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("scope", "key")},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0007_ensembleweights"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecast",
+            name="quantiles",
+            field=models.JSONField(
+                blank=True,
+                help_text='{"lead_time_days": n, "mean": x, "levels": {"0.95": x, ...}}',
+                null=True,
+            ),
+        ),
+    ]
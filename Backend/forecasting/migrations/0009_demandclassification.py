@@ -0,0 +1,153 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0008_forecast_quantiles"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="forecast",
+            name="algorithm",
+            field=models.CharField(
+                choices=[
+                    ("arima", "ARIMA"),
+                    ("xgboost", "XGBoost"),
+                    ("prophet", "Prophet"),
+                    ("moving_avg", "Moving Average"),
+                    ("exp_smoothing", "Exponential Smoothing"),
+                    ("linear_trend", "Linear Trend"),
+                    ("seasonal_naive", "Seasonal Naive"),
+                    ("croston", "Croston"),
+                    ("sba", "Croston (SBA)"),
+                    ("tsb", "TSB"),
+                    ("ensemble", "Ensemble"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="forecastaccuracysummary",
+            name="algorithm",
+            field=models.CharField(
+                choices=[
+                    ("arima", "ARIMA"),
+                    ("xgboost", "XGBoost"),
+                    ("prophet", "Prophet"),
+                    ("moving_avg", "Moving Average"),
+                    ("exp_smoothing", "Exponential Smoothing"),
+                    ("linear_trend", "Linear Trend"),
+                    ("seasonal_naive", "Seasonal Naive"),
+                    ("croston", "Croston"),
+                    ("sba", "Croston (SBA)"),
+                    ("tsb", "TSB"),
+                    ("ensemble", "Ensemble"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="forecastjob",
+            name="algorithm",
+            field=models.CharField(
+                choices=[
+                    ("arima", "ARIMA"),
+                    ("xgboost", "XGBoost"),
+                    ("prophet", "Prophet"),
+                    ("moving_avg", "Moving Average"),
+                    ("exp_smoothing", "Exponential Smoothing"),
+                    ("linear_trend", "Linear Trend"),
+                    ("seasonal_naive", "Seasonal Naive"),
+                    ("croston", "Croston"),
+                    ("sba", "Croston (SBA)"),
+                    ("tsb", "TSB"),
+                    ("ensemble", "Ensemble"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="DemandClassification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "demand_class",
+                    models.CharField(
+                        choices=[
+                            ("smooth", "Smooth"),
+                            ("erratic", "Erratic"),
+                            ("intermittent", "Intermittent"),
+                            ("lumpy", "Lumpy"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "adi",
+                    models.FloatField(
+                        blank=True,
+                        help_text="Average days between demands; null without demand",
+                        null=True,
+                    ),
+                ),
+                (
+                    "cv2",
+                    models.FloatField(
+                        help_text="Squared coefficient of variation of the non-zero demands"
+                    ),
+                ),
+                (
+                    "method",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("arima", "ARIMA"),
+                            ("xgboost", "XGBoost"),
+                            ("prophet", "Prophet"),
+                            ("moving_avg", "Moving Average"),
+                            ("exp_smoothing", "Exponential Smoothing"),
+                            ("linear_trend", "Linear Trend"),
+                            ("seasonal_naive", "Seasonal Naive"),
+                            ("croston", "Croston"),
+                            ("sba", "Croston (SBA)"),
+                            ("tsb", "TSB"),
+                            ("ensemble", "Ensemble"),
+                        ],
+                        help_text="Intermittent engine the ensemble is replaced by, if any",
+                        max_length=20,
+                        null=True,
+                    ),
+                ),
+                ("classified_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="demand_classification",
+                        to="forecasting.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["demand_class"], name="forecasting_demand__465927_idx"
+                    )
+                ],
+            },
+        ),
+    ]
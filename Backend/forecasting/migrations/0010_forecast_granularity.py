@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-17 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0009_demandclassification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecast",
+            name="granularity",
+            field=models.CharField(
+                choices=[("day", "Daily"), ("week", "Weekly"), ("month", "Monthly")],
+                default="day",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-17 21:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0010_forecast_granularity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecast",
+            name="job",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="forecasts",
+                to="forecasting.forecastjob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="forecastjob",
+            name="attempts",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="forecastjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
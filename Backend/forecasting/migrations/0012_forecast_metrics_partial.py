@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0011_forecastjob_recovery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecast",
+            name="metrics_partial",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+def mark_states_stale(apps, schema_editor):
+    # Existing states have no record count or policy yet: rebuild them on next use
+    apps.get_model("forecasting", "ForecasterState").objects.update(is_stale=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("forecasting", "0012_forecast_metrics_partial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecasterstate",
+            name="fill_policy",
+            field=models.CharField(default="zero", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="forecasterstate",
+            name="n_records",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(mark_states_stale, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,17 @@
 import pandas as pd
 import numpy as np
+import time
 from datetime import datetime, timedelta
 import logging
 
+from django.conf import settings
+
+from .model_cache import history_fingerprint
+from .panel import right_justify
+
 try:
     from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    from statsmodels.tsa.arima.model import ARIMA
     HAS_STATSMODELS = True
 except ImportError:
     HAS_STATSMODELS = False
@@ -23,6 +30,30 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+EXPENSIVE_MEMBERS = ('holt_winters', 'prophet')
+ARIMA_MIN_TRAIN = 10  # observations left for fitting before a holdout is scored
+INTERVAL_ALPHA = 0.2  # 80% prediction intervals
+INTERVAL_Z = 1.2816  # 80% normal prediction intervals
+INTERMITTENT_ALGORITHMS = ('croston', 'sba', 'tsb')
+CROSTON_ALPHA = 0.1  # smoothing of demand sizes and intervals
+TSB_BETA = 0.1  # smoothing of the demand probability (TSB)
+
+
+def arima_order():
+    """(p, d, q) used for every ARIMA fit"""
+    return tuple(getattr(settings, 'FORECAST_ARIMA_ORDER', (1, 1, 1)))
+
+
+def holdout_metrics(actual, predicted):
+    """mae / rmse / mape (fraction) / accuracy of one holdout forecast"""
+    mape = mean_absolute_percentage_error(actual, predicted)
+    return {
+        'mae': float(mean_absolute_error(actual, predicted)),
+        'rmse': float(np.sqrt(mean_squared_error(actual, predicted))),
+        'mape': float(mape),
+        'accuracy': float(max(0, 100 - mape * 100)),
+    }
+
 
 def mean_absolute_error(actual, predicted):
     """Calculate Mean Absolute Error"""
@@ -46,14 +77,134 @@ def mean_absolute_percentage_error(actual, predicted):
     return np.mean(np.abs((actual[mask] - predicted[mask]) / actual[mask]))
 
 
+def croston_levels(values, first_col, method='croston', alpha=CROSTON_ALPHA, beta=TSB_BETA):
+    """
+    Croston-family forecasts after each day, for many series at once.
+
+    values: (n_series, n_days) right-justified demand (see panel.right_justify),
+    series i starting at column first_col[i]. Returns (n_series, n_days): the
+    flat forecast made after observing each day, 0 before the first demand.
+
+      * croston: smoothed demand size / smoothed interval between demands
+      * sba: Croston with the Syntetos-Boylan bias correction (1 - alpha / 2)
+      * tsb: smoothed size * demand probability, the probability being
+        updated every day so it decays towards 0 for obsolete items
+    """
+    if method not in INTERMITTENT_ALGORITHMS:
+        raise ValueError(f"Unknown intermittent method '{method}'")
+    n_series, n_days = values.shape
+    levels = np.zeros((n_series, n_days))
+    size = np.zeros(n_series)
+    interval = np.ones(n_series)
+    probability = np.zeros(n_series)
+    since = np.zeros(n_series)  # days since the last demand, counting today
+    seen = np.zeros(n_series, dtype=bool)
+    for t in range(n_days):
+        y = values[:, t]
+        active = t >= first_col
+        demand = active & (y > 0)
+        first = demand & ~seen
+        since = np.where(active, since + 1, since)
+        size = np.where(first, y, np.where(demand, size + alpha * (y - size), size))
+        if method == 'tsb':
+            probability = np.where(t == first_col, demand.astype(np.float64),
+                                   np.where(active, probability + beta * (demand - probability), probability))
+            levels[:, t] = probability * size
+        else:
+            interval = np.where(first, since, np.where(demand, interval + alpha * (since - interval), interval))
+            seen_after = seen | demand
+            levels[:, t] = np.where(seen_after, size / interval, 0.0)
+        since = np.where(demand, 0, since)
+        seen |= demand
+    if method == 'sba':
+        levels *= 1 - alpha / 2
+    return levels
+
+
+def forecast_intermittent(matrix, mask=None, method='croston', horizon_days=30):
+    """
+    Croston / SBA / TSB forecasts for every series of a (series x days) panel.
+
+    Missing days are dropped like in PanelForecaster. Bounds come from the
+    in-sample one-step errors; metrics are in-sample placeholders.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    mask = np.ones(matrix.shape, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    values, counts = right_justify(matrix, mask)
+    n_series, n_days = values.shape
+    first_col = n_days - counts
+    levels = croston_levels(values, first_col, method)
+    level = levels[:, -1] if n_days else np.zeros(n_series)
+
+    # One-step errors of the forecast made the day before, from each series' second day
+    scored = np.arange(1, n_days)[None, :] > first_col[:, None]
+    error = np.where(scored, values[:, 1:] - levels[:, :-1], 0.0)
+    n = np.maximum(scored.sum(axis=1), 1)
+    mae = np.abs(error).sum(axis=1) / n
+    rmse = np.sqrt((error ** 2).sum(axis=1) / n)
+    nonzero = scored & (values[:, 1:] > 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ape = np.where(nonzero, np.abs(error) / np.where(nonzero, values[:, 1:], 1), 0.0)
+    mape = ape.sum(axis=1) / np.maximum(nonzero.sum(axis=1), 1)
+
+    forecast = np.repeat(level[:, None], horizon_days, axis=1)
+    width = INTERVAL_Z * rmse[:, None]
+    return [
+        {
+            'forecast': forecast[i],
+            'lower_bound': np.maximum(forecast[i] - width[i], 0),
+            'upper_bound': forecast[i] + width[i],
+            'mae': float(mae[i]),
+            'rmse': float(rmse[i]),
+            'mape': float(mape[i]),
+            'accuracy': float(max(0, 100 - mape[i] * 100)),
+        }
+        for i in range(n_series)
+    ]
+
+
 class DemandForecaster:
     """Forecasting engine with optional ML dependencies"""
 
-    def __init__(self, historical_data_df):
+    def __init__(self, historical_data_df, product_id=None, model_cache=None, fill=None):
         """
         historical_data_df: DataFrame with columns [date, quantity_demanded]
+        product_id / model_cache: optional, reuse fitted models from a ModelCache
+        fill: optional gap fill policy (see forecasting.alignment) making the
+        series one row per day, so positions are day offsets
         """
         self.data = historical_data_df.sort_values('date').reset_index(drop=True)
+        if fill and fill != 'none' and len(self.data):
+            from .alignment import align_series
+            dates, quantities = align_series(
+                self.data['date'].values.astype('datetime64[D]'),
+                self.data['quantity_demanded'].values.astype(np.float64), fill)
+            self.data = pd.DataFrame({'date': dates, 'quantity_demanded': quantities})
+        self.product_id = product_id
+        self.model_cache = model_cache
+        self._fingerprint = None
+
+    @classmethod
+    def from_arrays(cls, dates, quantities, product_id=None, model_cache=None, fill=None):
+        """Build a forecaster from parallel date / quantity arrays"""
+        df = pd.DataFrame({'date': dates, 'quantity_demanded': quantities})
+        return cls(df, product_id=product_id, model_cache=model_cache, fill=fill)
+
+    @property
+    def fingerprint(self):
+        """Hash of the history window, used as the model cache key"""
+        if self._fingerprint is None:
+            self._fingerprint = history_fingerprint(
+                self.data['date'].values.astype('datetime64[D]'),
+                self.data['quantity_demanded'].values,
+            )
+        return self._fingerprint
+
+    def _cached_fit(self, model, fit):
+        """Return fit(), reusing a cached result when the history is unchanged"""
+        if self.model_cache is None or self.product_id is None:
+            return fit()
+        return self.model_cache.get_or_fit(self.product_id, model, self.fingerprint, fit)
 
     def forecast_moving_average(self, window=7, horizon_days=30):
         """Simple moving average forecast"""
@@ -100,11 +251,12 @@ class DemandForecaster:
             if len(y) == 0:
                 val = 0
             else:
-                smoothed = np.zeros(len(y))
-                smoothed[0] = y[0]
-                for i in range(1, len(y)):
-                    smoothed[i] = alpha * y[i] + (1 - alpha) * smoothed[i-1]
-                val = smoothed[-1]
+                def fit():
+                    # Closed form of the recursion, as in PanelForecaster
+                    weights = alpha * (1 - alpha) ** np.arange(len(y) - 1, -1, -1, dtype=np.float64)
+                    weights[0] = (1 - alpha) ** (len(y) - 1)
+                    return float(weights @ np.asarray(y, dtype=np.float64))
+                val = self._cached_fit(f'exp_smoothing:{alpha}', fit)
             
             forecast = np.full(horizon_days, val)
             lower_bound = forecast * 0.82
@@ -128,7 +280,7 @@ class DemandForecaster:
                 return self.forecast_moving_average(horizon_days=horizon_days)
             
             x = np.arange(len(y))
-            m, b = np.polyfit(x, y, 1)
+            m, b = self._cached_fit('linear_trend', lambda: tuple(np.polyfit(x, y, 1)))
             
             future_x = np.arange(len(y), len(y) + horizon_days)
             forecast = np.maximum(m * future_x + b, 0)
@@ -163,6 +315,11 @@ class DemandForecaster:
             logger.error(f"Seasonal naive error: {str(e)}")
             return None
 
+    def forecast_croston(self, method='croston', horizon_days=30):
+        """Croston, SBA or TSB forecast for intermittent demand"""
+        y = self.data['quantity_demanded'].values.astype(np.float64)
+        return forecast_intermittent(y[None, :], method=method, horizon_days=horizon_days)[0]
+
     def _holt_winters(self, horizon):
         if not HAS_STATSMODELS:
             return None
@@ -170,7 +327,10 @@ class DemandForecaster:
             series = self.data['quantity_demanded'].values
             if len(series) < 14: # Minimum for decent seasonal fit
                 return None
-            fit = ExponentialSmoothing(series, seasonal_periods=7, trend='add', seasonal='add').fit()
+            fit = self._cached_fit(
+                'holt_winters',
+                lambda: ExponentialSmoothing(series, seasonal_periods=7, trend='add', seasonal='add').fit(),
+            )
             forecast = np.maximum(fit.forecast(horizon), 0)
             return {
                 'forecast': forecast,
@@ -188,8 +348,7 @@ class DemandForecaster:
             df = self.data.rename(columns={'date': 'ds', 'quantity_demanded': 'y'})
             if len(df) < 5:
                 return None
-            m = Prophet()
-            m.fit(df)
+            m = self._cached_fit('prophet', lambda: Prophet().fit(df))
             future = m.make_future_dataframe(periods=horizon)
             forecast_df = m.predict(future)
             forecast = np.maximum(forecast_df['yhat'].values[-horizon:], 0)
@@ -202,8 +361,76 @@ class DemandForecaster:
         except:
             return None
 
-    def forecast_ensemble(self, horizon_days=30):
-        """Combine multiple forecasts"""
+    def _fit_arima(self, series, holdout):
+        """ARIMA fit on `series`, scored first on its last `holdout` points when there are enough"""
+        order = arima_order()
+        if not holdout or len(series) - holdout < ARIMA_MIN_TRAIN:
+            return ARIMA(series, order=order).fit(), None
+        fit = ARIMA(series[:-holdout], order=order).fit()
+        metrics = holdout_metrics(series[-holdout:], np.maximum(fit.forecast(holdout), 0))
+        # Extend the state over the holdout with the same parameters instead of refitting
+        return fit.append(series[-holdout:]), metrics
+
+    def _arima(self, horizon, holdout=None):
+        if not HAS_STATSMODELS:
+            return None
+        try:
+            series = self.data['quantity_demanded'].values.astype(np.float64)
+            order = arima_order()
+            fit, metrics = self._cached_fit(
+                f"arima-{'-'.join(map(str, order))}-h{holdout or 0}",
+                lambda: self._fit_arima(series, holdout),
+            )
+            prediction = fit.get_forecast(horizon)
+            interval = np.maximum(np.asarray(prediction.conf_int(alpha=INTERVAL_ALPHA)), 0)
+            return {
+                'forecast': np.maximum(np.asarray(prediction.predicted_mean), 0),
+                'lower_bound': interval[:, 0],
+                'upper_bound': interval[:, 1],
+                **(metrics or dict.fromkeys(('mae', 'rmse', 'mape', 'accuracy'))),
+            }
+        except Exception as e:
+            logger.error(f"ARIMA error: {str(e)}")
+            return None
+
+    def fit_member(self, name, horizon, holdout=None):
+        """
+        Fit one expensive model; the result records its wall time as fit_seconds
+
+        holdout: days ARIMA scores itself on before forecasting (other models ignore it)
+        """
+        start = time.perf_counter()
+        if name == 'holt_winters':
+            result = self._holt_winters(horizon)
+        elif name == 'prophet':
+            result = self._prophet(horizon)
+        elif name == 'arima':
+            result = self._arima(horizon, holdout)
+        else:
+            raise ValueError(f"Unknown model '{name}'")
+        if result:
+            result['fit_seconds'] = time.perf_counter() - start
+        return result
+
+    def fit_expensive_models(self, horizon, members=None):
+        """
+        Fit the CPU-heavy ensemble members, keyed by model name
+
+        members: optional subset of EXPENSIVE_MEMBERS to fit (others are skipped)
+        """
+        return {
+            name: self.fit_member(name, horizon)
+            for name in EXPENSIVE_MEMBERS
+            if members is None or name in members
+        }
+
+    def forecast_ensemble(self, horizon_days=30, expensive_results=None):
+        """
+        Combine multiple forecasts
+
+        expensive_results: optional precomputed output of fit_expensive_models
+        (e.g. from a process pool); missing entries are simply left out.
+        """
         try:
             methods = [
                 self.forecast_moving_average,
@@ -218,11 +445,10 @@ class DemandForecaster:
                 if res: results.append(res)
             
             # Add advanced models if available
-            hw = self._holt_winters(horizon_days)
-            if hw: results.append(hw)
-            
-            prophet_res = self._prophet(horizon_days)
-            if prophet_res: results.append(prophet_res)
+            if expensive_results is None:
+                expensive_results = self.fit_expensive_models(horizon_days)
+            for res in expensive_results.values():
+                if res: results.append(res)
             
             if not results:
                 y = self.data['quantity_demanded'].values
@@ -259,13 +485,43 @@ class DemandForecaster:
             logger.error(f"Ensemble error: {str(e)}")
             raise
 
-    def forecast(self, algorithm='ensemble', horizon_days=30):
-        """Main forecast entry point"""
+    def forecast_arima(self, horizon_days=30, expensive_results=None, holdout=None):
+        """
+        ARIMA forecast with 80% prediction intervals
+
+        expensive_results: optional precomputed {'arima': result} (e.g. from a process pool)
+        holdout: days to score the model on first; metrics are None without it
+        """
+        if not HAS_STATSMODELS:
+            raise RuntimeError("statsmodels is required for ARIMA forecasts (pip install statsmodels)")
+        if expensive_results and 'arima' in expensive_results:
+            result = expensive_results['arima']
+        else:
+            result = self.fit_member('arima', horizon_days, holdout)
+        if result is None:
+            raise RuntimeError("ARIMA fit failed")
+        return result
+
+    def forecast(self, algorithm='ensemble', horizon_days=30, expensive_results=None, holdout=None):
+        """
+        Main forecast entry point
+
+        XGBoost is a global model over the whole catalog, see forecasting.global_model.
+        """
         if algorithm == 'moving_avg':
             return self.forecast_moving_average(horizon_days=horizon_days)
         elif algorithm == 'exp_smoothing':
             return self.forecast_exponential_smoothing(horizon_days=horizon_days)
         elif algorithm == 'linear_trend':
             return self.forecast_linear_trend(horizon_days=horizon_days)
+        elif algorithm == 'seasonal_naive':
+            return self.forecast_seasonal_naive(horizon_days=horizon_days)
+        elif algorithm in INTERMITTENT_ALGORITHMS:
+            return self.forecast_croston(method=algorithm, horizon_days=horizon_days)
+        elif algorithm == 'arima':
+            return self.forecast_arima(horizon_days=horizon_days, expensive_results=expensive_results,
+                                       holdout=holdout)
+        elif algorithm == 'xgboost':
+            raise ValueError("XGBoost forecasts come from the catalog-wide model in forecasting.global_model")
         else:
-            return self.forecast_ensemble(horizon_days=horizon_days)
\ No newline at end of file
+            return self.forecast_ensemble(horizon_days=horizon_days, expensive_results=expensive_results)
\ No newline at end of file
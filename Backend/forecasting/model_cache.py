@@ -0,0 +1,178 @@
+"""
+On-disk cache of fitted forecasting models.
+
+Entries are keyed by (product, model, fingerprint of the history window), so a
+product whose HistoricalDemand hasn't changed reuses its fitted Holt-Winters /
+Prophet objects, smoothing state and trend coefficients instead of refitting.
+The directory is capped in size and evicts least-recently-used entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATS_FILE = '_stats.json'
+
+
+def history_fingerprint(dates, quantities):
+    """Stable hash of a demand history window"""
+    digest = hashlib.sha1()
+    digest.update(np.asarray(dates, dtype='datetime64[D]').tobytes())
+    digest.update(np.asarray(quantities, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """File-per-entry pickle cache with LRU eviction and hit/miss counters"""
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size = sum(p.stat().st_size for p in self._entries())
+
+    def _entries(self):
+        return self.directory.glob('*.pkl')
+
+    def _path(self, product_id, model, fingerprint):
+        key = hashlib.sha1(f'{product_id}:{model}:{fingerprint}'.encode()).hexdigest()
+        return self.directory / f'{key}.pkl'
+
+    def get(self, product_id, model, fingerprint):
+        """Return the cached object or None"""
+        path = self._path(product_id, model, fingerprint)
+        try:
+            with open(path, 'rb') as fh:
+                value = pickle.load(fh)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable model cache entry {path.name}: {str(e)}")
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, product_id, model, fingerprint, value):
+        """Store a fitted object, evicting old entries if over the size cap"""
+        path = self._path(product_id, model, fingerprint)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, path)  # atomic, safe with concurrent workers
+        except Exception as e:
+            logger.warning(f"Could not cache {model} fit for {product_id}: {str(e)}")
+            return
+        with self._lock:
+            self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_or_fit(self, product_id, model, fingerprint, fit):
+        """Return the cached fit, or call fit() and cache its result"""
+        value = self.get(product_id, model, fingerprint)
+        if value is None:
+            value = fit()
+            if value is not None:
+                self.put(product_id, model, fingerprint, value)
+        return value
+
+    def _evict(self):
+        """Drop least-recently-used entries until under 90% of the cap"""
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, p in entries:
+            if self._size <= target:
+                break
+            p.unlink(missing_ok=True)
+            self._size -= size
+            self.evictions += 1
+
+    def counters(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def merge_counters(self, counters):
+        """Add counters reported by another process (e.g. a pool worker)"""
+        self.hits += counters.get('hits', 0)
+        self.misses += counters.get('misses', 0)
+        self.evictions += counters.get('evictions', 0)
+
+    def save_stats(self):
+        """Fold this instance's counters into the cumulative stats file"""
+        stats = self.load_stats()
+        for name, value in self.counters().items():
+            stats[name] = stats.get(name, 0) + value
+        path = self.directory / STATS_FILE
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(stats, fh)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write model cache stats: {str(e)}")
+        self.hits = self.misses = self.evictions = 0
+
+    def load_stats(self):
+        try:
+            with open(self.directory / STATS_FILE) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def summary(self):
+        """Cumulative counters plus current size, for the API"""
+        stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        stats.update(self.load_stats())
+        for name, value in self.counters().items():
+            stats[name] += value
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['entries'] = sum(1 for _ in self._entries())
+        stats['size_bytes'] = self._size
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+# One ModelCache per process, keyed by (directory, max_bytes)
+_default_caches = {}
+_default_caches_lock = threading.Lock()
+
+
+def default_model_cache():
+    """Cache configured in settings, or None when disabled; shared by the whole process"""
+    from django.conf import settings
+
+    if not getattr(settings, 'FORECAST_MODEL_CACHE_ENABLED', True):
+        return None
+    directory = getattr(settings, 'FORECAST_MODEL_CACHE_DIR', settings.ML_MODELS_DIR / 'cache')
+    max_bytes = getattr(settings, 'FORECAST_MODEL_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    key = (str(directory), max_bytes)
+    with _default_caches_lock:
+        if key not in _default_caches:
+            _default_caches[key] = ModelCache(directory, max_bytes=max_bytes)
+        return _default_caches[key]
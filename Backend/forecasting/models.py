@@ -54,6 +54,12 @@ class Forecast(models.Model):
     ('xgboost', 'XGBoost'),
     ('prophet', 'Prophet'),
     ('moving_avg', 'Moving Average'),
+    ('exp_smoothing', 'Exponential Smoothing'),
+    ('linear_trend', 'Linear Trend'),
+    ('seasonal_naive', 'Seasonal Naive'),
+    ('croston', 'Croston'),
+    ('sba', 'Croston (SBA)'),
+    ('tsb', 'TSB'),
     ('ensemble', 'Ensemble'),
     ]
 
@@ -65,8 +71,16 @@ class Forecast(models.Model):
         ('failed', 'Failed'),
     ]
 
+    GRANULARITY_CHOICES = [
+        ('day', 'Daily'),
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='forecasts')
+    # Queued run that created this forecast, if any (see forecasting.jobs)
+    job = models.ForeignKey('ForecastJob', on_delete=models.SET_NULL, null=True, blank=True, related_name='forecasts')
     algorithm = models.CharField(max_length=20, choices=ALGORITHM_CHOICES)
     forecast_date = models.DateField()
     predicted_demand = models.FloatField(validators=[MinValueValidator(0)])
@@ -78,11 +92,23 @@ class Forecast(models.Model):
     rmse = models.FloatField(null=True, blank=True)  # Root Mean Squared Error
     mape = models.FloatField(null=True, blank=True)  # Mean Absolute Percentage Error
     accuracy_score = models.FloatField(null=True, blank=True)  # 0-100%
+    # Metrics come from the cheap ensemble members only (the expensive ones are not backtested)
+    metrics_partial = models.BooleanField(default=False)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True, null=True)
 
     forecast_horizon_days = models.IntegerField(default=30)  # Days ahead forecasted
+    # Spacing of the stored path: one point per day, or per week / month (see forecasting.aggregation)
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES, default='day')
+
+    # Packed per-day paths (FORECAST_DETAIL_STORAGE = "packed"), see forecasting.paths
+    path_start = models.DateField(null=True, blank=True)
+    path_data = models.BinaryField(null=True, blank=True, help_text="float32 predicted/lower/upper, 3 x horizon")
+    # Lead-time demand quantiles from empirical residuals, see forecasting.quantiles
+    quantiles = models.JSONField(null=True, blank=True,
+                                 help_text='{"lead_time_days": n, "mean": x, "levels": {"0.95": x, ...}}')
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -96,6 +122,14 @@ class Forecast(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.algorithm} - {self.forecast_date}"
 
+    def detail_rows(self):
+        """Day-by-day path as ForecastDetailSerializer data, from the packed arrays or detail rows"""
+        if self.path_data is not None:
+            from .paths import path_rows
+            return path_rows(self.path_start, self.path_data, self.granularity)
+        from .serializers import ForecastDetailSerializer
+        return ForecastDetailSerializer(self.details.all(), many=True).data
+
 class ForecastDetail(models.Model):
     """Detailed day-by-day forecast"""
     forecast = models.ForeignKey(Forecast, on_delete=models.CASCADE, related_name='details')
@@ -107,4 +141,153 @@ class ForecastDetail(models.Model):
     
     class Meta:
         unique_together = ['forecast', 'forecast_date']
-        ordering = ['forecast_date']
\ No newline at end of file
+        ordering = ['forecast_date']
+
+class ForecastJob(models.Model):
+    """Queued forecast generation run, executed by the run_forecast_worker command"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    algorithm = models.CharField(max_length=20, choices=Forecast.ALGORITHM_CHOICES)
+    forecast_horizon_days = models.IntegerField(default=30)
+    product_ids = models.JSONField(default=list, blank=True, help_text="Empty list means all products")
+    options = models.JSONField(default=dict, blank=True, help_text="batch_size, parallel, etc.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # Progress
+    total_products = models.IntegerField(default=0)
+    products_done = models.IntegerField(default=0)
+    products_skipped = models.IntegerField(default=0)
+    products_failed = models.IntegerField(default=0)
+    skipped = models.JSONField(default=list, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error_message = models.TextField(blank=True, null=True)
+
+    # Claims so far; a running job whose heartbeat goes stale is reclaimed (see forecasting.jobs)
+    attempts = models.IntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} - {self.algorithm} - {self.status}"
+
+
+class ForecasterState(models.Model):
+    """Incrementally maintained forecaster state, so cheap methods need no history scan"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='forecaster_state')
+    n_obs = models.IntegerField(default=0)
+    # Recorded days, without the filled gaps; the minimum-history check counts these
+    n_records = models.IntegerField(default=0)
+    # Gap fill policy the state was built with (see alignment); rebuilt when the setting changes
+    fill_policy = models.CharField(max_length=20, default='zero')
+    last_date = models.DateField(null=True, blank=True)
+    recent_values = models.JSONField(default=list, help_text="Trailing observations (moving average / seasonal window)")
+    es_alpha = models.FloatField(default=0.3)
+    es_level = models.FloatField(default=0)
+    # Regression sufficient statistics over x = 0..n_obs-1
+    sum_y = models.FloatField(default=0)
+    sum_xy = models.FloatField(default=0)
+    is_stale = models.BooleanField(default=False, help_text="Rebuild from history before next use")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product.name} - {self.n_obs} observations"
+
+
+class ForecastAccuracySummary(models.Model):
+    """
+    Running totals of completed-forecast metrics per (algorithm, category, month),
+    kept current by forecasting.accuracy so accuracy_report never scans Forecast
+    """
+    algorithm = models.CharField(max_length=20, choices=Forecast.ALGORITHM_CHOICES)
+    category = models.CharField(max_length=100)
+    month = models.DateField(help_text="First day of the forecast_date month")
+
+    forecast_count = models.IntegerField(default=0)
+    # Sum / count of non-null values per metric
+    accuracy_sum = models.FloatField(default=0)
+    accuracy_count = models.IntegerField(default=0)
+    mae_sum = models.FloatField(default=0)
+    mae_count = models.IntegerField(default=0)
+    rmse_sum = models.FloatField(default=0)
+    rmse_count = models.IntegerField(default=0)
+    mape_sum = models.FloatField(default=0)
+    mape_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['algorithm', 'category', 'month']
+        ordering = ['month', 'algorithm', 'category']
+
+    def __str__(self):
+        return f"{self.algorithm} - {self.category} - {self.month:%Y-%m}: {self.forecast_count}"
+
+
+class EnsembleWeights(models.Model):
+    """
+    Learned ensemble member weights for one product or category, see
+    forecasting.weighted_ensemble
+    """
+    SCOPE_CHOICES = [
+        ('product', 'Product'),
+        ('category', 'Category'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=100, help_text="Product id or category name")
+    weights = models.JSONField(default=dict, help_text="Member -> weight, summing to 1")
+    errors = models.JSONField(default=dict, help_text="Member -> holdout MAE at calibration")
+    fit_seconds = models.JSONField(default=dict, help_text="Member -> average fit time per series")
+    pruned = models.JSONField(default=list, help_text="Members skipped until the next calibration")
+    calibrated_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['scope', 'key']
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({len(self.weights)} members)"
+
+
+class DemandClassification(models.Model):
+    """
+    ADI / CV² demand class of a product's series and the engine it is routed
+    to, see forecasting.intermittent
+    """
+    CLASS_CHOICES = [
+        ('smooth', 'Smooth'),
+        ('erratic', 'Erratic'),
+        ('intermittent', 'Intermittent'),
+        ('lumpy', 'Lumpy'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='demand_classification')
+    demand_class = models.CharField(max_length=20, choices=CLASS_CHOICES)
+    adi = models.FloatField(null=True, blank=True, help_text="Average days between demands; null without demand")
+    cv2 = models.FloatField(help_text="Squared coefficient of variation of the non-zero demands")
+    method = models.CharField(max_length=20, choices=Forecast.ALGORITHM_CHOICES, null=True, blank=True,
+                              help_text="Intermittent engine the ensemble is replaced by, if any")
+    classified_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['demand_class']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.demand_class}"
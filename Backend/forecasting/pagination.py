@@ -0,0 +1,180 @@
+"""
+Keyset (cursor) pagination for large tables.
+
+DRF's CursorPagination only filters on the first ordering field and falls
+back to OFFSET within equal values, which degrades on composite keys such as
+(product, date). KeysetPagination filters on the full key tuple of the last
+row, so with an index on that key every page costs one bounded range scan
+and no COUNT(*), however deep the client pages.
+
+Viewsets opt in with `pagination_class = KeysetPagination` and a
+`keyset_ordering` tuple matching one of their indexes. Requests without
+?pagination=cursor or ?cursor= keep the regular page-number behaviour
+(?count=false drops the COUNT(*) there too).
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+MAX_PAGE_SIZE = 1000
+
+
+def _keyset_filter(keys, values):
+    """
+    Rows strictly after `values` in `keys` order:
+    k1 >= v1 AND ((k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...)
+
+    The leading range on k1 is implied by the OR expansion, but it is what
+    lets the planner seek into the index instead of scanning it from the start.
+    """
+    condition = Q()
+    equal = {}
+    for key, value in zip(keys, values):
+        name = key.lstrip('-')
+        lookup = '__lt' if key.startswith('-') else '__gt'
+        condition |= Q(**equal, **{name + lookup: value})
+        equal[name] = value
+    first = keys[0].lstrip('-')
+    return Q(**{first + ('__lte' if keys[0].startswith('-') else '__gte'): values[0]}) & condition
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in, count-free keyset mode"""
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    default_ordering = ('pk',)
+
+    def get_keys(self, queryset, view):
+        opts = queryset.model._meta
+        keys = []
+        for key in getattr(view, 'keyset_ordering', self.default_ordering):
+            name = key.lstrip('-')
+            if name != 'pk':
+                # Order by the raw column; a relation name would pull in the related model's ordering
+                name = opts.get_field(name).attname
+            keys.append(key[:len(key) - len(key.lstrip('-'))] + name)
+        pk_name = opts.pk.attname
+        # Trailing primary key makes the key unique
+        if not {'pk', pk_name} & {key.lstrip('-') for key in keys}:
+            keys.append('-pk' if keys[-1].startswith('-') else 'pk')
+        return keys
+
+    def use_keyset(self, request):
+        return (self.cursor_query_param in request.query_params
+                or request.query_params.get(self.mode_query_param) == 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        self.count_free = False
+        if not self.keyset:
+            if request.query_params.get(self.count_query_param) == 'false':
+                return self.paginate_without_count(queryset, request)
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset, view)
+        self.display_page_controls = False
+
+        queryset = queryset.order_by(*self.keys)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(_keyset_filter(self.keys, position))
+
+        # One extra row tells whether another page follows
+        rows = list(queryset[:self.page_size + 1])
+        self.page_rows = rows[:self.page_size]
+        self.has_next = len(rows) > self.page_size
+        return self.page_rows
+
+    def paginate_without_count(self, queryset, request):
+        """OFFSET paging that skips COUNT(*); next is known from one extra row"""
+        self.count_free = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.display_page_controls = False
+        try:
+            self.page_number = max(1, int(request.query_params.get(self.page_query_param, 1)))
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        start = (self.page_number - 1) * self.page_size
+        rows = list(queryset[start:start + self.page_size + 1])
+        self.page_rows = rows[:self.page_size]
+        self.has_next = len(rows) > self.page_size
+        return self.page_rows
+
+    # Cursor encoding ---------------------------------------------------
+
+    def _key_field(self, model, key):
+        name = key.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def _parse_value(self, model, key, value):
+        field = self._key_field(model, key)
+        field = field.target_field if field.is_relation else field
+        return None if value is None else field.to_python(value)
+
+    def encode_cursor(self, instance):
+        # attname reads foreign keys as raw ids without loading the relation
+        values = [getattr(instance, self._key_field(type(instance), key).attname) for key in self.keys]
+        values = [None if value is None else str(value) for value in values]
+        token = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError('cursor length does not match the ordering')
+            return [self._parse_value(model, key, value) for key, value in zip(self.keys, values)]
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    # Responses ---------------------------------------------------------
+
+    def get_next_link(self):
+        if self.keyset:
+            return self.encode_cursor(self.page_rows[-1]) if self.has_next else None
+        if self.count_free:
+            if not self.has_next:
+                return None
+            return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.count_free:
+            if self.page_number <= 1:
+                return None
+            url = self.request.build_absolute_uri()
+            if self.page_number == 2:
+                return remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.page_query_param, self.page_number - 1)
+        return super().get_previous_link()
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('results', data),
+            ]))
+        if self.count_free:
+            return Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('results', data),
+            ]))
+        return super().get_paginated_response(data)
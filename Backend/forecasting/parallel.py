@@ -0,0 +1,187 @@
+"""
+Process-pool execution of the expensive ensemble members.
+
+Holt-Winters, Prophet and ARIMA are CPU-bound, so per-product fits are
+fanned out to a ProcessPoolExecutor. Results come back in input order, and a
+fit that exceeds its time limit (or raises) is dropped so the product falls back to the
+cheaper methods in forecast_ensemble (or, for ARIMA, is marked failed).
+A generation run keeps one WorkerPool for all its chunks, so worker start-up
+is paid once per run; a pool broken by a crashed worker is replaced on the
+next chunk.
+"""
+import logging
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .ml_engine import DemandForecaster, EXPENSIVE_MEMBERS, HAS_STATSMODELS, HAS_PROPHET
+from .model_cache import ModelCache
+
+logger = logging.getLogger(__name__)
+
+
+class FitTimeout(Exception):
+    """Raised inside a worker when a single model fit runs too long"""
+
+
+def _raise_timeout(signum, frame):
+    raise FitTimeout()
+
+
+@contextmanager
+def _time_limit(seconds):
+    """Interrupt the enclosed block after `seconds` (Unix only, no-op elsewhere)"""
+    if not seconds or not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# One ModelCache per worker process, keyed by (directory, max_bytes)
+_worker_caches = {}
+
+
+def _worker_cache(cache_config):
+    if cache_config is None:
+        return None
+    if cache_config not in _worker_caches:
+        _worker_caches[cache_config] = ModelCache(*cache_config)
+    return _worker_caches[cache_config]
+
+
+def _fit_one(task):
+    """
+    Worker entry point: fit the expensive models for one product.
+
+    Returns (results, cache_counters) where cache_counters are the hits and
+    misses this call added to the worker's cache.
+    """
+    product_id, dates, quantities, horizon, fit_timeout, cache_config, members, holdout = task
+    cache = _worker_cache(cache_config)
+    before = cache.counters() if cache else {}
+    forecaster = DemandForecaster.from_arrays(dates, quantities, product_id=product_id, model_cache=cache)
+    results = {}
+    for name in EXPENSIVE_MEMBERS if members is None else members:
+        try:
+            with _time_limit(fit_timeout):
+                results[name] = forecaster.fit_member(name, horizon, holdout)
+        except FitTimeout:
+            results[name] = None
+        except Exception as e:
+            # One failing model must not take the rest of the chunk down with it
+            logger.warning(f"{name} fit failed for product {product_id}: {str(e)}")
+            results[name] = None
+    counters = {k: v - before[k] for k, v in cache.counters().items()} if cache else {}
+    return results, counters
+
+
+def parallel_settings():
+    """Configured worker count (0 = disabled), chunk size and per-fit timeout"""
+    return {
+        'workers': getattr(settings, 'FORECAST_PARALLEL_WORKERS', 0),
+        'chunk_size': getattr(settings, 'FORECAST_PARALLEL_CHUNK_SIZE', 8),
+        'fit_timeout': getattr(settings, 'FORECAST_FIT_TIMEOUT', 30),
+    }
+
+
+def parallel_enabled(requested=None):
+    """Whether expensive fits should go through the process pool"""
+    if not (HAS_STATSMODELS or HAS_PROPHET):
+        return False
+    if requested is not None:
+        return requested
+    return parallel_settings()['workers'] > 0
+
+
+class WorkerPool:
+    """Process pool shared by the chunks of one run, started on first use"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or parallel_settings()['workers'] or None
+        self._executor = None
+
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def discard(self):
+        """Drop a broken pool; the next chunk starts a new one"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fit_expensive_models(series, horizon, workers=None, chunk_size=None, fit_timeout=None,
+                         product_ids=None, model_cache=None, members=None, holdout=None, pool=None):
+    """
+    Fit Holt-Winters / Prophet (or ARIMA, via `members`) for many products in a process pool.
+
+    series: list of (dates, quantities) arrays, one entry per product
+    product_ids / model_cache: optional, let workers reuse cached fits; the
+    workers' hit/miss counts are merged into model_cache
+    members: optional list aligned with `series` of the models to fit, e.g.
+    ['arima'] (None entries fit every ensemble member)
+    holdout: days ARIMA scores itself on, see DemandForecaster.fit_member
+    pool: WorkerPool to run in; a temporary one is started (and shut down) without it
+    Returns a list aligned with `series`; each item is the dict that
+    DemandForecaster.forecast_ensemble accepts as expensive_results.
+    """
+    config = parallel_settings()
+    chunk_size = chunk_size or config['chunk_size']
+    fit_timeout = fit_timeout if fit_timeout is not None else config['fit_timeout']
+
+    if not series:
+        return []
+
+    product_ids = product_ids or [None] * len(series)
+    members = members or [None] * len(series)
+    cache_config = (str(model_cache.directory), model_cache.max_bytes) if model_cache else None
+    tasks = [
+        (pid, dates, quantities, horizon, fit_timeout, cache_config, subset, holdout)
+        for pid, (dates, quantities), subset in zip(product_ids, series, members)
+    ]
+    own_pool = pool is None
+    if own_pool:
+        pool = WorkerPool(workers)
+
+    results = []
+    try:
+        # map() yields in submission order, keeping output deterministic
+        for res, counters in pool.executor().map(_fit_one, tasks, chunksize=chunk_size):
+            results.append(res)
+            if model_cache:
+                model_cache.merge_counters(counters)
+    except BrokenProcessPool as e:
+        logger.error(f"Forecast worker pool failed: {str(e)}")
+        pool.discard()
+    finally:
+        if own_pool:
+            pool.close()
+
+    # Products the pool never returned degrade to the cheap methods
+    results.extend(
+        dict.fromkeys(EXPENSIVE_MEMBERS if subset is None else subset, None)
+        for subset in members[len(results):]
+    )
+    return results
@@ -0,0 +1,109 @@
+"""
+Packed storage for per-day forecast paths.
+
+Instead of one ForecastDetail row per day, a forecast can carry its
+predicted / lower / upper paths as a single float32 blob (3 x horizon,
+row-major) plus the date of the first day. Selected with
+FORECAST_DETAIL_STORAGE = "packed"; the default "rows" keeps writing
+ForecastDetail. Readers go through Forecast.detail_rows(), which handles
+both layouts.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .aggregation import period_starts
+
+STORAGE_MODES = ('rows', 'packed')
+PATH_DTYPE = np.dtype('<f4')
+CONVERT_BATCH_SIZE = 1000
+
+
+def detail_storage():
+    mode = getattr(settings, 'FORECAST_DETAIL_STORAGE', 'rows')
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"FORECAST_DETAIL_STORAGE must be one of {', '.join(STORAGE_MODES)}, got '{mode}'")
+    return mode
+
+
+def pack_path(predicted, lower, upper):
+    """Three equal-length paths -> little-endian float32 bytes"""
+    return np.asarray([predicted, lower, upper], dtype=PATH_DTYPE).tobytes()
+
+
+def unpack_path(data):
+    """Packed bytes -> float32 array of shape (3, horizon)"""
+    return np.frombuffer(bytes(data), dtype=PATH_DTYPE).reshape(3, -1)
+
+
+def path_rows(start, data, granularity='day'):
+    """
+    Per-day (or per-period) dicts in ForecastDetailSerializer's shape.
+
+    float32 values are printed at their shortest round-trip precision so
+    12.34 comes back as 12.34, not 12.340000152587891.
+    """
+    predicted, lower, upper = unpack_path(data).astype(str).astype(np.float64).tolist()
+    dates = period_starts(start, len(predicted), granularity)
+    return [
+        {
+            'forecast_date': dates[i].isoformat(),
+            'predicted_quantity': predicted[i],
+            'lower_bound': lower[i],
+            'upper_bound': upper[i],
+        }
+        for i in range(len(predicted))
+    ]
+
+
+def convert_details(batch_size=CONVERT_BATCH_SIZE, keep_rows=False):
+    """
+    Pack existing ForecastDetail rows into their forecasts.
+
+    Forecasts whose detail dates are not consecutive days are left as rows.
+    Returns {'converted': n, 'skipped': n, 'rows_deleted': n}.
+    """
+    from .models import Forecast, ForecastDetail
+
+    stats = {'converted': 0, 'skipped': 0, 'rows_deleted': 0}
+    pending = (
+        Forecast.objects.filter(path_data__isnull=True, details__isnull=False)
+        .distinct().order_by('id').values_list('id', flat=True)
+    )
+    last_id = None
+    while True:
+        batch = pending.filter(id__gt=last_id) if last_id else pending
+        ids = list(batch[:batch_size])
+        if not ids:
+            return stats
+        last_id = ids[-1]
+
+        rows = list(
+            ForecastDetail.objects.filter(forecast_id__in=ids).order_by('forecast_id', 'forecast_date')
+            .values_list('forecast_id', 'forecast_date', 'predicted_quantity', 'lower_bound', 'upper_bound')
+        )
+        forecast_ids = np.array([r[0] for r in rows], dtype=object)
+        dates = np.array([r[1] for r in rows], dtype='datetime64[D]')
+        values = np.array([r[2:] for r in rows], dtype=np.float64)
+        # Group boundaries: rows are sorted by forecast, so each run is one forecast
+        starts = np.flatnonzero(np.r_[True, forecast_ids[1:] != forecast_ids[:-1]])
+        ends = np.r_[starts[1:], len(rows)]
+
+        updates = []
+        for start, end in zip(starts, ends):
+            days = dates[start:end]
+            if np.any(np.diff(days) != np.timedelta64(1, 'D')):
+                stats['skipped'] += 1
+                continue
+            updates.append(Forecast(
+                id=forecast_ids[start],
+                path_start=days[0].item(),
+                path_data=pack_path(*values[start:end].T),
+            ))
+
+        with transaction.atomic():
+            Forecast.objects.bulk_update(updates, ['path_start', 'path_data'])
+            if not keep_rows:
+                deleted, _ = ForecastDetail.objects.filter(forecast_id__in=[f.id for f in updates]).delete()
+                stats['rows_deleted'] += deleted
+        stats['converted'] += len(updates)
@@ -0,0 +1,194 @@
+"""
+Batched persistence of generated forecasts.
+
+Forecast and ForecastDetail rows (or packed per-day paths, see
+forecasting.paths) are accumulated in memory and written with
+bulk_create / bulk_update, one transaction per batch, instead of one INSERT
+per row.
+"""
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import accuracy, response_cache
+from .aggregation import period_starts
+from .paths import detail_storage, pack_path
+from .models import Forecast, ForecastDetail
+
+DEFAULT_BATCH_SIZE = getattr(settings, 'FORECAST_PERSIST_BATCH_SIZE', 5000)
+OPEN_STATUSES = ('pending', 'generating')
+
+RESULT_FIELDS = [
+    'algorithm', 'predicted_demand', 'confidence_interval_lower', 'confidence_interval_upper',
+    'mae', 'rmse', 'mape', 'accuracy_score', 'metrics_partial', 'status', 'error_message',
+    'forecast_horizon_days', 'granularity', 'path_start', 'path_data', 'quantiles', 'updated_at',
+]
+
+
+def _metric(result, name):
+    """Float metric from a result dict; None (not backtested) stays None"""
+    value = result.get(name, 0)
+    return None if value is None else float(value)
+
+
+def create_pending_forecasts(products, algorithm, forecast_date, horizon, batch_size=None, job=None):
+    """Insert one 'pending' Forecast per product, returned as {product_id: forecast}"""
+    pending = {
+        product.id: Forecast(
+            product=product,
+            job=job,
+            algorithm=algorithm,
+            forecast_date=forecast_date,
+            predicted_demand=0,
+            confidence_interval_lower=0,
+            confidence_interval_upper=0,
+            status='pending',
+            forecast_horizon_days=horizon,
+        )
+        for product in products
+    }
+    with transaction.atomic():
+        Forecast.objects.bulk_create(pending.values(), batch_size=batch_size or DEFAULT_BATCH_SIZE)
+    response_cache.invalidate('forecasts')
+    return pending
+
+
+def mark_generating(forecasts):
+    """Move a set of pending forecasts to 'generating'"""
+    Forecast.objects.filter(id__in=[f.id for f in forecasts]).update(
+        status='generating', updated_at=timezone.now())
+    response_cache.invalidate('forecasts')
+    for f in forecasts:
+        f.status = 'generating'
+
+
+def fail_open_forecasts(forecasts, error_message):
+    """Mark the forecasts of a queryset still pending / generating as failed"""
+    count = forecasts.filter(status__in=OPEN_STATUSES).update(
+        status='failed', error_message=error_message, updated_at=timezone.now())
+    if count:
+        response_cache.invalidate('forecasts')
+    return count
+
+
+class ForecastWriter:
+    """Accumulates forecasts and their day-by-day details and writes them in batches"""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.packed = detail_storage() == 'packed'
+        self._forecasts = []
+        self._updates = []
+        self._details = []
+        self._completed = []  # (forecast, category) for the accuracy summary
+        self.rows_written = 0
+        self.batches_written = 0
+        self.elapsed = 0.0
+
+    def _queue(self, forecast, product, algorithm, forecast_date, **fields):
+        """Create a new Forecast, or fill in an existing pending one"""
+        if forecast is None:
+            forecast = Forecast(product=product, algorithm=algorithm, forecast_date=forecast_date, **fields)
+            self._forecasts.append(forecast)
+        else:
+            # Routed products record the engine that actually produced them
+            forecast.algorithm = algorithm
+            for name, value in fields.items():
+                setattr(forecast, name, value)
+            forecast.updated_at = timezone.now()
+            self._updates.append(forecast)
+        return forecast
+
+    def add(self, product, algorithm, forecast_date, horizon, result, forecast=None):
+        """Queue a completed forecast built from a DemandForecaster result"""
+        forecast = self._queue(
+            forecast, product, algorithm, forecast_date,
+            predicted_demand=round(float(np.sum(result['forecast'])), 2),
+            confidence_interval_lower=round(float(np.sum(result['lower_bound'])), 2),
+            confidence_interval_upper=round(float(np.sum(result['upper_bound'])), 2),
+            mae=_metric(result, 'mae'),
+            rmse=_metric(result, 'rmse'),
+            mape=_metric(result, 'mape'),
+            accuracy_score=_metric(result, 'accuracy'),
+            metrics_partial=bool(result.get('metrics_partial', False)),
+            status='completed',
+            error_message=None,
+            forecast_horizon_days=horizon,
+            granularity=result.get('granularity', 'day'),
+            quantiles=result.get('quantiles'),
+        )
+        if self.packed:
+            forecast.path_start = forecast_date
+            forecast.path_data = pack_path(result['forecast'], result['lower_bound'], result['upper_bound'])
+        else:
+            dates = period_starts(forecast_date, len(result['forecast']), result.get('granularity', 'day'))
+            self._details.extend(
+                ForecastDetail(
+                    forecast=forecast,
+                    forecast_date=dates[i],
+                    predicted_quantity=float(pred),
+                    lower_bound=float(lower),
+                    upper_bound=float(upper),
+                )
+                for i, (pred, lower, upper) in enumerate(zip(
+                    result['forecast'], result['lower_bound'], result['upper_bound']))
+            )
+        self._completed.append((forecast, product.category))
+        self._maybe_flush()
+        return forecast
+
+    def add_failed(self, product, algorithm, forecast_date, error_message, forecast=None):
+        """Queue a failed forecast placeholder"""
+        forecast = self._queue(
+            forecast, product, algorithm, forecast_date,
+            predicted_demand=0,
+            confidence_interval_lower=0,
+            confidence_interval_upper=0,
+            status='failed',
+            error_message=error_message,
+        )
+        self._maybe_flush()
+        return forecast
+
+    @property
+    def pending_rows(self):
+        return len(self._forecasts) + len(self._updates) + len(self._details)
+
+    def _maybe_flush(self):
+        if self.pending_rows >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write all pending rows in a single transaction"""
+        rows = self.pending_rows
+        if not rows:
+            return
+        start = time.perf_counter()
+        with transaction.atomic():
+            Forecast.objects.bulk_create(self._forecasts, batch_size=self.batch_size)
+            if self._updates:
+                Forecast.objects.bulk_update(self._updates, RESULT_FIELDS, batch_size=self.batch_size)
+            ForecastDetail.objects.bulk_create(self._details, batch_size=self.batch_size)
+            accuracy.add_completed(self._completed)
+            response_cache.invalidate('forecasts')
+        self.elapsed += time.perf_counter() - start
+        self.rows_written += rows
+        self.batches_written += 1
+        self._forecasts = []
+        self._updates = []
+        self._details = []
+        self._completed = []
+
+    def stats(self):
+        """Throughput summary for the rows written so far"""
+        return {
+            'rows_written': self.rows_written,
+            'batches': self.batches_written,
+            'batch_size': self.batch_size,
+            'seconds': round(self.elapsed, 4),
+            'rows_per_second': round(self.rows_written / self.elapsed, 1) if self.elapsed else None,
+        }
@@ -0,0 +1,135 @@
+"""
+Empirical forecast quantiles from one-step-ahead residuals.
+
+The engines' bounds are fixed multiples of the point forecast. Here every
+series of a chunk is replayed at each day of its history with the
+rolling-origin backtester (horizon 1), which gives the out-of-sample
+one-step residuals actual - forecast for all products at once. From them:
+
+  * per-day bounds: the point forecast plus the residual quantiles of the
+    FORECAST_INTERVAL central interval (clipped so the interval contains
+    the point forecast);
+  * lead-time quantiles: the quantiles of every run of `lead_time_days`
+    consecutive residuals, summed, added to the forecast demand over the
+    lead time. These are stored on the Forecast (Forecast.quantiles) for
+    each of FORECAST_QUANTILE_LEVELS, so inventory optimization can read a
+    service-level quantile without refitting anything.
+
+Algorithms the backtester cannot replay use the ensemble's residuals (as for
+metrics); ARIMA and XGBoost keep their model-based per-day intervals.
+"""
+import warnings
+
+import numpy as np
+from django.conf import settings
+
+from .backtest import HOLDOUT_SCORED_ALGORITHMS, RollingOriginBacktester, backtest_algorithm
+
+DEFAULT_LEVELS = (0.5, 0.8, 0.9, 0.95, 0.98, 0.99)
+DEFAULT_INTERVAL = 0.8
+MIN_RESIDUALS = 10
+
+
+def quantile_settings():
+    """(enabled, levels, interval) from settings"""
+    return (
+        getattr(settings, 'FORECAST_QUANTILES_ENABLED', True),
+        tuple(sorted(getattr(settings, 'FORECAST_QUANTILE_LEVELS', DEFAULT_LEVELS))),
+        getattr(settings, 'FORECAST_INTERVAL', DEFAULT_INTERVAL),
+    )
+
+
+def one_step_residuals(matrix, mask, algorithm):
+    """(n_series, n_origins) one-step-ahead actual - forecast, oldest first, NaN where untested"""
+    n_days = matrix.shape[1]
+    if n_days < 2:
+        return np.full((matrix.shape[0], 0), np.nan)
+    backtester = RollingOriginBacktester(matrix, mask, folds=n_days - 1, horizon=1)
+    errors = backtester.actual[:, :, 0] - backtester.fold_forecasts(backtest_algorithm(algorithm))[:, :, 0]
+    return np.where(backtester.fold_valid, errors, np.nan)[:, ::-1]
+
+
+def window_sums(residuals, lengths):
+    """Sum of every run of lengths[i] consecutive residuals of series i; NaN for runs with a gap"""
+    n_series, n = residuals.shape
+    valid = np.isfinite(residuals)
+    zeros = np.zeros((n_series, 1))
+    csum = np.concatenate((zeros, np.cumsum(np.where(valid, residuals, 0), axis=1)), axis=1)
+    ccount = np.concatenate((zeros, np.cumsum(valid, axis=1)), axis=1)
+    ends = np.arange(1, n + 1)[None, :]
+    starts = ends - lengths[:, None]
+    clipped = np.maximum(starts, 0)
+    rows = np.arange(n_series)[:, None]
+    sums = csum[rows, ends] - csum[rows, clipped]
+    full = (starts >= 0) & (ccount[rows, ends] - ccount[rows, clipped] == lengths[:, None])
+    return np.where(full, sums, np.nan)
+
+
+def _row_quantiles(samples, levels):
+    """(len(levels), n_series) quantiles per row, NaN for rows with fewer than MIN_RESIDUALS samples"""
+    enough = np.isfinite(samples).sum(axis=1) >= MIN_RESIDUALS
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN rows
+        result = np.nanquantile(samples, levels, axis=1) if samples.shape[1] else \
+            np.full((len(levels), samples.shape[0]), np.nan)
+    return np.where(enough[None, :], result, np.nan)
+
+
+def algorithm_uses_empirical_bounds(algorithm):
+    """Whether per-day bounds are replaced (ARIMA / XGBoost keep their own intervals)"""
+    return algorithm not in HOLDOUT_SCORED_ALGORITHMS
+
+
+class ResidualQuantiles:
+    """Residual quantiles for one chunk of series, applied to each series' forecast"""
+
+    def __init__(self, matrix, mask, algorithm, lead_times, levels=DEFAULT_LEVELS, interval=DEFAULT_INTERVAL):
+        """
+        matrix / mask: the chunk's history_matrix()
+        algorithm: the run's algorithm, or one per series (routed products)
+        lead_times: lead time in days per series
+        """
+        algorithms = [algorithm] * len(matrix) if isinstance(algorithm, str) else list(algorithm)
+        self.empirical = np.array([algorithm_uses_empirical_bounds(a) for a in algorithms], dtype=bool)
+        self.levels = tuple(levels)
+        self.lead_times = np.maximum(np.asarray(lead_times, dtype=np.int64), 1)
+        residuals = np.full((len(matrix), max(matrix.shape[1] - 1, 0)), np.nan)
+        for name in set(algorithms):
+            rows = [i for i, a in enumerate(algorithms) if a == name]
+            residuals[rows] = one_step_residuals(matrix[rows], mask[rows], name)
+        low, high = _row_quantiles(residuals, [(1 - interval) / 2, (1 + interval) / 2])
+        self.low = np.minimum(low, 0)
+        self.high = np.maximum(high, 0)
+        self.lead_offsets = _row_quantiles(window_sums(residuals, self.lead_times), self.levels)
+
+    def apply(self, i, result):
+        """Result of series i with empirical bounds and its lead-time quantiles (None if too little history)"""
+        forecast = np.asarray(result['forecast'], dtype=np.float64)
+        result = dict(result)
+        if self.empirical[i] and not np.isnan(self.low[i]):
+            result['lower_bound'] = np.maximum(forecast + self.low[i], 0)
+            result['upper_bound'] = forecast + self.high[i]
+
+        offsets = self.lead_offsets[:, i]
+        if np.isnan(offsets).any() or not len(forecast):
+            result['quantiles'] = None
+            return result
+        lead_time = int(self.lead_times[i])
+        covered = min(lead_time, len(forecast))
+        # Past the horizon, demand continues at the forecast's average daily rate
+        mean = forecast[:covered].sum() + (lead_time - covered) * forecast.mean()
+        result['quantiles'] = {
+            'lead_time_days': lead_time,
+            'mean': round(float(mean), 4),
+            'levels': {f'{q:g}': round(float(max(mean + offset, 0)), 4) for q, offset in zip(self.levels, offsets)},
+        }
+        return result
+
+
+def service_level_quantile(quantiles, service_level):
+    """
+    Lead-time demand at `service_level` from a stored Forecast.quantiles
+    dict, interpolated between the stored levels (clipped to their range).
+    """
+    levels = sorted((float(q), v) for q, v in quantiles['levels'].items())
+    return float(np.interp(service_level, [q for q, _ in levels], [v for _, v in levels]))
@@ -0,0 +1,137 @@
+"""
+Server-side cache for read-heavy dashboard endpoints.
+
+Cached responses are keyed by endpoint, absolute URL and the current
+version of every data group they read ('forecasts', 'inventory'). Writes
+bump a group's version (signals for single-row saves, explicit calls after
+bulk writes), which orphans every entry built from the old data without
+having to enumerate keys; orphans age out with their TTL.
+
+Each entry stores the response data and an ETag derived from its JSON
+body. A request whose If-None-Match matches gets an empty 304.
+
+Entries and versions live in the 'responses' cache alias, which must be
+shared by every process that writes or serves the data (file-based by
+default, or Redis; see RESPONSE_CACHE_* settings). Without that alias
+caching is off rather than falling back to a per-process cache, where
+a worker's invalidations would never reach the serving process.
+"""
+import hashlib
+import json
+import logging
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'responses'
+GROUPS = ('forecasts', 'inventory')
+DEFAULT_TTL = 300
+
+
+def response_cache():
+    """The configured cache backend, or None when response caching is disabled"""
+    if not getattr(settings, 'RESPONSE_CACHE_ENABLED', False):
+        return None
+    try:
+        return caches[CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return None
+
+
+def cache_ttl(name):
+    """TTL in seconds for one endpoint, falling back to RESPONSE_CACHE_TTL"""
+    ttls = getattr(settings, 'RESPONSE_CACHE_TTLS', {})
+    return ttls.get(name, getattr(settings, 'RESPONSE_CACHE_TTL', DEFAULT_TTL))
+
+
+def _version_key(group):
+    return f'response-cache:version:{group}'
+
+
+def _versions(cache, groups):
+    keys = [_version_key(g) for g in groups]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _bump(groups):
+    cache = response_cache()
+    if cache is None:
+        return
+    try:
+        cache.set_many({_version_key(g): uuid.uuid4().hex for g in groups}, None)
+    except Exception as e:
+        logger.error(f"Response cache invalidation failed for {', '.join(groups)}: {str(e)}")
+
+
+def invalidate(*groups):
+    """Drop cached responses built from these data groups once the current transaction commits"""
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        raise ValueError(f"Unknown response cache group(s): {', '.join(sorted(unknown))}")
+    transaction.on_commit(lambda: _bump(groups))
+
+
+def _etag(body):
+    return '"' + hashlib.md5(body, usedforsecurity=False).hexdigest() + '"'
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def cached_response(name, groups):
+    """
+    Cache a GET viewset action per URL under the versions of `groups`.
+
+    Only 200 responses are stored. Adds an ETag header and answers a
+    matching If-None-Match with 304.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            cache = response_cache()
+            if cache is None or request.method != 'GET':
+                return method(self, request, *args, **kwargs)
+
+            url = request.build_absolute_uri()
+            versions = ':'.join(_versions(cache, groups))
+            key = 'response-cache:' + hashlib.md5(
+                f'{name}|{versions}|{url}'.encode(), usedforsecurity=False).hexdigest()
+
+            entry = cache.get(key)
+            response = None
+            if entry is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                body = json.dumps(response.data, cls=JSONEncoder).encode()
+                entry = (json.loads(body), _etag(body))
+                cache.set(key, entry, cache_ttl(name))
+
+            data, etag = entry
+            if _etag_matches(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            elif response is None:
+                response = Response(data)
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Product, HistoricalDemand, Forecast, ForecastDetail
+from .aggregation import aggregation_settings
+from .hierarchy import hierarchy_settings
+from .models import Product, HistoricalDemand, Forecast, ForecastDetail, ForecastJob
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,15 +23,70 @@ class ForecastDetailSerializer(serializers.ModelSerializer):
 
 class ForecastSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
-    details = ForecastDetailSerializer(many=True, read_only=True)
+    details = serializers.SerializerMethodField()
 
     class Meta:
         model = Forecast
         fields = ['id', 'product', 'product_name', 'algorithm', 'forecast_date', 'predicted_demand', 
                 'confidence_interval_lower', 'confidence_interval_upper', 'mae', 'rmse', 'mape', 
-                'accuracy_score', 'status', 'forecast_horizon_days', 'error_message', 'details', 'created_at']
-        
+                'accuracy_score', 'metrics_partial', 'status', 'forecast_horizon_days', 'granularity', 'error_message', 'quantiles', 'details',
+                'created_at']
+
+    def get_details(self, obj):
+        return obj.detail_rows()
+
+
+class ForecastSummarySerializer(ForecastSerializer):
+    """Forecast without the per-day details, for ?view=summary listings"""
+
+    class Meta(ForecastSerializer.Meta):
+        fields = [f for f in ForecastSerializer.Meta.fields if f != 'details']
+
 class BulkForecastSerializer(serializers.Serializer):
-    algorithm = serializers.ChoiceField(choices=['arima', 'xgboost', 'prophet', 'ensemble'])
+    algorithm = serializers.ChoiceField(choices=['arima', 'xgboost', 'prophet', 'ensemble', 'moving_avg', 'exp_smoothing', 'linear_trend', 'seasonal_naive', 'croston', 'sba', 'tsb'])
     forecast_horizon_days = serializers.IntegerField(default=30, min_value=1, max_value=365)
-    product_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
\ No newline at end of file
+    product_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    batch_size = serializers.IntegerField(required=False, min_value=1, max_value=100000)
+    parallel = serializers.BooleanField(required=False, allow_null=True, default=None)
+    ensemble_mode = serializers.ChoiceField(
+        choices=['mean', 'weighted'], required=False,
+        help_text="Equal-weight or accuracy-weighted ensemble (defaults to FORECAST_ENSEMBLE_MODE)")
+    reconciliation = serializers.ChoiceField(
+        choices=['none', 'bottom_up', 'top_down', 'mint'], required=False,
+        help_text="Hierarchical reconciliation across categories (defaults to FORECAST_RECONCILIATION)")
+    granularity = serializers.ChoiceField(
+        choices=['day', 'week', 'month'], required=False,
+        help_text="Forecast daily, or on weekly / monthly buckets (defaults to FORECAST_GRANULARITY)")
+    disaggregate = serializers.BooleanField(
+        required=False, allow_null=True, default=None,
+        help_text="Split weekly / monthly forecasts back into days (defaults to FORECAST_DISAGGREGATE)")
+    fill = serializers.ChoiceField(
+        choices=['none', 'zero', 'ffill', 'interpolate'], required=False,
+        help_text="How days without a demand record are filled (defaults to FORECAST_FILL_POLICY)")
+    wait = serializers.BooleanField(default=False, help_text="Run synchronously instead of queueing a job")
+
+    def validate(self, data):
+        # Omitted options fall back to settings, so check the values the run will use
+        granularity = aggregation_settings(data.get('granularity'))[0]
+        reconciliation = hierarchy_settings(data.get('reconciliation'))['method']
+        if granularity != 'day' and (data.get('algorithm') == 'xgboost' or reconciliation != 'none'):
+            raise serializers.ValidationError("XGBoost and hierarchical reconciliation need daily granularity")
+        return data
+
+
+class ForecastJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ForecastJob
+        fields = ['id', 'algorithm', 'forecast_horizon_days', 'product_ids', 'status',
+                'total_products', 'products_done', 'products_skipped', 'products_failed',
+                'progress', 'skipped', 'result', 'error_message', 'attempts', 'created_at', 'started_at',
+                'finished_at']
+
+    def get_progress(self, obj):
+        """Fraction of products processed (done, skipped or failed)"""
+        if not obj.total_products:
+            return 1.0 if obj.status == 'completed' else 0.0
+        processed = obj.products_done + obj.products_skipped + obj.products_failed
+        return round(processed / obj.total_products, 4)
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Keep ForecasterState in step with single-row HistoricalDemand changes, the
+accuracy summary in step with single-row Forecast / Product changes, and
+drop cached dashboard responses when forecasts or products change.
+
+Bulk inserts don't send signals; callers of bulk_create use
+state.record_demand / accuracy.add_completed / response_cache.invalidate
+directly.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import accuracy, response_cache
+from .models import Product, HistoricalDemand, Forecast
+from .state import record_demand, invalidate
+
+
+@receiver(post_save, sender=HistoricalDemand)
+def historical_demand_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        record_demand([instance])
+    else:
+        invalidate([instance.product_id])
+
+
+@receiver(post_delete, sender=HistoricalDemand)
+def historical_demand_deleted(sender, instance, **kwargs):
+    invalidate([instance.product_id])
+
+
+def _summary_key(algorithm, category, forecast_date):
+    return (algorithm, category, accuracy.month_start(forecast_date))
+
+
+@receiver(pre_save, sender=Forecast)
+def forecast_saving(sender, instance, raw=False, **kwargs):
+    # Remember the summary group an update moves the forecast out of
+    instance._summary_key = None
+    if raw or instance._state.adding:
+        return
+    old = (Forecast.objects.filter(pk=instance.pk, status='completed')
+           .values_list('algorithm', 'product__category', 'forecast_date').first())
+    if old:
+        instance._summary_key = _summary_key(*old)
+
+
+@receiver(post_save, sender=Forecast)
+@receiver(post_delete, sender=Forecast)
+def forecast_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keys = {getattr(instance, '_summary_key', None)}
+    if instance.status == 'completed':
+        keys.add(_summary_key(instance.algorithm, instance.product.category, instance.forecast_date))
+    keys.discard(None)
+    if keys:
+        accuracy.schedule_refresh(keys)
+    response_cache.invalidate('forecasts')
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, raw=False, **kwargs):
+    instance._old_category = None
+    if not raw and not instance._state.adding:
+        instance._old_category = (Product.objects.filter(pk=instance.pk)
+                                  .values_list('category', flat=True).first())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old_category = getattr(instance, '_old_category', None)
+    if old_category is not None and old_category != instance.category:
+        # Recategorized: its forecasts move between summary groups
+        accuracy.schedule_refresh(categories=[old_category, instance.category])
+    # Product names appear in both forecast and inventory responses
+    response_cache.invalidate('forecasts', 'inventory')
@@ -0,0 +1,258 @@
+"""
+Columnar snapshot store for demand history (optional, needs pyarrow).
+
+HistoricalDemand is exported to Arrow IPC files partitioned by product
+category. Each export appends a new part file holding only dates newer than
+what the snapshot already has for each product, tracked in manifest.json.
+Reads memory-map the files and hand the columns to NumPy without building
+per-row Python objects, returning the same {product_id: (dates, quantities)}
+shape as history.load_history.
+
+The manifest also keeps each product's row count and demand total. When the
+database no longer matches them once the new dates are accounted for (rows
+back-filled, edited or deleted at or before the watermark, or a category
+change), the product's whole history is exported again and its rows in
+older parts are ignored from then on (since_part).
+
+Layout:
+    <root>/manifest.json
+    <root>/category=<slug>/part-00001.arrow
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.db.models import Count, Q, Sum
+from django.utils.text import slugify
+
+from .history import fetch_columns, group_columns
+from .models import Product, HistoricalDemand
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+
+
+def _require_pyarrow():
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow is required for the history snapshot store (pip install pyarrow)")
+
+
+class HistorySnapshot:
+    """Arrow IPC snapshot of HistoricalDemand partitioned by category"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    # Manifest -----------------------------------------------------------
+
+    def _load_manifest(self):
+        try:
+            with open(self.root / MANIFEST) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {'products': {}, 'parts': []}
+
+    def _db_totals(self):
+        """{product id string: (rows, demand total)} of the database history"""
+        rows = (HistoricalDemand.objects.order_by().values('product_id')
+                .annotate(n=Count('id'), total=Sum('quantity_demanded'))
+                .values_list('product_id', 'n', 'total'))
+        return {str(pid): (n, float(total or 0)) for pid, n, total in rows}
+
+    def is_current(self):
+        """Whether every product's row count and demand total still match the database"""
+        known = {
+            pid: (p.get('rows'), p.get('total'))
+            for pid, p in self._load_manifest()['products'].items() if p.get('rows')
+        }
+        return known == self._db_totals()
+
+    def _save_manifest(self, manifest):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(manifest, fh)
+        os.replace(tmp, self.root / MANIFEST)
+
+    def exists(self):
+        return (self.root / MANIFEST).exists()
+
+    # Export -------------------------------------------------------------
+
+    def export(self, full=False):
+        """
+        Append history newer than the snapshot's per-product watermark.
+
+        full: drop the snapshot and re-export everything.
+        Returns {'rows': n, 'parts': [...]} for the parts written.
+        """
+        _require_pyarrow()
+        if full and self.root.exists():
+            shutil.rmtree(self.root)
+        manifest = self._load_manifest()
+        known = manifest['products']
+
+        categories = dict(Product.objects.values_list('id', 'category'))
+        queryset = HistoricalDemand.objects.all()
+        dated = [p['last_date'] for p in known.values() if p.get('last_date')]
+        if dated:
+            # Only rows after the oldest watermark, or of products not yet
+            # in the snapshot, can be new
+            unseen = [pid for pid in categories if str(pid) not in known]
+            queryset = queryset.filter(Q(date__gt=min(dated)) | Q(product_id__in=unseen))
+        pid_arr, date_arr, qty_arr = fetch_columns(queryset)
+        pid_str = pid_arr.astype(str)
+
+        if len(pid_arr):
+            # Drop rows at or before each product's own watermark
+            floor = np.array(
+                [known.get(pid, {}).get('last_date') or '0001-01-01' for pid in pid_str],
+                dtype='datetime64[D]',
+            )
+            keep = date_arr > floor
+            pid_arr, pid_str, date_arr, qty_arr = pid_arr[keep], pid_str[keep], date_arr[keep], qty_arr[keep]
+
+        # Products whose exported rows no longer match the database are exported again in full
+        db_totals = self._db_totals()
+        new_rows = {}
+        for pid, qty in zip(pid_str, qty_arr):
+            n, total = new_rows.get(pid, (0, 0.0))
+            new_rows[pid] = (n + 1, total + qty)
+        categories_by_str = {str(pid): category for pid, category in categories.items()}
+        changed = []
+        for pid, p in known.items():
+            n, total = new_rows.get(pid, (0, 0.0))
+            db_rows, db_total = db_totals.get(pid, (0, 0.0))
+            if ((p.get('rows'), p.get('total')) != (db_rows - n, db_total - total)
+                    or p['category'] != categories_by_str.get(pid, p['category'])):
+                changed.append(pid)
+        since_part = len(manifest['parts'])
+        if changed:
+            keep = ~np.isin(pid_str, changed)
+            full_pid, full_date, full_qty = fetch_columns(HistoricalDemand.objects.filter(product_id__in=changed))
+            pid_arr = np.concatenate((pid_arr[keep], full_pid))
+            pid_str = np.concatenate((pid_str[keep], full_pid.astype(str)))
+            date_arr = np.concatenate((date_arr[keep], full_date))
+            qty_arr = np.concatenate((qty_arr[keep], full_qty))
+            order = np.lexsort((date_arr, pid_str))
+            pid_arr, pid_str, date_arr, qty_arr = pid_arr[order], pid_str[order], date_arr[order], qty_arr[order]
+            for pid in changed:
+                # Reset: rows in earlier parts are ignored, emptied products stay empty
+                known[pid] = {'category': categories_by_str.get(pid, known[pid]['category']), 'last_date': None,
+                              'rows': 0, 'total': 0.0, 'since_part': since_part}
+            logger.info(f"History snapshot: re-exporting {len(changed)} changed products")
+
+        written = []
+        category_arr = np.array([categories.get(pid, '') for pid in pid_arr], dtype=object)
+        for category in sorted(set(category_arr)):
+            in_category = category_arr == category
+            part = self._write_part(
+                category, pid_str[in_category], date_arr[in_category], qty_arr[in_category], manifest)
+            written.append(part)
+
+        for pid, (dates, quantities) in group_columns(pid_arr, date_arr, qty_arr).items():
+            previous = known.get(str(pid), {})
+            known[str(pid)] = {
+                'category': categories.get(pid, ''),
+                'last_date': str(dates[-1]),
+                'rows': previous.get('rows', 0) + len(quantities),
+                'total': previous.get('total', 0.0) + float(quantities.sum()),
+                'since_part': previous.get('since_part', 0),
+            }
+        if written or changed or not self.exists():
+            self._save_manifest(manifest)
+        return {'rows': int(len(pid_arr)), 'parts': written}
+
+    def _write_part(self, category, product_ids, dates, quantities, manifest):
+        partition = self.root / f'category={slugify(category) or "uncategorized"}'
+        partition.mkdir(parents=True, exist_ok=True)
+        name = f'part-{len(manifest["parts"]) + 1:05d}.arrow'
+        table = pa.table({
+            'product_id': pa.array(product_ids).dictionary_encode(),
+            'date': pa.array(dates.astype('datetime64[D]'), type=pa.date32()),
+            'quantity_demanded': pa.array(quantities, type=pa.float64()),
+        })
+        path = partition / name
+        # Uncompressed IPC so readers can memory-map the buffers
+        with pa.OSFile(str(path), 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        part = {'path': str(path.relative_to(self.root)), 'category': category, 'rows': table.num_rows}
+        manifest['parts'].append(part)
+        return part
+
+    # Read ---------------------------------------------------------------
+
+    def _read_part(self, path):
+        """
+        Memory-map one part. Returns (codes, names, dates, quantities) where
+        codes index into names, so product ids are never materialized per row.
+        """
+        table = ipc.open_file(pa.memory_map(str(self.root / path), 'r')).read_all()
+        product = table.column('product_id').combine_chunks()
+        codes = product.indices.to_numpy(zero_copy_only=False)
+        names = product.dictionary.to_pylist()
+        dates = table.column('date').combine_chunks().to_numpy(zero_copy_only=False).astype('datetime64[D]')
+        # float64 buffer is viewed straight from the mapped file
+        quantities = table.column('quantity_demanded').combine_chunks().to_numpy(zero_copy_only=False)
+        return codes, names, dates, quantities
+
+    def load_history(self, product_ids=None, categories=None):
+        """
+        Read the snapshot as {product_id: (dates, quantities)} like history.load_history.
+
+        product_ids / categories: optional filters; categories prunes whole partitions.
+        """
+        _require_pyarrow()
+        manifest = self._load_manifest()
+        wanted = {str(pid) for pid in product_ids} if product_ids is not None else None
+
+        # Rows of re-exported products in parts before their since_part are superseded
+        since = {pid: p['since_part'] for pid, p in manifest['products'].items() if p.get('since_part')}
+
+        # Part dictionaries are remapped onto one code space per distinct product
+        index = {}
+        columns = []
+        for number, part in enumerate(manifest['parts']):
+            if categories is not None and part['category'] not in categories:
+                continue
+            codes, names, dates, quantities = self._read_part(part['path'])
+            remap = np.array([index.setdefault(name, len(index)) for name in names], dtype=np.int64)
+            codes = remap[codes]
+            kept = [name for name in names
+                    if (wanted is None or name in wanted) and since.get(name, 0) <= number]
+            if len(kept) < len(names):
+                keep = np.isin(codes, [index[name] for name in kept])
+                codes, dates, quantities = codes[keep], dates[keep], quantities[keep]
+            columns.append((codes, dates, quantities))
+        if not columns:
+            return {}
+
+        codes = np.concatenate([c[0] for c in columns])
+        dates = np.concatenate([c[1] for c in columns])
+        quantities = np.concatenate([c[2] for c in columns])
+        # Later parts only hold newer dates, so a stable sort by product keeps date order
+        order = np.argsort(codes, kind='stable')
+        names = list(index)
+        grouped = group_columns(codes[order], dates[order], quantities[order])
+        return {uuid.UUID(names[code]): series for code, series in grouped.items()}
+
+
+def default_snapshot():
+    """Snapshot configured in settings"""
+    from django.conf import settings
+
+    return HistorySnapshot(getattr(settings, 'FORECAST_HISTORY_SNAPSHOT_DIR',
+                                   settings.BASE_DIR / 'history_snapshots'))
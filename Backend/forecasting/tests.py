@@ -1,3 +1,1590 @@
-from django.test import TestCase
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from inventory.models import InventoryLevel, StockMovement
+from procurement.models import Supplier, ProcurementOrder
+from .models import Product, HistoricalDemand, Forecast, ForecastDetail
+
+
+class ForecastingTestCase(TestCase):
+    """
+    Keeps fitted-model cache entries in a per-class temporary directory and
+    cached responses in memory (tests run in one process).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cache_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cache_dir.cleanup)
+        cls.enterClassContext(override_settings(
+            FORECAST_MODEL_CACHE_DIR=Path(cache_dir.name),
+            CACHES={**settings.CACHES, 'responses': settings.RESPONSE_CACHE_BACKENDS['locmem']},
+        ))
+        super().setUpClass()
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class QueryBudgetTests(ForecastingTestCase):
+    """
+    List endpoints must run a fixed number of queries per page: the count for
+    a small page and a larger one has to be the same.
+    """
+
+    SMALL = 3
+    LARGE = 30
+
+    def setUp(self):
+        self.client = APIClient()
+        self.supplier = Supplier.objects.create(
+            name='Supplier', contact_email='supplier@example.com', contact_phone='1',
+            location='Here', average_lead_time_days=5,
+        )
+        self.created = 0
+
+    def add_rows(self, n):
+        """Create n products, each with one row for every listed model"""
+        today = date.today()
+        for i in range(self.created, self.created + n):
+            product = Product.objects.create(
+                name=f'Product {i}', sku=f'SKU-{i}', category='Test',
+                current_price=Decimal('9.99'), lead_time_days=7,
+            )
+            HistoricalDemand.objects.create(product=product, date=today, quantity_demanded=i, actual_sales=i)
+            forecast = Forecast.objects.create(
+                product=product, algorithm='moving_avg', forecast_date=today, forecast_horizon_days=3,
+                predicted_demand=1, confidence_interval_lower=0, confidence_interval_upper=2, status='completed',
+            )
+            ForecastDetail.objects.bulk_create([
+                ForecastDetail(forecast=forecast, forecast_date=today + timedelta(days=d + 1),
+                               predicted_quantity=1, lower_bound=0, upper_bound=2)
+                for d in range(3)
+            ])
+            inventory = InventoryLevel.objects.create(
+                product=product, current_stock=1, minimum_stock_level=5, maximum_stock_level=50,
+                safety_stock=2, reorder_quantity=10, holding_cost_per_unit=Decimal('1.00'),
+            )
+            StockMovement.objects.create(inventory=inventory, movement_type='inbound', quantity=1)
+            ProcurementOrder.objects.create(
+                product=product, supplier=self.supplier, quantity=1, unit_cost=Decimal('9.99'),
+                expected_delivery_date=today,
+            )
+        self.created += n
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assert_query_budget(self, *urls):
+        self.add_rows(self.SMALL)
+        small = {url: self.count_queries(url) for url in urls}
+        self.add_rows(self.LARGE - self.SMALL)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), small[url],
+                                 f'{url} query count grows with page size')
+
+    def test_list_endpoints(self):
+        self.assert_query_budget(
+            '/api/products/',
+            '/api/historical-demand/',
+            '/api/forecasts/',
+            '/api/forecasts/?view=summary',
+            '/api/inventory/',
+            '/api/inventory/low_stock_alert/',
+            '/api/stock-movements/',
+            '/api/suppliers/',
+            '/api/procurement-orders/',
+        )
+
+    def test_summary_omits_details(self):
+        self.add_rows(1)
+        full = self.client.get('/api/forecasts/').json()['results'][0]
+        summary = self.client.get('/api/forecasts/?view=summary').json()['results'][0]
+        self.assertEqual(len(full['details']), 3)
+        self.assertNotIn('details', summary)
+        self.assertEqual(summary['product_name'], full['product_name'])
+
+
+class KeysetPaginationTests(ForecastingTestCase):
+    """?pagination=cursor walks the table along its index without COUNT(*)"""
+
+    def setUp(self):
+        self.client = APIClient()
+        start = date(2024, 1, 1)
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Product {i}', sku=f'SKU-{i}', category='Test',
+                current_price=Decimal('1.00'), lead_time_days=7,
+            )
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=product, date=start + timedelta(days=d),
+                                 quantity_demanded=d, actual_sales=d)
+                for d in range(7)
+            ])
+        self.expected = list(HistoricalDemand.objects.order_by('product_id', 'date').values_list('id', flat=True))
+
+    def walk(self, url):
+        ids, query_counts = [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                body = self.client.get(url).json()
+            self.assertNotIn('count', body)
+            self.assertFalse(any('COUNT(' in q['sql'] for q in queries.captured_queries))
+            query_counts.append(len(queries))
+            ids.extend(str(row['id']) for row in body['results'])
+            url = body['next']
+        return ids, query_counts
+
+    def test_cursor_walk_covers_every_row_once(self):
+        ids, query_counts = self.walk('/api/historical-demand/?pagination=cursor&page_size=4')
+        self.assertEqual(ids, [str(pk) for pk in self.expected])
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_count_free_page_numbers(self):
+        ids, _ = self.walk('/api/historical-demand/?count=false&page_size=5&ordering=date')
+        self.assertEqual(sorted(ids), sorted(str(pk) for pk in self.expected))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/historical-demand/?cursor=bogus').status_code, 404)
+
+    def test_stock_movements_cursor(self):
+        product = Product.objects.first()
+        inventory = InventoryLevel.objects.create(
+            product=product, current_stock=1, minimum_stock_level=5, maximum_stock_level=50,
+            safety_stock=2, reorder_quantity=10, holding_cost_per_unit=Decimal('1.00'),
+        )
+        StockMovement.objects.bulk_create([
+            StockMovement(inventory=inventory, movement_type='inbound', quantity=i) for i in range(5)
+        ])
+        ids, _ = self.walk('/api/stock-movements/?pagination=cursor&page_size=2')
+        self.assertEqual(sorted(ids), sorted(str(pk) for pk in StockMovement.objects.values_list('id', flat=True)))
+
+    def test_cursor_pages_seek_into_the_index(self):
+        from unittest import SkipTest
+        from .pagination import KeysetPagination, _keyset_filter
+
+        if connection.vendor != 'sqlite':
+            raise SkipTest('EXPLAIN QUERY PLAN output is SQLite specific')
+        inventory = InventoryLevel.objects.create(
+            product=Product.objects.first(), current_stock=1, minimum_stock_level=5, maximum_stock_level=50,
+            safety_stock=2, reorder_quantity=10, holding_cost_per_unit=Decimal('1.00'),
+        )
+        StockMovement.objects.bulk_create([
+            StockMovement(inventory=inventory, movement_type='inbound', quantity=i) for i in range(5)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        pagination = KeysetPagination()
+        for model, ordering in ((HistoricalDemand, ('product', 'date')), (StockMovement, ('inventory', 'created_at'))):
+            with self.subTest(model=model.__name__):
+                view = type('View', (), {'keyset_ordering': ordering})()
+                keys = pagination.get_keys(model.objects.all(), view)
+                row = model.objects.order_by(*keys)[2]
+                values = [getattr(row, pagination._key_field(model, key).attname) for key in keys]
+                plan = model.objects.order_by(*keys).filter(_keyset_filter(keys, values))[:4].explain()
+                # A later page starts with an index seek, not a walk from the first row
+                self.assertIn('SEARCH', plan)
+                for step in ('SCAN', 'MULTI-INDEX OR', 'TEMP B-TREE'):
+                    self.assertNotIn(step, plan)
+
+
+class ResponseCacheTests(ForecastingTestCase):
+    """Dashboard reads are served from cache until a write bumps their data group"""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.product = Product.objects.create(
+            name='Product', sku='SKU-1', category='Test', current_price=Decimal('1.00'), lead_time_days=7,
+        )
+
+    def create_forecast(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Forecast.objects.create(
+                product=self.product, algorithm='moving_avg', forecast_date=date.today(),
+                forecast_horizon_days=1, predicted_demand=1, confidence_interval_lower=0,
+                confidence_interval_upper=2, status='completed', accuracy_score=70,
+            )
+
+    def test_cache_hit_and_invalidation(self):
+        url = '/api/forecasts/accuracy_report/'
+        self.create_forecast()
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.json(), first.json())
+
+        self.create_forecast()
+        self.assertEqual(self.client.get(url).json()['total_forecasts'], 2)
+
+    def test_etag_not_modified(self):
+        url = '/api/forecasts/'
+        self.create_forecast()
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.create_forecast()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_inventory_invalidation(self):
+        url = '/api/inventory/low_stock_alert/'
+        self.assertEqual(self.client.get(url).json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryLevel.objects.create(
+                product=self.product, current_stock=1, minimum_stock_level=5, maximum_stock_level=50,
+                safety_stock=2, reorder_quantity=10, holding_cost_per_unit=Decimal('1.00'),
+            )
+        self.assertEqual(len(self.client.get(url).json()), 1)
+
+    def test_invalidation_reaches_other_processes(self):
+        from unittest import mock
+        from django.core.cache.backends.filebased import FileBasedCache
+        from .response_cache import _bump, _versions
+
+        # Two handles on one directory stand for the API process and the worker
+        with tempfile.TemporaryDirectory() as directory:
+            server, worker = FileBasedCache(directory, {}), FileBasedCache(directory, {})
+            before = _versions(server, ['forecasts'])
+            with mock.patch('forecasting.response_cache.response_cache', return_value=worker):
+                _bump(['forecasts'])
+            self.assertNotEqual(_versions(server, ['forecasts']), before)
+
+    def test_no_per_process_fallback(self):
+        from .response_cache import response_cache
+
+        with override_settings(CACHES={'default': settings.CACHES['default']}):
+            self.assertIsNone(response_cache())
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class AccuracySummaryTests(ForecastingTestCase):
+    """The materialized accuracy report matches a direct aggregate over Forecast"""
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', category=f'Cat {i % 2}',
+                                   current_price=Decimal('1.00'), lead_time_days=7)
+            for i in range(4)
+        ]
+
+    def expected_totals(self):
+        from .accuracy import _grouped_totals
+        return _grouped_totals(Forecast.objects.all())
+
+    def summary_totals(self):
+        from .accuracy import TOTAL_FIELDS
+        from .models import ForecastAccuracySummary
+        return {
+            (row.algorithm, row.category, row.month): {f: getattr(row, f) for f in TOTAL_FIELDS}
+            for row in ForecastAccuracySummary.objects.filter(forecast_count__gt=0)
+        }
+
+    def test_writer_and_signals_keep_summary_current(self):
+        from .persistence import ForecastWriter
+
+        result = {'forecast': [1.0, 2.0], 'lower_bound': [0.5, 1.0], 'upper_bound': [2.0, 3.0],
+                  'mae': 1.5, 'rmse': 2.0, 'mape': 10.0, 'accuracy': 70}
+        writer = ForecastWriter()
+        for i, product in enumerate(self.products):
+            writer.add(product, ['moving_avg', 'linear_trend'][i % 2], date(2024, 1 + i % 3, 5), 2, result)
+        writer.flush()
+        self.assertEqual(self.summary_totals(), self.expected_totals())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            forecast = Forecast.objects.filter(algorithm='moving_avg').first()
+            forecast.algorithm = 'ensemble'
+            forecast.mae = None
+            forecast.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Forecast.objects.filter(algorithm='linear_trend').first().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.products[0]
+            product.category = 'Moved'
+            product.save()
+        self.assertEqual(self.summary_totals(), self.expected_totals())
+
+    def test_report_breakdowns(self):
+        from .accuracy import rebuild_summary
+
+        for i, product in enumerate(self.products):
+            Forecast.objects.create(
+                product=product, algorithm='moving_avg', forecast_date=date(2024, 1 + i % 2, 1),
+                forecast_horizon_days=1, predicted_demand=1, confidence_interval_lower=0,
+                confidence_interval_upper=2, status='completed', accuracy_score=60 + 10 * i, mae=i,
+            )
+        rebuild_summary()
+        with CaptureQueriesContext(connection) as queries:
+            report = self.client.get('/api/forecasts/accuracy_report/').json()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(report['total_forecasts'], 4)
+        self.assertAlmostEqual(report['avg_accuracy'], 75)
+        self.assertIsNone(report['avg_rmse'])
+        self.assertEqual([row['category'] for row in report['by_category']], ['Cat 0', 'Cat 1'])
+        self.assertEqual([row['month'] for row in report['by_month']], ['2024-01', '2024-02'])
+        self.assertEqual(report['by_algorithm'][0]['total_forecasts'], 4)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class PackedPathTests(ForecastingTestCase):
+    """Packed per-day paths serialize exactly like ForecastDetail rows"""
+
+    result = {'forecast': [1.25, 2.5, 3.1], 'lower_bound': [0.5, 1.0, 1.7],
+              'upper_bound': [2.0, 3.75, 4.4], 'mae': 1, 'rmse': 1, 'mape': 1, 'accuracy': 70}
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                              current_price=Decimal('1.00'), lead_time_days=7)
+
+    def write(self, storage):
+        from .persistence import ForecastWriter
+
+        with override_settings(FORECAST_DETAIL_STORAGE=storage):
+            writer = ForecastWriter()
+            forecast = writer.add(self.product, 'moving_avg', date(2024, 3, 30), 3, self.result)
+            writer.flush()
+        return self.client.get(f'/api/forecasts/{forecast.id}/').json()['details']
+
+    def test_packed_matches_rows(self):
+        rows = self.write('rows')
+        packed = self.write('packed')
+        self.assertEqual(packed, rows)
+        self.assertEqual(ForecastDetail.objects.count(), 3)
+
+    def test_convert_details(self):
+        from .paths import convert_details
+
+        rows = self.write('rows')
+        self.assertEqual(convert_details(), {'converted': 1, 'skipped': 0, 'rows_deleted': 3})
+        self.assertFalse(ForecastDetail.objects.exists())
+        forecast = Forecast.objects.get()
+        self.assertEqual(self.client.get(f'/api/forecasts/{forecast.id}/').json()['details'], rows)
+
+
+class BacktestTests(ForecastingTestCase):
+    """Rolling-origin folds refit each method exactly as the per-product engine would"""
+
+    def test_fold_forecasts_match_engine(self):
+        import numpy as np
+        from .backtest import RollingOriginBacktester
+        from .ml_engine import DemandForecaster
+        from .panel import PANEL_ALGORITHMS
+
+        rng = np.random.default_rng(0)
+        matrix = rng.poisson(10, (6, 40)).astype(float)
+        mask = np.ones(matrix.shape, dtype=bool)
+        mask[0, :30] = False  # short series: only the latest fold is long enough
+        backtester = RollingOriginBacktester(matrix, mask, folds=2, horizon=5)
+
+        for algorithm in PANEL_ALGORITHMS + ('ensemble',):
+            folds = backtester.fold_forecasts(algorithm)
+            for i in range(len(matrix)):
+                for k, origin in enumerate(backtester.origins):
+                    if not backtester.fold_valid[i, k]:
+                        continue
+                    y = matrix[i, :origin][mask[i, :origin]]
+                    dates = np.arange(len(y)).astype('datetime64[D]')
+                    expected = DemandForecaster.from_arrays(dates, y).forecast(
+                        algorithm, 5, expensive_results={})['forecast']
+                    np.testing.assert_allclose(folds[i, k], expected, err_msg=algorithm)
+
+        metrics = backtester.metrics('moving_avg')
+        self.assertIsNotNone(metrics[1]['mae'])
+        self.assertGreaterEqual(metrics[1]['accuracy'], 0)
+
+    def test_generation_stores_backtest_metrics(self):
+        from .generation import generate_forecasts
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=start + timedelta(days=d),
+                             quantity_demanded=10 + d % 7, actual_sales=10)
+            for d in range(60)
+        ])
+        with override_settings(FORECAST_INCREMENTAL_STATE=False):
+            generate_forecasts(algorithm='linear_trend', horizon=7)
+        forecast = Forecast.objects.get(status='completed')
+        self.assertGreater(forecast.mae, 0)
+        self.assertGreater(forecast.rmse, forecast.mae - 1e-9)
+        self.assertNotEqual(forecast.accuracy_score, 65)
+        self.assertFalse(forecast.metrics_partial)
+
+    def test_ensemble_metrics_flagged_partial(self):
+        from unittest import mock
+        from .alignment import AlignedPanel
+        from .generation import backtest_chunk
+        from .history import load_history
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=date(2024, 1, 1) + timedelta(days=d),
+                             quantity_demanded=10 + d % 7, actual_sales=10)
+            for d in range(60)
+        ])
+        panel = AlignedPanel(load_history(), [product.id])
+        members = 'forecasting.weighted_ensemble.available_expensive_members'
+        with mock.patch(members, return_value=['holt_winters']):
+            self.assertTrue(backtest_chunk(panel, [product.id], 'ensemble', 3, 7)[product.id]['metrics_partial'])
+            self.assertNotIn('metrics_partial', backtest_chunk(panel, [product.id], 'moving_avg', 3, 7)[product.id])
+        # Without the expensive libraries the cheap members are the whole ensemble
+        with mock.patch(members, return_value=[]):
+            self.assertNotIn('metrics_partial', backtest_chunk(panel, [product.id], 'ensemble', 3, 7)[product.id])
+
+    @override_settings(FORECAST_QUANTILES_ENABLED=True)
+    def test_state_path_skips_the_history_scan(self):
+        from unittest import mock
+        from .generation import generate_forecasts
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=date(2024, 1, 1) + timedelta(days=d), quantity_demanded=10,
+                             actual_sales=10)
+            for d in range(30)
+        ])
+        with mock.patch('forecasting.generation.read_history', side_effect=AssertionError('history read')):
+            generate_forecasts(algorithm='linear_trend', horizon=7)
+        forecast = Forecast.objects.get()
+        # Neither backtest metrics nor residual quantiles: both would need the history
+        self.assertEqual(forecast.accuracy_score, 65)
+        self.assertIsNone(forecast.quantiles)
+
+
+class WeightedEnsembleTests(ForecastingTestCase):
+    """Learned member weights, pruning and reuse of stored weights"""
+
+    def test_learn_weights_prunes_and_penalizes_cost(self):
+        from .weighted_ensemble import learn_weights
+
+        errors = {'moving_avg': 1.0, 'linear_trend': 2.0, 'holt_winters': 50.0, 'prophet': None}
+        weights, pruned = learn_weights(errors, {'holt_winters': 2.0}, min_weight=0.05, cost_penalty=0)
+        self.assertEqual(pruned, ['holt_winters'])
+        self.assertAlmostEqual(sum(weights.values()), 1)
+        self.assertAlmostEqual(weights['moving_avg'], 2 * weights['linear_trend'], places=4)
+
+        # A costly member loses weight it would have kept on accuracy alone
+        errors = {'moving_avg': 1.0, 'holt_winters': 0.5}
+        cheap, _ = learn_weights(errors, {'holt_winters': 1.0}, min_weight=0.05, cost_penalty=0)
+        costly, _ = learn_weights(errors, {'holt_winters': 1.0}, min_weight=0.05, cost_penalty=10)
+        self.assertLess(costly['holt_winters'], cheap['holt_winters'])
+
+        # The best member survives even below the threshold
+        weights, _ = learn_weights({'moving_avg': 1.0}, {}, min_weight=2, cost_penalty=0)
+        self.assertEqual(weights, {'moving_avg': 1.0})
+
+    def test_generation_calibrates_then_reuses_weights(self):
+        from .generation import generate_forecasts
+        from .models import EnsembleWeights
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=start + timedelta(days=d),
+                             quantity_demanded=10 + d % 7, actual_sales=10)
+            for d in range(60)
+        ])
+        generate_forecasts(algorithm='ensemble', horizon=7, parallel=False, ensemble_mode='weighted')
+        row = EnsembleWeights.objects.get(scope='product', key=str(product.id))
+        self.assertAlmostEqual(sum(row.weights.values()), 1)
+        # Seasonal naive is exact on a weekly pattern, so it dominates
+        self.assertEqual(max(row.weights, key=row.weights.get), 'seasonal_naive')
+        self.assertIn('moving_avg', row.pruned)
+
+        forecast = Forecast.objects.get(status='completed')
+        self.assertEqual(len(forecast.detail_rows()), 7)
+        self.assertIsNotNone(forecast.mae)
+
+        calibrated_at = row.calibrated_at
+        generate_forecasts(algorithm='ensemble', horizon=7, parallel=False, ensemble_mode='weighted')
+        row.refresh_from_db()
+        self.assertEqual(row.calibrated_at, calibrated_at)
+        self.assertEqual(Forecast.objects.filter(status='completed').count(), 2)
+
+
+class ArimaXGBoostTests(ForecastingTestCase):
+    """ARIMA and the catalog-wide XGBoost model produce their own forecasts and holdout metrics"""
+
+    def setUp(self):
+        start = date(2024, 1, 1)
+        self.products = []
+        for i in range(3):
+            product = Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', category='Test',
+                                             current_price=Decimal('1.00'), lead_time_days=7)
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=product, date=start + timedelta(days=d),
+                                 quantity_demanded=(i + 1) * (10 + d % 7), actual_sales=10,
+                                 external_factors={'promotion': d % 10 == 0})
+                for d in range(90)
+            ])
+            self.products.append(product)
+
+    def test_arima(self):
+        from .generation import generate_forecasts
+        from .ml_engine import HAS_STATSMODELS
+        if not HAS_STATSMODELS:
+            self.skipTest('statsmodels is not installed')
+
+        summary = generate_forecasts(algorithm='arima', horizon=10, parallel=False)
+        self.assertEqual(summary['failed'], 0)
+        for forecast in Forecast.objects.all():
+            self.assertEqual(forecast.status, 'completed')
+            self.assertIsNotNone(forecast.mae)
+            rows = forecast.detail_rows()
+            self.assertEqual(len(rows), 10)
+            self.assertTrue(all(r['lower_bound'] <= r['predicted_quantity'] <= r['upper_bound'] for r in rows))
+
+    def test_xgboost_global_model(self):
+        from .generation import generate_forecasts
+        from .global_model import HAS_XGBOOST
+        from .history import factor_matrix, history_matrix, load_external_factors, load_history
+        if not HAS_XGBOOST:
+            self.skipTest('xgboost is not installed')
+
+        ids = [p.id for p in self.products]
+        history = load_history()
+        _, _, start = history_matrix(history, ids)
+        factors = factor_matrix(load_external_factors(), ids, start, 90)
+        self.assertEqual(factors.shape, (3, 90, 1))
+        self.assertEqual(factors[0, 0, 0], 1.0)
+
+        with override_settings(FORECAST_XGBOOST_ROUNDS=50):
+            summary = generate_forecasts(algorithm='xgboost', horizon=14)
+        self.assertEqual(summary['failed'], 0)
+        by_product = {f.product_id: f for f in Forecast.objects.all()}
+        for i, product in enumerate(self.products):
+            forecast = by_product[product.id]
+            self.assertIsNotNone(forecast.accuracy_score)
+            predicted = [r['predicted_quantity'] for r in forecast.detail_rows()]
+            # A weekly pattern scaled per product: the global model tracks each level
+            self.assertAlmostEqual(sum(predicted) / len(predicted), (i + 1) * 13, delta=(i + 1) * 2)
+
+    def test_xgboost_training_heartbeat(self):
+        from unittest import mock
+        from .alignment import AlignedPanel
+        from .global_model import HAS_XGBOOST, forecast_catalog
+        from .history import load_history
+        if not HAS_XGBOOST:
+            self.skipTest('xgboost is not installed')
+
+        beats = []
+        panel = AlignedPanel(load_history(), [p.id for p in self.products])
+        with override_settings(FORECAST_XGBOOST_ROUNDS=5), mock.patch('forecasting.global_model.HEARTBEAT_SECONDS', 0):
+            forecast_catalog(panel, horizon_days=3, heartbeat=lambda: beats.append(1))
+        # Every boosting round and every predicted day
+        self.assertEqual(len(beats), 5 + 3)
+
+    def test_xgboost_falls_back_per_product(self):
+        from .generation import generate_forecasts
+        from .global_model import HAS_XGBOOST
+        if not HAS_XGBOOST:
+            self.skipTest('xgboost is not installed')
+
+        short = Product.objects.create(name='Short', sku='SKU-S', category='Test',
+                                       current_price=Decimal('1.00'), lead_time_days=7)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=short, date=date(2024, 3, 25) + timedelta(days=d), quantity_demanded=5,
+                             actual_sales=5)
+            for d in range(6)
+        ])
+        with override_settings(FORECAST_XGBOOST_ROUNDS=20):
+            summary = generate_forecasts(algorithm='xgboost', horizon=7)
+            self.assertEqual(summary['failed'], 0)
+            algorithms = dict(Forecast.objects.values_list('product_id', 'algorithm'))
+            self.assertEqual(algorithms.pop(short.id), 'ensemble')
+            self.assertEqual(set(algorithms.values()), {'xgboost'})
+
+            # No product long enough to train on: every one degrades instead of failing the run
+            summary = generate_forecasts(product_ids=[short.id], algorithm='xgboost', horizon=7)
+            self.assertEqual(summary['failed'], 0)
+        self.assertEqual(Forecast.objects.filter(product=short, status='completed').count(), 2)
+
+
+class QuantileTests(ForecastingTestCase):
+    """Empirical residual intervals and service-level safety stock"""
+
+    def test_window_sums_and_coverage(self):
+        import numpy as np
+        from .quantiles import ResidualQuantiles, window_sums
+
+        residuals = np.array([[1.0, 2.0, np.nan, 4.0, 5.0, 6.0]])
+        np.testing.assert_array_equal(
+            window_sums(residuals, np.array([2])), [[np.nan, 3.0, np.nan, np.nan, 9.0, 11.0]])
+
+        rng = np.random.default_rng(1)
+        matrix = rng.normal(100, 10, (200, 400)).clip(0)
+        engine = ResidualQuantiles(matrix, np.ones(matrix.shape, dtype=bool), 'moving_avg',
+                                   lead_times=[5] * 200, levels=(0.5, 0.95))
+        result = engine.apply(0, {'forecast': np.full(30, 100.0), 'lower_bound': np.zeros(30),
+                                  'upper_bound': np.zeros(30)})
+        # Gaussian noise with sd 10 (plus moving-average error): ~80% interval of +-13
+        self.assertAlmostEqual(result['upper_bound'][0] - 100, 13.7, delta=3)
+        levels = result['quantiles']['levels']
+        self.assertEqual(result['quantiles']['mean'], 500)
+        self.assertAlmostEqual(levels['0.5'], 500, delta=10)
+        # Lead-time sums of residuals spread roughly with sqrt(5)
+        self.assertAlmostEqual(levels['0.95'] - 500, 1.645 * 10.7 * 5 ** 0.5, delta=12)
+
+    # Quantiles come from residuals over the history, which the incremental state path skips
+    @override_settings(RESPONSE_CACHE_ENABLED=False, FORECAST_INCREMENTAL_STATE=False)
+    def test_optimize_uses_service_level_quantile(self):
+        from .generation import generate_forecasts
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=start + timedelta(days=d),
+                             quantity_demanded=10 + (d * 7919) % 11, actual_sales=10)
+            for d in range(120)
+        ])
+        InventoryLevel.objects.create(product=product, current_stock=50, minimum_stock_level=10,
+                                      maximum_stock_level=100, safety_stock=5, reorder_quantity=20,
+                                      holding_cost_per_unit=Decimal('1.00'))
+        generate_forecasts(algorithm='moving_avg', horizon=14)
+        quantiles = Forecast.objects.get().quantiles
+        self.assertEqual(quantiles['lead_time_days'], 7)
+
+        client = APIClient()
+        low = client.post('/api/inventory/optimize/', {'service_level': 0.8}, format='json').data
+        high = client.post('/api/inventory/optimize/', {'service_level': 0.99}, format='json').data
+        self.assertEqual(high['optimizations'][0]['safety_stock_method'], 'service_level_quantile')
+        self.assertLess(low['optimizations'][0]['new_safety_stock'], high['optimizations'][0]['new_safety_stock'])
+        self.assertEqual(client.post('/api/inventory/optimize/', {'service_level': 2}, format='json').status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class HierarchyTests(ForecastingTestCase):
+    """Reconciled SKU forecasts add up to their category and the total"""
+
+    def setUp(self):
+        start = date(2024, 1, 1)
+        self.products = []
+        for i, (category, days) in enumerate([('A', 120), ('A', 120), ('A', 20), ('B', 120)]):
+            product = Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', category=category,
+                                             current_price=Decimal('1.00'), lead_time_days=7)
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=product, date=start + timedelta(days=120 - days + d),
+                                 quantity_demanded=(i + 1) * 10 + (d * 7919) % 7, actual_sales=10)
+                for d in range(days)
+            ])
+            self.products.append(product)
+
+    def _totals(self):
+        by_product = {f.product_id: float(f.predicted_demand) for f in Forecast.objects.all()}
+        return [by_product[p.id] for p in self.products]
+
+    def test_mint_is_coherent_and_skips_long_tail_fits(self):
+        from .generation import generate_forecasts
+
+        with override_settings(FORECAST_TOP_DOWN_MAX_RECORDS=50):
+            summary = generate_forecasts(algorithm='moving_avg', horizon=14, reconciliation='mint')
+        self.assertEqual(summary['failed'], 0)
+        hierarchy = summary['hierarchy']
+        self.assertEqual(hierarchy['top_down_products'], 1)
+        totals = self._totals()
+        self.assertAlmostEqual(hierarchy['categories']['A'], sum(totals[:3]), delta=0.1)
+        self.assertAlmostEqual(hierarchy['categories']['B'], totals[3], delta=0.1)
+        self.assertAlmostEqual(hierarchy['total'], sum(totals), delta=0.1)
+        long_tail = Forecast.objects.get(product=self.products[2])
+        self.assertIsNone(long_tail.mae)
+        self.assertGreater(long_tail.predicted_demand, 0)
+
+    def test_top_down_splits_category_by_share(self):
+        from .generation import generate_forecasts
+
+        summary = generate_forecasts(algorithm='moving_avg', horizon=14, reconciliation='top_down')
+        self.assertEqual(summary['hierarchy']['top_down_products'], 4)
+        totals = self._totals()
+        # Shares of the last 90 days: products 0 and 1 sell ~13 and ~23 a day, product 2 only 20 days of ~33
+        self.assertAlmostEqual(totals[1] / totals[0], 23 / 13, delta=0.05)
+        self.assertAlmostEqual(totals[2] / totals[0], 20 * 33 / (90 * 13), delta=0.05)
+        self.assertAlmostEqual(summary['hierarchy']['categories']['A'], sum(totals[:3]), delta=0.1)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class IntermittentDemandTests(ForecastingTestCase):
+    """ADI / CV² classification routes sporadic series to the Croston family"""
+
+    def test_classification_and_croston_family(self):
+        import numpy as np
+        from .intermittent import classify_demand
+        from .ml_engine import forecast_intermittent
+
+        rng = np.random.default_rng(0)
+        matrix = np.array([
+            np.full(60, 10.0),  # smooth
+            rng.choice([1.0, 30.0], 60),  # erratic
+            np.tile([0.0, 0.0, 3.0], 20),  # intermittent
+            np.tile([0.0, 0.0, 1.0, 0.0, 0.0, 40.0], 10),  # lumpy
+        ])
+        classes, adi, _ = classify_demand(matrix)
+        self.assertEqual(list(classes), ['smooth', 'erratic', 'intermittent', 'lumpy'])
+        self.assertAlmostEqual(adi[2], 3.0)
+
+        # Demand of 3 every third day: 1 a day, less the SBA bias correction
+        croston, sba = (forecast_intermittent(matrix[2:3], method=m, horizon_days=5)[0]['forecast']
+                        for m in ('croston', 'sba'))
+        np.testing.assert_allclose(croston, 1.0)
+        np.testing.assert_allclose(sba, 0.95)
+
+    def test_ensemble_routes_intermittent_products(self):
+        from .generation import generate_forecasts
+        from .models import DemandClassification
+
+        start = date(2024, 1, 1)
+        smooth = Product.objects.create(name='Smooth', sku='SKU-S', category='Test',
+                                        current_price=Decimal('1.00'), lead_time_days=7)
+        sporadic = Product.objects.create(name='Sporadic', sku='SKU-I', category='Test',
+                                          current_price=Decimal('1.00'), lead_time_days=7)
+        for product, quantity in ((smooth, lambda d: 10 + d % 3), (sporadic, lambda d: 4 if d % 4 == 3 else 0)):
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=product, date=start + timedelta(days=d),
+                                 quantity_demanded=quantity(d), actual_sales=0)
+                for d in range(60)
+            ])
+
+        summary = generate_forecasts(algorithm='ensemble', horizon=14, parallel=False)
+        self.assertEqual(summary['routed_intermittent'], 1)
+        self.assertEqual(Forecast.objects.get(product=smooth).algorithm, 'ensemble')
+        routed = Forecast.objects.get(product=sporadic)
+        self.assertEqual(routed.algorithm, 'sba')
+        self.assertIsNotNone(routed.mae)
+        self.assertAlmostEqual(routed.predicted_demand, 14 * 0.95, delta=1)
+
+        classification = DemandClassification.objects.get(product=sporadic)
+        self.assertEqual((classification.demand_class, classification.method), ('intermittent', 'sba'))
+        # The stored class is reused by the next run
+        generate_forecasts(algorithm='ensemble', horizon=14, parallel=False)
+        self.assertEqual(DemandClassification.objects.get(product=sporadic).classified_at,
+                         classification.classified_at)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class TemporalAggregationTests(ForecastingTestCase):
+    """Weekly / monthly forecasts from bucketed history, optionally split back into days"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                              current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)  # a Monday
+        # 70 a week, all of it on weekdays: 14 Monday to Friday, nothing at the weekend
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=self.product, date=start + timedelta(days=d),
+                             quantity_demanded=14 if d % 7 < 5 else 0, actual_sales=0)
+            for d in range(84)
+        ])
+
+    def test_bucketing_in_database_and_numpy_agree(self):
+        from .aggregation import TemporalAggregation
+        from .history import load_history
+
+        aggregation = TemporalAggregation('week', date(2024, 6, 5), 30)
+        grouped = aggregation.load_history()[self.product.id]
+        resampled = aggregation.resample(load_history())[self.product.id]
+        self.assertEqual(len(grouped[0]), 12)
+        self.assertEqual(str(grouped[0][0]), '2024-01-01')
+        for a, b in zip(grouped, resampled):
+            self.assertEqual(list(a), list(b))
+        self.assertTrue((grouped[1] == 70).all())
+        # 2024-06-05 is a Wednesday: 30 days touch 5 ISO weeks
+        self.assertEqual(aggregation.n_periods, 5)
+
+    def test_weekly_forecast_disaggregated_by_weekday(self):
+        from .generation import generate_forecasts
+
+        summary = generate_forecasts(algorithm='moving_avg', horizon=28, granularity='week')
+        self.assertEqual(summary['granularity'], 'week')
+        forecast = Forecast.objects.get()
+        self.assertEqual(forecast.granularity, 'day')
+        rows = forecast.detail_rows()
+        self.assertEqual(len(rows), 28)
+        self.assertAlmostEqual(forecast.predicted_demand, 280, delta=0.1)
+        for row in rows:
+            weekend = date.fromisoformat(str(row['forecast_date'])).weekday() >= 5
+            self.assertAlmostEqual(row['predicted_quantity'], 0 if weekend else 14, delta=0.01)
+
+    @override_settings(FORECAST_DETAIL_STORAGE='packed')
+    def test_periods_stored_without_disaggregation(self):
+        from .generation import generate_forecasts
+
+        generate_forecasts(algorithm='moving_avg', horizon=28, granularity='week', disaggregate=False)
+        forecast = Forecast.objects.get()
+        self.assertEqual(forecast.granularity, 'week')
+        rows = forecast.detail_rows()
+        self.assertLessEqual(len(rows), 5)
+        self.assertAlmostEqual(sum(r['predicted_quantity'] for r in rows), 280, delta=0.1)
+        self.assertEqual(rows[0]['forecast_date'], forecast.forecast_date.isoformat())
+        self.assertTrue(all(date.fromisoformat(r['forecast_date']).weekday() == 0 for r in rows[1:]))
+
+    @override_settings(FORECAST_GRANULARITY='week', FORECAST_RECONCILIATION='none')
+    def test_configured_granularity_rejects_daily_only_options(self):
+        client = APIClient()
+        for body in ({'algorithm': 'xgboost'}, {'algorithm': 'ensemble', 'reconciliation': 'mint'}):
+            response = client.post('/api/forecasts/generate/', body, format='json')
+            self.assertEqual(response.status_code, 400)
+        with override_settings(FORECAST_RECONCILIATION='bottom_up'):
+            response = client.post('/api/forecasts/generate/', {'algorithm': 'moving_avg'}, format='json')
+            self.assertEqual(response.status_code, 400)
+        response = client.post('/api/forecasts/generate/', {'algorithm': 'xgboost', 'granularity': 'day'},
+                               format='json')
+        self.assertNotEqual(response.status_code, 400)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class AlignmentTests(ForecastingTestCase):
+    """Series laid on a dense daily grid, with the gaps between records filled"""
+
+    def test_fill_policies(self):
+        import numpy as np
+        from .alignment import fill_gaps
+
+        matrix = np.array([[0.0, 2.0, 0.0, 0.0, 8.0, 0.0]])
+        mask = np.array([[False, True, False, False, True, False]])
+        expected = {'zero': [0, 2, 0, 0, 8, 0], 'ffill': [0, 2, 2, 2, 8, 0], 'interpolate': [0, 2, 4, 6, 8, 0]}
+        for policy, values in expected.items():
+            filled, valid = fill_gaps(matrix, mask, policy)
+            np.testing.assert_allclose(filled[0], values)
+            # Only the days between the first and last record are known
+            self.assertEqual(list(valid[0]), [False, True, True, True, True, False])
+        filled, valid = fill_gaps(matrix, mask, 'none')
+        self.assertIs(valid, mask)
+
+    def test_missing_days_keep_the_weekly_season(self):
+        from .generation import generate_forecasts
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)  # a Monday
+        # Weekday demand only: weekends have no rows at all
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=start + timedelta(days=d), quantity_demanded=14, actual_sales=0)
+            for d in range(61) if d % 7 < 5
+        ])
+
+        generate_forecasts(algorithm='seasonal_naive', horizon=14, fill='zero')
+        path = [r['predicted_quantity'] for r in Forecast.objects.get().detail_rows()]
+        self.assertEqual(sorted(path[:7]), [0, 0, 14, 14, 14, 14, 14])
+        self.assertEqual(path[:7], path[7:])
+
+        Forecast.objects.all().delete()
+        generate_forecasts(algorithm='seasonal_naive', horizon=14, fill='none')
+        path = [r['predicted_quantity'] for r in Forecast.objects.get().detail_rows()]
+        self.assertEqual(set(path), {14})
+
+    def test_aligned_panel(self):
+        import numpy as np
+        from .alignment import AlignedPanel
+
+        day = np.datetime64('2024-01-01')
+        history = {
+            'a': (day + np.array([0, 3]), np.array([2.0, 8.0])),
+            'b': (day + np.array([1, 2]), np.array([5.0, 6.0])),
+        }
+        panel = AlignedPanel(history, ['a', 'b'], 'interpolate')
+        matrix, mask, start = panel.rows(['b'])
+        self.assertEqual(start, day)
+        np.testing.assert_allclose(matrix, [[0, 5, 6, 0]])
+        dates, quantities = panel.series('a')
+        self.assertEqual(list(dates), list(day + np.arange(4)))
+        np.testing.assert_allclose(quantities, [2, 4, 6, 8])
+        # Without filling only the recorded days remain
+        dates, quantities = AlignedPanel(history, ['a', 'b'], 'none').series('a')
+        self.assertEqual(list(dates), list(history['a'][0]))
+
+    def test_chunks_align_on_their_own(self):
+        from .generation import generate_forecasts
+
+        start = date(2024, 1, 1)
+        for i, offset in enumerate((0, 20)):
+            product = Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', category='Test',
+                                             current_price=Decimal('1.00'), lead_time_days=7)
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=product, date=start + timedelta(days=offset + d),
+                                 quantity_demanded=d % 9, actual_sales=0)
+                for d in range(60) if d % 5
+            ])
+        runs = []
+        for chunk_size in (1, 500):
+            Forecast.objects.all().delete()
+            with override_settings(FORECAST_JOB_CHUNK_SIZE=chunk_size, FORECAST_INCREMENTAL_STATE=False):
+                generate_forecasts(algorithm='ensemble', horizon=14, fill='ffill', parallel=False)
+            runs.append(sorted(Forecast.objects.values_list('product__sku', 'predicted_demand', 'mae')))
+        self.assertEqual(runs[0], runs[1])
+
+    @override_settings(FORECAST_FILL_POLICY='interpolate')
+    def test_state_fills_gaps_like_a_rebuild(self):
+        from .models import ForecasterState
+        from .state import load_states
+
+        product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                         current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=start + timedelta(days=d), quantity_demanded=d, actual_sales=0)
+            for d in range(0, 20, 2)
+        ])
+        load_states([product])
+        # Saved rows reach the state through the post_save signal
+        HistoricalDemand.objects.create(product=product, date=start + timedelta(days=24),
+                                        quantity_demanded=30, actual_sales=0)
+        incremental = ForecasterState.objects.get(product=product)
+        self.assertEqual(incremental.n_obs, 25)
+        # Days 19-23 interpolated between 18 and 30
+        self.assertEqual([round(v, 6) for v in incremental.recent_values], [18, 20, 22, 24, 26, 28, 30])
+
+        ForecasterState.objects.filter(product=product).update(is_stale=True)
+        rebuilt = load_states([product])[product.id]
+        self.assertEqual(rebuilt.n_obs, incremental.n_obs)
+        for field in ('sum_y', 'sum_xy', 'es_level'):
+            self.assertAlmostEqual(getattr(rebuilt, field), getattr(incremental, field))
+        for a, b in zip(rebuilt.recent_values, incremental.recent_values):
+            self.assertAlmostEqual(a, b)
+
+
+class ModelCacheTests(ForecastingTestCase):
+    """Fitted models are reused per (product, model, history) and evicted least recently used first"""
+
+    def test_hit_miss_and_lru_eviction(self):
+        import os
+        from .model_cache import ModelCache, history_fingerprint
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModelCache(directory, max_bytes=10 ** 6)
+            fingerprint = history_fingerprint(['2024-01-01'], [1.0])
+            fits = []
+            fit = lambda: fits.append(1) or 'fitted'
+            self.assertEqual(cache.get_or_fit('p1', 'model', fingerprint, fit), 'fitted')
+            self.assertEqual(cache.get_or_fit('p1', 'model', fingerprint, fit), 'fitted')
+            self.assertIsNone(cache.get('p1', 'model', history_fingerprint(['2024-01-01'], [2.0])))
+            self.assertEqual(len(fits), 1)
+            self.assertEqual(cache.counters(), {'hits': 1, 'misses': 2, 'evictions': 0})
+
+            # Three ~400 byte entries over a 1000 byte cap: the oldest goes
+            cache = ModelCache(directory, max_bytes=1000)
+            for i, key in enumerate(('a', 'b')):
+                cache.put(key, 'model', fingerprint, 'x' * 400)
+                os.utime(cache._path(key, 'model', fingerprint), (i, i))
+            cache.put('c', 'model', fingerprint, 'x' * 400)
+            self.assertIsNone(cache.get('a', 'model', fingerprint))
+            self.assertIsNotNone(cache.get('c', 'model', fingerprint))
+            self.assertGreaterEqual(cache.counters()['evictions'], 1)
+
+    def test_one_cache_per_process(self):
+        from django.conf import settings
+        from .model_cache import default_model_cache
+
+        cache = default_model_cache()
+        self.assertIs(default_model_cache(), cache)
+        self.assertEqual(cache.directory, Path(settings.FORECAST_MODEL_CACHE_DIR))
+
+    def test_exponential_smoothing_matches_recursion(self):
+        import numpy as np
+        from .ml_engine import DemandForecaster
+
+        y = np.random.default_rng(0).uniform(0, 20, 50)
+        level = y[0]
+        for value in y[1:]:
+            level = 0.3 * value + 0.7 * level
+        forecaster = DemandForecaster.from_arrays(np.datetime64('2024-01-01') + np.arange(50), y)
+        result = forecaster.forecast_exponential_smoothing(horizon_days=3)
+        np.testing.assert_allclose(result['forecast'], level)
+
+
+class HistoryLoadingTests(ForecastingTestCase):
+    """History of many products comes back grouped per product from one ordered query"""
+
+    def test_group_columns(self):
+        import numpy as np
+        from .history import group_columns
+
+        grouped = group_columns(
+            np.array(['a', 'a', 'b', 'c', 'c', 'c'], dtype=object),
+            np.array(['2024-01-01', '2024-01-02', '2024-01-01', '2024-01-01', '2024-01-03', '2024-01-04'],
+                     dtype='datetime64[D]'),
+            np.arange(6, dtype=np.float64),
+        )
+        self.assertEqual(list(grouped), ['a', 'b', 'c'])
+        self.assertEqual(list(grouped['c'][1]), [3, 4, 5])
+        self.assertEqual(str(grouped['b'][0][0]), '2024-01-01')
+        self.assertEqual(group_columns(np.array([], dtype=object), np.array([], dtype='datetime64[D]'),
+                                       np.array([])), {})
+
+    def test_load_history_in_one_query(self):
+        from .history import load_history
+
+        start = date(2024, 1, 1)
+        products = [Product.objects.create(name=f'P{i}', sku=f'SKU-{i}', category='Test',
+                                           current_price=Decimal('1.00'), lead_time_days=7) for i in range(3)]
+        # Inserted newest first, read back in date order
+        for i, product in enumerate(products[:2]):
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=product, date=start + timedelta(days=d), quantity_demanded=10 * i + d,
+                                 actual_sales=0)
+                for d in reversed(range(4 + i))
+            ])
+
+        with CaptureQueriesContext(connection) as queries:
+            history = load_history([p.id for p in products])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(set(history), {products[0].id, products[1].id})
+        dates, quantities = history[products[1].id]
+        self.assertEqual(list(quantities), [10, 11, 12, 13, 14])
+        self.assertTrue((dates[1:] > dates[:-1]).all())
+        self.assertEqual(set(load_history()), set(history))
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False, FORECAST_DETAIL_STORAGE='rows')
+class ForecastWriterTests(ForecastingTestCase):
+    """Forecasts and their details are written in batches, not row by row"""
+
+    def test_batches_and_stats(self):
+        import numpy as np
+        from .persistence import ForecastWriter, create_pending_forecasts
+
+        products = [Product.objects.create(name=f'P{i}', sku=f'SKU-{i}', category='Test',
+                                           current_price=Decimal('1.00'), lead_time_days=7) for i in range(5)]
+        today = date.today()
+        pending = create_pending_forecasts(products[:2], 'moving_avg', today, 3)
+        result = {'forecast': np.full(3, 2.0), 'lower_bound': np.ones(3), 'upper_bound': np.full(3, 3.0),
+                  'mae': 1, 'rmse': 1, 'mape': 1, 'accuracy': 90}
+
+        # 4 rows per forecast (1 + 3 details): flushes after the 2nd and 4th product
+        writer = ForecastWriter(batch_size=8)
+        with CaptureQueriesContext(connection) as queries:
+            for product in products[:4]:
+                writer.add(product, 'moving_avg', today, 3, result, forecast=pending.get(product.id))
+        self.assertEqual(writer.batches_written, 2)
+        writer.add_failed(products[4], 'moving_avg', today, 'boom')
+        writer.flush()
+        writer.flush()  # nothing pending
+
+        stats = writer.stats()
+        self.assertEqual((stats['rows_written'], stats['batches'], stats['batch_size']), (17, 3, 8))
+        self.assertLess(len(queries), 4 * 5)
+        self.assertEqual(Forecast.objects.count(), 5)
+        self.assertEqual(Forecast.objects.filter(status='completed', predicted_demand=6).count(), 4)
+        self.assertEqual(Forecast.objects.get(status='failed').error_message, 'boom')
+        self.assertEqual(ForecastDetail.objects.count(), 12)
+
+
+class PanelForecasterTests(ForecastingTestCase):
+    """The vectorized panel engine matches the per-product engine, gaps included"""
+
+    def test_matches_demand_forecaster(self):
+        import numpy as np
+        from .ml_engine import DemandForecaster
+        from .panel import PANEL_ALGORITHMS, PanelForecaster
+
+        rng = np.random.default_rng(1)
+        n_days = 40
+        matrix = rng.uniform(0, 30, (6, n_days)).round()
+        mask = rng.random((6, n_days)) > 0.3
+        mask[0] = True  # complete
+        mask[1, :35] = False  # short: falls back to the moving average
+        mask[2, :38] = False  # shorter than a season
+        mask[3] = False  # no history at all
+        dates = np.datetime64('2024-01-01') + np.arange(n_days)
+
+        for algorithm in PANEL_ALGORITHMS:
+            panel = PanelForecaster(matrix, mask).forecast(algorithm, horizon_days=10)
+            for i in range(len(matrix)):
+                with self.subTest(algorithm=algorithm, series=i):
+                    single = DemandForecaster.from_arrays(dates[mask[i]], matrix[i, mask[i]]).forecast(
+                        algorithm, horizon_days=10)
+                    for field in ('forecast', 'lower_bound', 'upper_bound'):
+                        np.testing.assert_allclose(panel[i][field], single[field], atol=1e-9)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False, FORECAST_BACKTEST_ENABLED=False)
+class ForecastJobTests(ForecastingTestCase):
+    """Queued jobs are claimed once, report progress and never leave forecasts open"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                              current_price=Decimal('1.00'), lead_time_days=7)
+        start = date(2024, 1, 1)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=self.product, date=start + timedelta(days=d), quantity_demanded=10,
+                             actual_sales=0)
+            for d in range(30)
+        ])
+
+    def test_claim_and_run(self):
+        from .jobs import claim_next_job, enqueue_job, run_job
+
+        job = enqueue_job('moving_avg', 7, [self.product.id], parallel=None)
+        self.assertEqual((job.status, job.options), ('queued', {}))
+        claimed = claim_next_job()
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts), (job.id, 'running', 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertIsNone(claim_next_job())
+
+        run_job(claimed)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, 'completed')
+        self.assertEqual((claimed.total_products, claimed.products_done), (1, 1))
+        self.assertEqual(claimed.result['total_forecasted'], 1)
+        self.assertEqual(Forecast.objects.get().job_id, job.id)
+
+        response = APIClient().get(f'/api/forecasts/?job={job.id}&view=summary')
+        self.assertEqual([f['status'] for f in response.json()['results']], ['completed'])
+
+    def test_failure_fails_open_forecasts(self):
+        from unittest import mock
+        from .jobs import claim_next_job, enqueue_job, run_job
+
+        enqueue_job('moving_avg', 7)
+        job = claim_next_job()
+        with mock.patch('forecasting.generation.forecast_from_state', side_effect=RuntimeError('boom')):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error_message), ('failed', 'boom'))
+        forecast = Forecast.objects.get()
+        self.assertEqual(forecast.status, 'failed')
+        self.assertIn('boom', forecast.error_message)
+
+    @override_settings(FORECAST_JOB_STALE_SECONDS=60)
+    def test_reclaimed_run_stops_without_completing(self):
+        from unittest import mock
+        from django.utils import timezone
+        from .jobs import claim_next_job, enqueue_job, run_job
+        from .models import ForecastJob
+        from .state import forecast_from_state
+
+        enqueue_job('moving_avg', 7)
+        job = claim_next_job()
+
+        def reclaim(*args, **kwargs):
+            # The heartbeat went stale mid-fit and another worker took the job over
+            ForecastJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(claim_next_job().attempts, 2)
+            return forecast_from_state(*args, **kwargs)
+
+        with mock.patch('forecasting.generation.forecast_from_state', side_effect=reclaim):
+            run_job(job)
+        taken_over = ForecastJob.objects.get(id=job.id)
+        self.assertEqual((taken_over.status, taken_over.attempts, taken_over.finished_at), ('running', 2, None))
+        self.assertEqual(Forecast.objects.get().status, 'failed')
+
+        # The new owner's run completes normally
+        run_job(taken_over)
+        taken_over.refresh_from_db()
+        self.assertEqual(taken_over.status, 'completed')
+        self.assertEqual(sorted(Forecast.objects.values_list('status', flat=True)), ['completed', 'failed'])
+
+        # A stale worker's failure does not touch a job it no longer holds
+        run_job(job)
+        taken_over.refresh_from_db()
+        self.assertEqual(taken_over.status, 'completed')
+
+    def test_fit_all_reconciliation_keeps_the_heartbeat(self):
+        from unittest import mock
+        from .generation import generate_forecasts
+
+        calls = []
+        with override_settings(FORECAST_JOB_CHUNK_SIZE=1), \
+                mock.patch('forecasting.generation.HierarchyReconciler.reconcile',
+                           side_effect=lambda *args, **kwargs: calls.append('reconcile') or {}):
+            Product.objects.create(name='Other', sku='SKU-2', category='Test',
+                                   current_price=Decimal('1.00'), lead_time_days=7)
+            HistoricalDemand.objects.bulk_create([
+                HistoricalDemand(product=Product.objects.get(sku='SKU-2'), date=date(2024, 1, 1) + timedelta(days=d),
+                                 quantity_demanded=5, actual_sales=0)
+                for d in range(30)
+            ])
+            generate_forecasts(algorithm='moving_avg', horizon=7, reconciliation='bottom_up',
+                               progress=lambda **counts: calls.append('progress'))
+        # One heartbeat per fitted chunk before anything is reconciled or written
+        self.assertEqual(calls[:4], ['progress', 'progress', 'progress', 'reconcile'])
+
+    @override_settings(FORECAST_JOB_STALE_SECONDS=60, FORECAST_JOB_MAX_ATTEMPTS=2)
+    def test_stale_jobs_are_reclaimed(self):
+        from django.utils import timezone
+        from .jobs import claim_next_job, enqueue_job
+        from .models import ForecastJob
+        from .persistence import create_pending_forecasts
+
+        job = enqueue_job('moving_avg', 7)
+        claim_next_job()
+        # The worker died after inserting its pending rows
+        create_pending_forecasts([self.product], 'moving_avg', date.today(), 7, job=job)
+        ForecastJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+
+        reclaimed = claim_next_job()
+        self.assertEqual((reclaimed.id, reclaimed.status, reclaimed.attempts), (job.id, 'running', 2))
+        self.assertEqual(Forecast.objects.get().status, 'failed')
+
+        # Out of attempts: failed rather than requeued
+        ForecastJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('stopped responding', job.error_message)
+
+
+class ForecasterStateTests(ForecastingTestCase):
+    """Incrementally updated state matches one rebuilt from the full history"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                              current_price=Decimal('1.00'), lead_time_days=7)
+        self.start = date(2024, 1, 1)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=self.product, date=self.start + timedelta(days=d), quantity_demanded=d % 5,
+                             actual_sales=0)
+            for d in range(20)
+        ])
+
+    def add(self, day, quantity):
+        # Saved rows reach the state through the post_save signal
+        HistoricalDemand.objects.create(product=self.product, date=self.start + timedelta(days=day),
+                                        quantity_demanded=quantity, actual_sales=0)
+
+    def test_incremental_matches_rebuild(self):
+        import numpy as np
+        from .models import ForecasterState
+        from .state import STATE_ALGORITHMS, forecast_from_state, load_states
+
+        load_states([self.product])
+        for day, quantity in ((20, 7), (21, 3), (24, 9)):
+            self.add(day, quantity)
+        incremental = ForecasterState.objects.get(product=self.product)
+        self.assertFalse(incremental.is_stale)
+        # Days 22-23 are filled, not recorded
+        self.assertEqual((incremental.n_obs, incremental.n_records), (25, 23))
+
+        ForecasterState.objects.filter(product=self.product).update(is_stale=True)
+        rebuilt = load_states([self.product])[self.product.id]
+        for algorithm in STATE_ALGORITHMS:
+            with self.subTest(algorithm=algorithm):
+                np.testing.assert_allclose(forecast_from_state(incremental, algorithm, 10)['forecast'],
+                                           forecast_from_state(rebuilt, algorithm, 10)['forecast'])
+
+    def test_out_of_order_rows_mark_state_stale(self):
+        from .models import ForecasterState
+        from .state import load_states
+
+        load_states([self.product])
+        HistoricalDemand.objects.filter(product=self.product, date=self.start).delete()
+        self.assertTrue(ForecasterState.objects.get(product=self.product).is_stale)
+        load_states([self.product])
+
+        self.add(0, 4)  # back-filled before the last recorded day
+        self.assertTrue(ForecasterState.objects.get(product=self.product).is_stale)
+        rebuilt = load_states([self.product])[self.product.id]
+        self.assertFalse(rebuilt.is_stale)
+        self.assertEqual(rebuilt.n_obs, 20)
+
+    def test_both_paths_skip_the_same_products(self):
+        from .generation import generate_forecasts
+
+        # Four records over a month: 28 days once the gaps are filled, still too little history
+        sparse = Product.objects.create(name='Sparse', sku='SKU-2', category='Test',
+                                        current_price=Decimal('1.00'), lead_time_days=7)
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=sparse, date=self.start + timedelta(days=d), quantity_demanded=3, actual_sales=0)
+            for d in (0, 9, 18, 27)
+        ])
+        runs = []
+        for incremental in (True, False):
+            with override_settings(FORECAST_INCREMENTAL_STATE=incremental, FORECAST_FILL_POLICY='zero'):
+                summary = generate_forecasts(algorithm='moving_avg', horizon=7)
+            runs.append(([s['product'] for s in summary['skipped']], len(summary['created_forecasts'])))
+        self.assertEqual(runs, [(['Sparse'], 1)] * 2)
+
+    def test_fill_policy_change_rebuilds(self):
+        from .models import ForecasterState
+        from .state import load_states
+
+        HistoricalDemand.objects.filter(product=self.product, date=self.start + timedelta(days=10)).delete()
+        load_states([self.product])
+        with override_settings(FORECAST_FILL_POLICY='ffill'):
+            # New rows are not folded into a state filled the old way
+            self.add(20, 1)
+            self.assertTrue(ForecasterState.objects.get(product=self.product).is_stale)
+            ForecasterState.objects.filter(product=self.product).update(is_stale=False)
+            rebuilt = load_states([self.product])[self.product.id]
+        self.assertEqual((rebuilt.fill_policy, rebuilt.n_records, rebuilt.n_obs), ('ffill', 20, 21))
+        self.assertEqual(ForecasterState.objects.get(product=self.product).fill_policy, 'ffill')
+
+    def test_products_without_state_are_left_alone(self):
+        from .models import ForecasterState
+
+        self.add(20, 1)
+        self.assertFalse(ForecasterState.objects.exists())
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class IngestTests(ForecastingTestCase):
+    """Streamed rows are upserted on (product, date); bad rows are reported per batch"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Product', sku='SKU-1', category='Test',
+                                              current_price=Decimal('1.00'), lead_time_days=7)
+
+    def test_csv_upsert_and_errors(self):
+        from .ingest import ingest_lines
+
+        HistoricalDemand.objects.create(product=self.product, date=date(2024, 1, 1), quantity_demanded=1,
+                                        actual_sales=1)
+        lines = [
+            'sku,date,quantity_demanded,actual_sales\n',
+            'SKU-1,2024-01-01,5,4\n',  # replaces the existing row
+            'SKU-1,2024-01-02,3.0,\n',
+            'SKU-1,2024-01-03,3.7,3\n',
+            'SKU-X,2024-01-04,1,1\n',
+            'SKU-1,01/05/2024,1,1\n',
+            'SKU-1,2024-01-06,-1,1\n',
+            'SKU-1,2024-01-07,2,2\n',
+        ]
+        report = ingest_lines(lines, batch_size=2)
+        self.assertEqual((report['rows_read'], report['rows_written'], report['rows_rejected']), (7, 3, 4))
+        self.assertEqual([b['rows'] for b in report['batches']], [2, 1])
+        errors = [e for b in report['batches'] for e in b['errors']]
+        self.assertEqual([e['line'] for e in errors], [4, 5, 6, 7])
+        self.assertEqual(errors[0]['error'], 'quantity_demanded must be an integer')
+
+        rows = dict(HistoricalDemand.objects.values_list('date', 'quantity_demanded'))
+        self.assertEqual(rows, {date(2024, 1, 1): 5, date(2024, 1, 2): 3, date(2024, 1, 7): 2})
+        self.assertEqual(HistoricalDemand.objects.get(date=date(2024, 1, 2)).actual_sales, 3)
+
+    def test_ndjson(self):
+        from .ingest import ingest_lines
+
+        lines = [
+            f'{{"product": "{self.product.id}", "date": "2024-01-01", "quantity_demanded": 2, '
+            f'"external_factors": {{"promo": true}}}}\n',
+            '{"sku": "SKU-1", "date": "2024-01-02", "quantity_demanded": 1.5}\n',
+            'not json\n',
+            '\n',
+        ]
+        report = ingest_lines(lines, file_format='ndjson')
+        self.assertEqual((report['rows_written'], report['rows_rejected']), (1, 2))
+        self.assertEqual([e['line'] for e in report['batches'][0]['errors']], [2, 3])
+        self.assertEqual(HistoricalDemand.objects.get().external_factors, {'promo': True})
+
+
+class HistorySnapshotTests(ForecastingTestCase):
+    """The Arrow snapshot reads back what the database holds, including rows changed behind the watermark"""
+
+    def setUp(self):
+        from .snapshot import HAS_PYARROW, HistorySnapshot
+        if not HAS_PYARROW:
+            self.skipTest('pyarrow is not installed')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshot = HistorySnapshot(directory.name)
+        self.start = date(2024, 1, 1)
+        self.products = []
+        for i, category in enumerate(('A', 'A', 'B')):
+            product = Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', category=category,
+                                             current_price=Decimal('1.00'), lead_time_days=7)
+            self.add(product, range(10), base=i)
+            self.products.append(product)
+
+    def add(self, product, days, base=0):
+        HistoricalDemand.objects.bulk_create([
+            HistoricalDemand(product=product, date=self.start + timedelta(days=d), quantity_demanded=base + d,
+                             actual_sales=0)
+            for d in days
+        ])
+
+    def assertMatchesDatabase(self):
+        import numpy as np
+        from .history import load_history
+
+        expected = load_history()
+        actual = self.snapshot.load_history()
+        self.assertEqual(set(actual), set(expected))
+        for pid, (dates, quantities) in expected.items():
+            np.testing.assert_array_equal(actual[pid][0], dates)
+            np.testing.assert_array_equal(actual[pid][1], quantities)
+        self.assertTrue(self.snapshot.is_current())
+
+    def test_round_trip(self):
+        result = self.snapshot.export()
+        self.assertEqual(result['rows'], 30)
+        self.assertEqual(sorted(p['category'] for p in result['parts']), ['A', 'B'])
+        self.assertMatchesDatabase()
+        by_category = self.snapshot.load_history(categories=['B'])
+        self.assertEqual(list(by_category), [self.products[2].id])
+
+    def test_incremental_append(self):
+        self.snapshot.export()
+        self.add(self.products[0], range(10, 15))
+        self.assertFalse(self.snapshot.is_current())
+        result = self.snapshot.export()
+        self.assertEqual(result['rows'], 5)
+        self.assertMatchesDatabase()
+        # Nothing new: nothing written
+        self.assertEqual(self.snapshot.export(), {'rows': 0, 'parts': []})
+
+    def test_backfilled_edited_and_deleted_rows_are_reexported(self):
+        self.snapshot.export()
+        first, second, third = self.products
+        # Back-filled before the watermark, plus a new day
+        self.add(first, [-3, 11])
+        # Upserted quantity (as the ingest does) and a deleted day
+        HistoricalDemand.objects.filter(product=second, date=self.start).update(quantity_demanded=50)
+        HistoricalDemand.objects.filter(product=third, date=self.start + timedelta(days=4)).delete()
+        self.assertFalse(self.snapshot.is_current())
+
+        result = self.snapshot.export()
+        self.assertEqual(result['rows'], 12 + 10 + 9)
+        self.assertMatchesDatabase()
+
+        # A product whose history is gone entirely reads as absent
+        HistoricalDemand.objects.filter(product=third).delete()
+        self.snapshot.export()
+        self.assertMatchesDatabase()
+
+    def test_category_change_moves_the_partition(self):
+        self.snapshot.export()
+        Product.objects.filter(id=self.products[2].id).update(category='A')
+        self.snapshot.export()
+        self.assertEqual(set(self.snapshot.load_history(categories=['A'])), {p.id for p in self.products})
+        self.assertEqual(self.snapshot.load_history(categories=['B']), {})
+
+
+
+def _fake_fit(self, name, horizon, holdout=None):
+    """Stands in for DemandForecaster.fit_member in forked pool workers"""
+    import os
+    import time
+    import numpy as np
+
+    product_id = str(self.product_id)
+    if product_id == 'slow' and name == 'prophet':
+        time.sleep(5)
+    if product_id == 'raises':
+        raise RuntimeError('fit blew up')
+    if product_id == 'crash':
+        os._exit(1)
+    if product_id.startswith('p'):
+        # Later products finish first, so completion order differs from input order
+        time.sleep(0.02 * (5 - int(product_id[1:])))
+    value = float(self.data['quantity_demanded'].iloc[-1])
+    return {'forecast': np.full(horizon, value), 'lower_bound': np.full(horizon, value),
+            'upper_bound': np.full(horizon, value), 'mae': 0.0, 'rmse': 0.0, 'mape': 0.0, 'accuracy': 100.0,
+            'fit_seconds': 0.0}
+
+
+class ParallelFitTests(ForecastingTestCase):
+    """Expensive fits in the worker pool: ordered results, per-fit fallbacks and pool reuse"""
+
+    def series(self, value, days=30):
+        import numpy as np
+        return np.datetime64('2024-01-01') + np.arange(days), np.full(days, float(value))
+
+    def fit(self, product_ids, **kwargs):
+        from unittest import mock
+        from .ml_engine import DemandForecaster
+        from .parallel import fit_expensive_models
+
+        with mock.patch.object(DemandForecaster, 'fit_member', _fake_fit):
+            return fit_expensive_models([self.series(i) for i in range(len(product_ids))], 7,
+                                        product_ids=product_ids, workers=2, chunk_size=1, **kwargs)
+
+    def test_results_keep_input_order(self):
+        results = self.fit([f'p{i}' for i in range(5)])
+        self.assertEqual([r['holt_winters']['forecast'][0] for r in results], [0.0, 1.0, 2.0, 3.0, 4.0])
+
+    def test_timed_out_and_failing_fits_fall_back(self):
+        from .ml_engine import DemandForecaster
+
+        results = self.fit(['slow', 'raises', 'p4'], fit_timeout=0.5)
+        self.assertIsNone(results[0]['prophet'])
+        self.assertIsNotNone(results[0]['holt_winters'])
+        self.assertEqual(results[1], {'holt_winters': None, 'prophet': None})
+        self.assertIsNotNone(results[2]['prophet'])
+
+        # The product still gets a forecast from the cheaper members
+        dates, quantities = self.series(0)
+        result = DemandForecaster.from_arrays(dates, quantities).forecast_ensemble(7, expensive_results=results[0])
+        self.assertEqual(len(result['forecast']), 7)
+
+    def test_crashed_worker_degrades_and_the_pool_is_replaced(self):
+        from .parallel import WorkerPool
+
+        with WorkerPool(workers=1) as pool:
+            results = self.fit(['p0', 'crash', 'p2'], pool=pool)
+            self.assertEqual(len(results), 3)
+            self.assertEqual(results[2], {'holt_winters': None, 'prophet': None})
+            # The next chunk of the run gets a working pool
+            results = self.fit(['p3', 'p4'], pool=pool)
+            self.assertEqual([r['prophet']['forecast'][0] for r in results], [0.0, 1.0])
+
+    @override_settings(FORECAST_JOB_CHUNK_SIZE=2)
+    def test_one_pool_per_generation_run(self):
+        from concurrent.futures import ProcessPoolExecutor
+        from unittest import mock
+        from .generation import generate_forecasts
+        from .ml_engine import DemandForecaster
+
+        start = date.today() - timedelta(days=30)
+        for i in range(5):
+            product = Product.objects.create(name=f'P{i}', sku=f'PAR-{i}', category='A', current_price=Decimal('1'))
+            HistoricalDemand.objects.bulk_create(
+                HistoricalDemand(product=product, date=start + timedelta(days=d), quantity_demanded=5 + i, actual_sales=5 + i)
+                for d in range(30)
+            )
+        with mock.patch('forecasting.parallel.ProcessPoolExecutor', side_effect=ProcessPoolExecutor) as pools, \
+                mock.patch.object(DemandForecaster, 'fit_member', return_value=None):
+            summary = generate_forecasts(algorithm='ensemble', horizon=7, parallel=True,
+                                         reconciliation='none', ensemble_mode='mean')
+        self.assertEqual(len(summary['created_forecasts']), 5)
+        self.assertEqual(pools.call_count, 1)
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class BenchmarkTests(ForecastingTestCase):
+    """Smoke run of the benchmark stages on a tiny catalog"""
+
+    def test_stages_are_reported_and_rolled_back(self):
+        from .benchmark import run_benchmark
+
+        results = run_benchmark(5, 60, algorithms=['moving_avg', 'xgboost'], horizon=7)
+        stages = {(r['algorithm'], r['stage']) for r in results}
+        self.assertEqual(stages, {
+            (None, 'setup'), (None, 'load'), (None, 'optimize'),
+            *((a, s) for a in ('moving_avg', 'xgboost') for s in ('fit', 'backtest', 'persist', 'serialize')),
+        })
+        self.assertTrue(all(r['seconds'] >= 0 for r in results))
+        persist = {r['algorithm']: r for r in results if r['stage'] == 'persist'}
+        self.assertEqual(persist['moving_avg']['skipped'], 0)
+        self.assertFalse(Product.objects.exists())
+
+    def test_untrained_xgboost_series_are_not_persisted(self):
+        from unittest import mock
+        from .benchmark import run_benchmark
+        from .global_model import forecast_catalog
+
+        def partial_catalog(panel, **kwargs):
+            results = forecast_catalog(panel, **kwargs)
+            results[panel.product_ids[0]] = None
+            return results
+
+        with mock.patch('forecasting.benchmark.forecast_catalog', side_effect=partial_catalog):
+            results = run_benchmark(5, 60, algorithms=['xgboost'], horizon=7)
+        persist = next(r for r in results if r['stage'] == 'persist')
+        self.assertEqual(persist['skipped'], 1)
+        self.assertEqual(next(r for r in results if r['stage'] == 'serialize')['rows'], 4)
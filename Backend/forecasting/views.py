@@ -2,16 +2,19 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.utils import timezone
-from django.db.models import Avg
-from datetime import timedelta
-import pandas as pd
-import numpy as np
 import logging
+import uuid
 
-from .models import Product, HistoricalDemand, Forecast, ForecastDetail
-from .serializers import ProductSerializer, HistoricalDemandSerializer, ForecastSerializer, BulkForecastSerializer
-from .ml_engine import DemandForecaster
+from .models import Product, HistoricalDemand, Forecast, ForecastJob
+from .serializers import (ProductSerializer, HistoricalDemandSerializer, ForecastSerializer, ForecastSummarySerializer,
+                          BulkForecastSerializer, ForecastJobSerializer)
+from .accuracy import accuracy_report
+from .generation import generate_forecasts
+from .jobs import enqueue_job
+from .model_cache import default_model_cache
+from .pagination import KeysetPagination
+from .response_cache import cached_response
+from .ingest import ingest_lines, DEFAULT_BATCH_SIZE as INGEST_BATCH_SIZE, FORMATS as INGEST_FORMATS
 
 logger = logging.getLogger(__name__)
 
@@ -23,11 +26,14 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'name']
 
 class HistoricalDemandViewSet(viewsets.ModelViewSet):
-    queryset = HistoricalDemand.objects.all()
+    queryset = HistoricalDemand.objects.select_related('product')
     serializer_class = HistoricalDemandSerializer
     permission_classes = [AllowAny]
     search_fields = ['product__name', 'product__sku']
     ordering_fields = ['date', 'quantity_demanded']
+    pagination_class = KeysetPagination
+    # ?pagination=cursor pages along the (product, date) index
+    keyset_ordering = ('product', 'date')
 
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
@@ -38,13 +44,65 @@ class HistoricalDemandViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        """
+        Stream CSV or NDJSON historical demand from the request body.
+
+        Format comes from ?file_format=csv|ndjson or the Content-Type
+        (text/csv, application/x-ndjson). Rows are upserted on (product, date).
+        """
+        file_format = request.query_params.get('file_format')
+        if not file_format:
+            content_type = request.content_type or ''
+            file_format = 'ndjson' if 'ndjson' in content_type or 'jsonl' in content_type else 'csv'
+        if file_format not in INGEST_FORMATS:
+            return Response({'error': f"Unsupported format '{file_format}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', INGEST_BATCH_SIZE))
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the raw body line by line instead of parsing it into request.data
+        stream = request.stream
+        lines = (line.decode('utf-8-sig') for line in iter(stream.readline, b'')) if stream else iter(())
+        report = ingest_lines(lines, file_format=file_format, batch_size=max(1, batch_size))
+        return Response(report, status=status.HTTP_200_OK)
+
 class ForecastViewSet(viewsets.ModelViewSet):
-    queryset = Forecast.objects.all()
+    queryset = Forecast.objects.select_related('product')
     serializer_class = ForecastSerializer
     permission_classes = [AllowAny]
     search_fields = ['product__name', 'algorithm']
     ordering_fields = ['forecast_date', 'accuracy_score']
 
+    def is_summary(self):
+        """?view=summary drops the per-day details from the representation"""
+        return self.request is not None and self.request.query_params.get('view') == 'summary'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # ?job=<id> lists the forecasts of one queued generation run
+        job_id = self.request.query_params.get('job') if self.request is not None else None
+        if job_id:
+            try:
+                queryset = queryset.filter(job_id=uuid.UUID(job_id))
+            except ValueError:
+                return queryset.none()
+        if self.is_summary():
+            return queryset
+        return queryset.prefetch_related('details')
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return ForecastSummarySerializer
+        return super().get_serializer_class()
+
+    @cached_response('forecast_list', groups=['forecasts'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
     @action(detail=False, methods=['post'])
     def generate(self, request):
@@ -53,97 +111,51 @@ class ForecastViewSet(viewsets.ModelViewSet):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        algorithm = serializer.validated_data.get('algorithm', 'ensemble')
-        horizon = serializer.validated_data.get('forecast_horizon_days', 30)
-        product_ids = serializer.validated_data.get('product_ids')
+        data = serializer.validated_data
+        algorithm = data.get('algorithm', 'ensemble')
+        horizon = data.get('forecast_horizon_days', 30)
+        product_ids = data.get('product_ids')
         
-        if product_ids:
-            products = Product.objects.filter(id__in=product_ids)
-        else:
-            products = Product.objects.all()
+        if not data.get('wait'):
+            job = enqueue_job(
+                algorithm, horizon, product_ids,
+                batch_size=data.get('batch_size'),
+                parallel=data.get('parallel'),
+                ensemble_mode=data.get('ensemble_mode'),
+                reconciliation=data.get('reconciliation'),
+                granularity=data.get('granularity'),
+                disaggregate=data.get('disaggregate'),
+                fill=data.get('fill'),
+            )
+            return Response({
+                'job_id': str(job.id),
+                'status': job.status,
+                'status_url': request.build_absolute_uri(f'/api/forecast-jobs/{job.id}/'),
+            }, status=status.HTTP_202_ACCEPTED)
         
-        created_forecasts = []
-        skipped_products = []
-        
-        for product in products:
-            try:
-                # Get historical data
-                history = HistoricalDemand.objects.filter(product=product).order_by('date')
-                
-                hist_count = history.count()
-                if hist_count < 5:
-                    skipped_products.append({
-                        'product': product.name,
-                        'reason': f'Insufficient historical data ({hist_count} records, need at least 5)'
-                    })
-                    continue
-                
-                # Prepare data
-                data = list(history.values('date', 'quantity_demanded'))
-                df = pd.DataFrame(data)
-                
-                if len(df) < 5:
-                    skipped_products.append({
-                        'product': product.name,
-                        'reason': f'Insufficient data after processing ({len(df)} records)'
-                    })
-                    continue
-                
-                # Forecast
-                forecaster = DemandForecaster(df)
-                result = forecaster.forecast(algorithm=algorithm, horizon_days=horizon)
-                
-                # Save forecast - use total demand across all forecast days
-                forecast_date = timezone.now().date()
-                total_demand = float(np.sum(result['forecast']))
-                total_lower = float(np.sum(result['lower_bound']))
-                total_upper = float(np.sum(result['upper_bound']))
-                
-                forecast = Forecast.objects.create(
-                    product=product,
-                    algorithm=algorithm,
-                    forecast_date=forecast_date,
-                    predicted_demand=round(total_demand, 2),
-                    confidence_interval_lower=round(total_lower, 2),
-                    confidence_interval_upper=round(total_upper, 2),
-                    mae=float(result.get('mae', 0)),
-                    rmse=float(result.get('rmse', 0)),
-                    mape=float(result.get('mape', 0)),
-                    accuracy_score=float(result.get('accuracy', 0)),
-                    status='completed',
-                    forecast_horizon_days=horizon,
-                )
-                
-                # Save detailed forecasts
-                future_date = forecast_date
-                for i, (pred, lower, upper) in enumerate(zip(result['forecast'], result['lower_bound'], result['upper_bound'])):
-                    ForecastDetail.objects.create(
-                        forecast=forecast,
-                        forecast_date=future_date + timedelta(days=i),
-                        predicted_quantity=float(pred),
-                        lower_bound=float(lower),
-                        upper_bound=float(upper),
-                    )
-                
-                created_forecasts.append(forecast.id)
-                
-            except Exception as e:
-                logger.error(f"Forecast generation error for {product.name}: {str(e)}")
-                Forecast.objects.create(
-                    product=product,
-                    algorithm=algorithm,
-                    forecast_date=timezone.now().date(),
-                    predicted_demand=0,
-                    confidence_interval_lower=0,
-                    confidence_interval_upper=0,
-                    status='failed',
-                    error_message=str(e),
-                )
+        summary = generate_forecasts(
+            product_ids=product_ids,
+            algorithm=algorithm,
+            horizon=horizon,
+            batch_size=data.get('batch_size'),
+            parallel=data.get('parallel'),
+            ensemble_mode=data.get('ensemble_mode'),
+            reconciliation=data.get('reconciliation'),
+            granularity=data.get('granularity'),
+            disaggregate=data.get('disaggregate'),
+            fill=data.get('fill'),
+        )
+        created_forecasts = summary['created_forecasts']
+        skipped_products = summary['skipped']
         
         response_data = {
             'created_forecasts': created_forecasts,
             'total_forecasted': len(created_forecasts),
+            'persistence': summary['persistence'],
+            'model_cache': summary['model_cache'],
         }
+        if summary['hierarchy']:
+            response_data['hierarchy'] = summary['hierarchy']
         if skipped_products:
             response_data['skipped'] = skipped_products
         
@@ -153,16 +165,23 @@ class ForecastViewSet(viewsets.ModelViewSet):
         return Response(response_data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
+    def model_cache(self, request):
+        """Fitted-model cache hit/miss counters and size"""
+        cache = default_model_cache()
+        if cache is None:
+            return Response({'enabled': False})
+        return Response({'enabled': True, **cache.summary()})
+
+    @action(detail=False, methods=['get'])
+    @cached_response('accuracy_report', groups=['forecasts'])
     def accuracy_report(self, request):
-        """Get forecast accuracy metrics"""
-        forecasts = Forecast.objects.filter(status='completed')
-        
-        report = {
-            'total_forecasts': forecasts.count(),
-            'avg_accuracy': forecasts.filter(accuracy_score__isnull=False).aggregate(Avg('accuracy_score'))['accuracy_score__avg'],
-            'avg_mae': forecasts.filter(mae__isnull=False).aggregate(Avg('mae'))['mae__avg'],
-            'avg_rmse': forecasts.filter(rmse__isnull=False).aggregate(Avg('rmse'))['rmse__avg'],
-            'avg_mape': forecasts.filter(mape__isnull=False).aggregate(Avg('mape'))['mape__avg'],
-        }
-        
-        return Response(report)
\ No newline at end of file
+        """Get forecast accuracy metrics, overall and by algorithm / category / month"""
+        return Response(accuracy_report())
+
+
+class ForecastJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Pollable status / progress of queued forecast generation jobs"""
+    queryset = ForecastJob.objects.all()
+    serializer_class = ForecastJobSerializer
+    permission_classes = [AllowAny]
+    ordering_fields = ['created_at']
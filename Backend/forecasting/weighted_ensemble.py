@@ -0,0 +1,245 @@
+"""
+Accuracy-weighted ensemble with pruning of slow, low-value members.
+
+The default ensemble ("mean") averages every member with equal weight and
+fits Holt-Winters / Prophet for every product on every run. In "weighted"
+mode (FORECAST_ENSEMBLE_MODE) each product, or each category, gets member
+weights learned from the members' error on the most recent backtest fold,
+discounted by how long the member takes to fit:
+
+    score = 1 / (mae + eps) / (1 + FORECAST_ENSEMBLE_COST_PENALTY * fit_seconds)
+
+normalized to sum to 1. Members whose weight falls below
+FORECAST_ENSEMBLE_MIN_WEIGHT are pruned (the best member is always kept)
+and are not fitted at all on later runs, until the weights are recalibrated
+every FORECAST_ENSEMBLE_RECALIBRATE_DAYS. A calibration run fits the
+expensive members twice per series: once on the history minus the holdout,
+to score them, and once on the full history for the forecast itself.
+
+Weights, calibration errors, fit times and pruned members are kept in
+EnsembleWeights. With category scope, a category is calibrated on the
+products of the chunk that first finds its weights missing or stale.
+"""
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .backtest import RollingOriginBacktester
+from .ml_engine import DemandForecaster, EXPENSIVE_MEMBERS, HAS_PROPHET, HAS_STATSMODELS
+from .models import EnsembleWeights
+from .panel import PanelForecaster, PANEL_ALGORITHMS
+from .parallel import fit_expensive_models
+
+logger = logging.getLogger(__name__)
+
+ENSEMBLE_MODES = ('mean', 'weighted')
+WEIGHT_SCOPES = ('product', 'category')
+FIT_SECONDS_DECAY = 0.3  # weight of the latest run in the stored fit time average
+EPS = 1e-6
+
+
+def ensemble_settings(mode=None):
+    """Weighted-ensemble configuration; `mode` overrides FORECAST_ENSEMBLE_MODE"""
+    config = {
+        'mode': mode or getattr(settings, 'FORECAST_ENSEMBLE_MODE', 'mean'),
+        'scope': getattr(settings, 'FORECAST_ENSEMBLE_WEIGHT_SCOPE', 'product'),
+        'min_weight': getattr(settings, 'FORECAST_ENSEMBLE_MIN_WEIGHT', 0.05),
+        'cost_penalty': getattr(settings, 'FORECAST_ENSEMBLE_COST_PENALTY', 0.0),
+        'recalibrate_days': getattr(settings, 'FORECAST_ENSEMBLE_RECALIBRATE_DAYS', 7),
+    }
+    if config['mode'] not in ENSEMBLE_MODES:
+        raise ValueError(f"Ensemble mode must be one of {', '.join(ENSEMBLE_MODES)}, got '{config['mode']}'")
+    if config['scope'] not in WEIGHT_SCOPES:
+        raise ValueError(
+            f"FORECAST_ENSEMBLE_WEIGHT_SCOPE must be one of {', '.join(WEIGHT_SCOPES)}, got '{config['scope']}'")
+    return config
+
+
+def available_expensive_members():
+    """Expensive members whose libraries are installed"""
+    installed = {'holt_winters': HAS_STATSMODELS, 'prophet': HAS_PROPHET}
+    return [name for name in EXPENSIVE_MEMBERS if installed[name]]
+
+
+def learn_weights(errors, fit_seconds, min_weight, cost_penalty):
+    """
+    Member weights from holdout error and fit cost.
+
+    errors / fit_seconds: {member: holdout MAE / fit seconds per series};
+    members with no error (failed or untested) get no weight.
+    Returns (weights, pruned): weights sum to 1, pruned lists the members
+    dropped for falling below min_weight.
+    """
+    scores = {
+        name: 1 / (mae + EPS) / (1 + cost_penalty * fit_seconds.get(name, 0))
+        for name, mae in errors.items() if mae is not None
+    }
+    if not scores:
+        return {}, []
+    total = sum(scores.values())
+    best = max(scores, key=scores.get)
+    kept = {name: s for name, s in scores.items() if name == best or s / total >= min_weight}
+    total = sum(kept.values())
+    return {name: s / total for name, s in kept.items()}, sorted(set(scores) - set(kept))
+
+
+def combine(results, weights):
+    """
+    Weighted average of member forecasts and bounds.
+
+    Members without a result are left out and the rest renormalized; with
+    no weighted member available every result counts equally.
+    """
+    present = {name: w for name, w in weights.items() if results.get(name) and w > 0}
+    if not present:
+        present = {name: 1.0 for name, res in results.items() if res}
+    total = sum(present.values())
+    return {
+        field: sum(w * np.asarray(results[name][field], dtype=np.float64) for name, w in present.items()) / total
+        for field in ('forecast', 'lower_bound', 'upper_bound')
+    }
+
+
+def _fit_expensive(series, horizon, members, product_ids, pool, model_cache):
+    """Expensive member fits for many series, through the process pool or in-process"""
+    if pool is not None:
+        return fit_expensive_models(series, horizon, product_ids=product_ids,
+                                    model_cache=model_cache, members=members, pool=pool)
+    return [
+        DemandForecaster.from_arrays(dates, quantities, product_id=pid, model_cache=model_cache)
+        .fit_expensive_models(horizon, members=subset)
+        for pid, (dates, quantities), subset in zip(product_ids, series, members)
+    ]
+
+
+def _mean(values):
+    values = [v for v in values if v is not None and not np.isnan(v)]
+    return float(np.mean(values)) if values else None
+
+
+def forecast_chunk(panel, products, horizon, folds, holdout, pool=None, model_cache=None, config=None):
+    """
+    Weighted-ensemble forecasts for one chunk of products, {product_id: result}.
+
+    panel: AlignedPanel holding (at least) these products
+    pool: the run's parallel.WorkerPool; expensive members fit in-process without it
+
+    Results carry rolling-origin metrics of the weighted cheap members
+    (expensive members are not refit per fold, as in backtest), flagged
+    metrics_partial where an expensive member has weight.
+    """
+    config = config or ensemble_settings('weighted')
+    ids = [p.id for p in products]
+    keys = [str(p.id) if config['scope'] == 'product' else p.category for p in products]
+    expensive = available_expensive_members()
+
+    # Cheap members: forecasts, timing and error on the latest fold, for the whole chunk at once
+    matrix, mask, _ = panel.rows(ids)
+    forecaster = PanelForecaster(matrix, mask)
+    backtester = RollingOriginBacktester(matrix, mask, folds=folds, horizon=holdout)
+    cheap, fold_forecasts, errors, seconds = {}, {}, {}, {}
+    for name in PANEL_ALGORITHMS:
+        start = time.perf_counter()
+        cheap[name] = forecaster.forecast(algorithm=name, horizon_days=horizon)
+        seconds[name] = [(time.perf_counter() - start) / len(ids)] * len(ids)
+        fold_forecasts[name] = backtester.fold_forecasts(name)
+        errors[name] = list(backtester.latest_fold_mae(fold_forecasts[name]))
+
+    stored = {w.key: w for w in EnsembleWeights.objects.filter(scope=config['scope'], key__in=set(keys))}
+    cutoff = timezone.now() - timedelta(days=config['recalibrate_days'])
+    stale = {key for key in keys if key not in stored or stored[key].calibrated_at < cutoff}
+
+    # Holdout fits score the expensive members of series being calibrated
+    for name in expensive:
+        errors[name] = [None] * len(ids)
+        seconds[name] = [None] * len(ids)
+    tested = [
+        i for i, key in enumerate(keys)
+        if key in stale and len(backtester.origins) and backtester.fold_valid[i, 0]
+    ]
+    if expensive and tested:
+        series = [panel.series(ids[i]) for i in tested]
+        fits = _fit_expensive(
+            [(dates[:-holdout], quantities[:-holdout]) for dates, quantities in series], holdout,
+            [expensive] * len(tested), [ids[i] for i in tested], pool, model_cache)
+        for i, (_, quantities), fit in zip(tested, series, fits):
+            for name, res in fit.items():
+                if res:
+                    errors[name][i] = float(np.mean(np.abs(res['forecast'] - quantities[-holdout:])))
+                    seconds[name][i] = res['fit_seconds']
+
+    # Weights per key: learned for stale keys, stored otherwise
+    now = timezone.now()
+    rows = {}
+    for key in set(keys):
+        members = [i for i, k in enumerate(keys) if k == key]
+        fit_seconds = {name: _mean(seconds[name][i] for i in members) for name in seconds}
+        fit_seconds = {name: s for name, s in fit_seconds.items() if s is not None}
+        if key in stale:
+            key_errors = {name: _mean(errors[name][i] for i in members) for name in errors}
+            weights, pruned = learn_weights(key_errors, fit_seconds, config['min_weight'], config['cost_penalty'])
+            rows[key] = EnsembleWeights(
+                scope=config['scope'], key=key, weights=weights, errors=key_errors,
+                fit_seconds=fit_seconds, pruned=pruned, calibrated_at=now,
+            )
+        else:
+            rows[key] = stored[key]
+
+    # Production fits of the expensive members that kept a weight
+    subsets = [[name for name in expensive if rows[key].weights.get(name)] for key in keys]
+    fitted = [i for i, subset in enumerate(subsets) if subset]
+    expensive_results = [{} for _ in ids]
+    if fitted:
+        fits = _fit_expensive([panel.series(ids[i]) for i in fitted], horizon, [subsets[i] for i in fitted],
+                              [ids[i] for i in fitted], pool, model_cache)
+        for i, fit in zip(fitted, fits):
+            expensive_results[i] = fit
+    skipped = sum(len(expensive) - len(subset) for subset in subsets)
+
+    # Fold the latest fit times into stored rows so the cost term tracks reality
+    for key, row in rows.items():
+        if key in stale:
+            continue
+        row.updated_at = now
+        latest = {}
+        for name in expensive:
+            times = [expensive_results[i][name]['fit_seconds'] for i, k in enumerate(keys)
+                     if k == key and expensive_results[i].get(name)]
+            if times:
+                latest[name] = float(np.mean(times))
+        row.fit_seconds = {
+            **row.fit_seconds,
+            **{name: FIT_SECONDS_DECAY * s + (1 - FIT_SECONDS_DECAY) * row.fit_seconds.get(name, s)
+               for name, s in latest.items()},
+        }
+    # Keys without any scored member stay unsaved and are retried on the next run
+    EnsembleWeights.objects.bulk_create(
+        [row for key, row in rows.items() if key in stale and row.weights],
+        update_conflicts=True, unique_fields=['scope', 'key'],
+        update_fields=['weights', 'errors', 'fit_seconds', 'pruned', 'calibrated_at', 'updated_at'],
+    )
+    EnsembleWeights.objects.bulk_update(
+        [row for key, row in rows.items() if key not in stale], ['fit_seconds', 'updated_at'])
+
+    # Metrics of the weighted cheap members over every backtest fold
+    cheap_weights = np.array([[rows[key].weights.get(name, 0.0) for name in PANEL_ALGORITHMS] for key in keys])
+    cheap_weights[cheap_weights.sum(axis=1) == 0] = 1.0
+    cheap_weights /= cheap_weights.sum(axis=1, keepdims=True)
+    combined_folds = np.einsum('sa,asfh->sfh', cheap_weights,
+                               np.stack([fold_forecasts[name] for name in PANEL_ALGORITHMS]))
+    metrics = backtester.metrics(scores=backtester.score(combined_folds))
+
+    results = {}
+    for i, (pid, key) in enumerate(zip(ids, keys)):
+        members = {name: cheap[name][i] for name in PANEL_ALGORITHMS}
+        members.update(expensive_results[i])
+        partial = any(rows[key].weights.get(name) for name in expensive)
+        results[pid] = {**combine(members, rows[key].weights), **metrics[i], 'metrics_partial': partial}
+
+    logger.info(f"Weighted ensemble: {len(ids)} products, {len(stale)} {config['scope']} weights calibrated, "
+                f"{skipped} expensive fits pruned")
+    return results
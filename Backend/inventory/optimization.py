@@ -0,0 +1,143 @@
+"""
+Set-based inventory optimization.
+
+Fetches every InventoryLevel with its product's lead time in one query and
+the latest completed forecast of those products in one window query, joins
+them in Python, computes the new stock levels as NumPy arrays and writes
+them back with chunked bulk_update.
+
+Safety stock comes from the forecast's stored lead-time demand quantiles
+(forecasting.quantiles) at the requested service level. Forecasts without
+quantiles fall back to the upper confidence bound.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from forecasting import response_cache
+from forecasting.models import Forecast
+from forecasting.quantiles import service_level_quantile
+from .models import InventoryLevel
+
+OPTIMIZE_BATCH_SIZE = 1000
+DEFAULT_SERVICE_LEVEL = 0.95
+OPTIMIZED_FIELDS = ['safety_stock', 'minimum_stock_level', 'maximum_stock_level', 'reorder_quantity', 'updated_at']
+
+
+def latest_forecasts(inventories):
+    """
+    {product_id: (predicted_demand, confidence_interval_upper, quantiles)} of
+    the latest completed forecast of each product in `inventories`
+    """
+    ranked = (
+        Forecast.objects
+        .filter(status='completed', product_id__in=inventories.values('product_id'))
+        .annotate(rank=Window(
+            RowNumber(), partition_by=[F('product_id')],
+            order_by=[F('forecast_date').desc(), F('created_at').desc()],
+        ))
+        .filter(rank=1)
+        .values_list('product_id', 'predicted_demand', 'confidence_interval_upper', 'quantiles')
+    )
+    return {pid: (demand, upper, quantiles) for pid, demand, upper, quantiles in ranked}
+
+
+def service_level_setting():
+    return getattr(settings, 'INVENTORY_SERVICE_LEVEL', DEFAULT_SERVICE_LEVEL)
+
+
+def quantile_safety_stock(quantiles, lead_time, service_level):
+    """
+    Safety stock from stored lead-time quantiles: the service-level quantile
+    minus the mean. A lead time changed since the forecast scales the margin
+    by sqrt(new / old). None when the forecast has no quantiles.
+    """
+    if not quantiles:
+        return None
+    margin = max(service_level_quantile(quantiles, service_level) - quantiles['mean'], 0)
+    return margin * np.sqrt(lead_time / quantiles['lead_time_days'])
+
+
+def optimize_inventory(product_ids=None, category=None, batch_size=OPTIMIZE_BATCH_SIZE, service_level=None):
+    """
+    Recompute safety / min / max / reorder levels from the latest forecasts.
+
+    product_ids / category: optional filters for a partial re-optimization.
+    service_level: target probability of covering lead-time demand
+    (INVENTORY_SERVICE_LEVEL by default).
+    Returns the per-product optimization records.
+    """
+    service_level = service_level_setting() if service_level is None else service_level
+    inventories = InventoryLevel.objects.all()
+    if product_ids:
+        inventories = inventories.filter(product_id__in=product_ids)
+    if category:
+        inventories = inventories.filter(product__category=category)
+
+    forecasts = latest_forecasts(inventories)
+    rows = [
+        (inventory_id, pid, name, lead_time) + forecasts[pid]
+        for inventory_id, pid, name, lead_time in inventories.values_list(
+            'id', 'product_id', 'product__name', 'product__lead_time_days')
+        if pid in forecasts
+    ]
+    if not rows:
+        return []
+
+    ids, product_ids, names, lead_time, daily_demand, upper, quantiles = zip(*rows)
+    lead_time = np.array(lead_time, dtype=np.float64)
+    daily_demand = np.array(daily_demand, dtype=np.float64)
+    upper = np.array(upper, dtype=np.float64)
+
+    # Service-level quantile of lead-time demand where the forecast stored one
+    quantile_stock = np.array([
+        quantile_safety_stock(q, lt, service_level) for q, lt in zip(quantiles, lead_time)
+    ], dtype=np.float64)  # None -> NaN
+    from_quantiles = ~np.isnan(quantile_stock)
+
+    # Fallback: upper confidence interval
+    safety_stock = np.where(
+        from_quantiles,
+        np.ceil(np.nan_to_num(quantile_stock)),
+        np.maximum(np.trunc(upper), np.trunc(daily_demand * 2)),
+    ).astype(np.int64)
+
+    # Minimum stock = (daily_demand * lead_time) + safety_stock
+    minimum_stock = np.trunc(daily_demand * lead_time).astype(np.int64) + safety_stock
+
+    # Maximum stock = minimum_stock + (reorder_quantity * 2)
+    reorder_quantity = np.trunc(daily_demand * 30).astype(np.int64)  # 30 days of demand
+    maximum_stock = minimum_stock + reorder_quantity * 2
+
+    now = timezone.now()
+    updates = [
+        InventoryLevel(
+            id=ids[i],
+            safety_stock=int(safety_stock[i]),
+            minimum_stock_level=int(minimum_stock[i]),
+            maximum_stock_level=int(maximum_stock[i]),
+            reorder_quantity=int(reorder_quantity[i]),
+            updated_at=now,
+        )
+        for i in range(len(ids))
+    ]
+    for start in range(0, len(updates), batch_size):
+        with transaction.atomic():
+            InventoryLevel.objects.bulk_update(updates[start:start + batch_size], OPTIMIZED_FIELDS)
+    response_cache.invalidate('inventory')
+
+    return [
+        {
+            'product_id': str(product_ids[i]),
+            'product_name': names[i],
+            'new_minimum_stock': int(minimum_stock[i]),
+            'new_maximum_stock': int(maximum_stock[i]),
+            'new_safety_stock': int(safety_stock[i]),
+            'new_reorder_quantity': int(reorder_quantity[i]),
+            'safety_stock_method': 'service_level_quantile' if from_quantiles[i] else 'upper_bound',
+        }
+        for i in range(len(ids))
+    ]
@@ -0,0 +1,20 @@
+"""
+Drop cached inventory responses (low stock alert) when stock data changes.
+
+Bulk updates don't send signals; optimization.optimize_inventory calls
+response_cache.invalidate directly.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from forecasting import response_cache
+from .models import InventoryLevel, StockMovement
+
+
+@receiver(post_save, sender=InventoryLevel)
+@receiver(post_delete, sender=InventoryLevel)
+@receiver(post_save, sender=StockMovement)
+@receiver(post_delete, sender=StockMovement)
+def inventory_changed(sender, raw=False, **kwargs):
+    if not raw:
+        response_cache.invalidate('inventory')
@@ -1,3 +1,93 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from forecasting.models import Product, Forecast
+from .models import InventoryLevel
+from .optimization import optimize_inventory
+
+
+class OptimizeInventoryTests(TestCase):
+    """Stock levels come from each product's latest completed forecast in a fixed number of queries"""
+
+    created = 0
+
+    def add_products(self, n, category='Test', demand=2.0, quantiles=None):
+        products = []
+        today = date.today()
+        for i in range(self.created, self.created + n):
+            product = Product.objects.create(name=f'Product {i}', sku=f'SKU-{i}', category=category,
+                                             current_price=Decimal('1.00'), lead_time_days=5)
+            InventoryLevel.objects.create(product=product, current_stock=10, minimum_stock_level=0,
+                                          maximum_stock_level=0, safety_stock=0, reorder_quantity=0,
+                                          holding_cost_per_unit=Decimal('1.00'))
+            # Older and failed forecasts must be ignored
+            for forecast_date, forecast_status, predicted in ((today - timedelta(days=7), 'completed', 99),
+                                                              (today, 'failed', 99),
+                                                              (today, 'completed', demand)):
+                Forecast.objects.create(product=product, algorithm='moving_avg', forecast_date=forecast_date,
+                                        predicted_demand=predicted, confidence_interval_lower=0,
+                                        confidence_interval_upper=predicted * 1.5, status=forecast_status,
+                                        quantiles=quantiles if forecast_status == 'completed' else None)
+            products.append(product)
+        self.created += n
+        return products
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            optimize_inventory()
+        return len(queries)
+
+    def test_query_count_does_not_grow(self):
+        self.add_products(2)
+        small = self.count_queries()
+        self.add_products(20)
+        self.assertEqual(self.count_queries(), small)
+
+    def test_levels_from_latest_forecast(self):
+        quantiles = {'lead_time_days': 5, 'mean': 10.0, 'levels': {'0.9': 14.0, '0.99': 20.0}}
+        upper, = self.add_products(1, demand=2.0)
+        quantile, = self.add_products(1, demand=2.0, quantiles=quantiles)
+        Product.objects.create(name='No forecast', sku='SKU-N', category='Test',
+                               current_price=Decimal('1.00'), lead_time_days=5)
+
+        results = {r['product_id']: r for r in optimize_inventory(service_level=0.9)}
+        self.assertEqual(len(results), 2)
+        by_upper = results[str(upper.id)]
+        self.assertEqual(by_upper['safety_stock_method'], 'upper_bound')
+        self.assertEqual((by_upper['new_safety_stock'], by_upper['new_minimum_stock']), (4, 14))
+        self.assertEqual(by_upper['new_reorder_quantity'], 60)
+        by_quantile = results[str(quantile.id)]
+        self.assertEqual(by_quantile['safety_stock_method'], 'service_level_quantile')
+        self.assertEqual(by_quantile['new_safety_stock'], 4)
+        self.assertEqual(InventoryLevel.objects.get(product=upper).minimum_stock_level, 14)
+
+    def test_filters(self):
+        first, second = self.add_products(2, category='A')
+        other, = self.add_products(1, category='B')
+
+        self.assertEqual([r['product_id'] for r in optimize_inventory(product_ids=[first.id])], [str(first.id)])
+        self.assertEqual([r['product_id'] for r in optimize_inventory(category='B')], [str(other.id)])
+        self.assertEqual(optimize_inventory(product_ids=[first.id], category='B'), [])
+        self.assertEqual(InventoryLevel.objects.get(product=second).minimum_stock_level, 0)
+
+    def test_endpoint_rejects_invalid_input(self):
+        from rest_framework.test import APIClient
+
+        product, = self.add_products(1)
+        client = APIClient()
+        for body in ({'product_ids': ['not-a-uuid']}, {'product_ids': [1]}, {'service_level': 0},
+                     {'service_level': 1}, {'service_level': 'high'}):
+            response = client.post('/api/inventory/optimize/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+        response = client.post('/api/inventory/optimize/?product_ids=nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(InventoryLevel.objects.get(product=product).minimum_stock_level, 0)
 
-# Create your tests here.
+        response = client.post('/api/inventory/optimize/', {'product_ids': [str(product.id)], 'service_level': 0.9},
+                               format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['optimized_count'], 1)
@@ -2,21 +2,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+import uuid
 from django.db.models import F
 from forecasting.models import Forecast
+from forecasting.pagination import KeysetPagination
+from forecasting.response_cache import cached_response
 from .models import InventoryLevel, StockMovement
 from .serializers import InventoryLevelSerializer, StockMovementSerializer
+from .optimization import optimize_inventory
 
 class InventoryLevelViewSet(viewsets.ModelViewSet):
-    queryset = InventoryLevel.objects.all()
+    queryset = InventoryLevel.objects.select_related('product')
     serializer_class = InventoryLevelSerializer
     permission_classes = [AllowAny]
 
 
     @action(detail=False, methods=['get'])
+    @cached_response('low_stock_alert', groups=['inventory'])
     def low_stock_alert(self, request):
         """Get products below minimum stock level"""
-        low_stock = InventoryLevel.objects.filter(
+        low_stock = self.get_queryset().filter(
             current_stock__lte=F('minimum_stock_level')
         )
         serializer = self.get_serializer(low_stock, many=True)
@@ -24,52 +29,37 @@ class InventoryLevelViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def optimize(self, request):
-        """Optimize inventory levels based on forecasts"""
-        from datetime import timedelta
-        from django.utils import timezone
-        
-        optimizations = []
+        """
+        Optimize inventory levels based on forecasts
+
+        Optional product_ids / category (body or query string) limit the
+        re-optimization to a subset of products; optional service_level
+        (0-1) overrides INVENTORY_SERVICE_LEVEL.
+        """
+        product_ids = request.data.get('product_ids') or request.query_params.getlist('product_ids')
+        if isinstance(product_ids, str):
+            product_ids = [product_ids]
+        try:
+            product_ids = [uuid.UUID(str(pid)) for pid in product_ids or []]
+        except (TypeError, ValueError):
+            return Response({'error': 'product_ids must be a list of product UUIDs'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        category = request.data.get('category') or request.query_params.get('category')
+        # 0 is a value to reject, not a missing one
+        service_level = request.data.get('service_level')
+        if service_level is None:
+            service_level = request.query_params.get('service_level')
+        if service_level is not None:
+            try:
+                service_level = float(service_level)
+            except (TypeError, ValueError):
+                service_level = None
+            if service_level is None or not 0 < service_level < 1:
+                return Response({'error': 'service_level must be a number between 0 and 1'},
+                                status=status.HTTP_400_BAD_REQUEST)
         
-        for inventory in InventoryLevel.objects.all():
-            # Get latest forecast for product
-            latest_forecast = Forecast.objects.filter(
-                product=inventory.product,
-                status='completed'
-            ).order_by('-forecast_date').first()
-            
-            if not latest_forecast:
-                continue
-            
-            # Calculate reorder quantities
-            lead_time = inventory.product.lead_time_days
-            daily_demand = latest_forecast.predicted_demand
-            
-            # Safety stock = Z-score * std_dev * sqrt(lead_time)
-            # Simplified: use upper confidence interval
-            safety_stock = max(int(latest_forecast.confidence_interval_upper), int(daily_demand * 2))
-            
-            # Minimum stock = (daily_demand * lead_time) + safety_stock
-            minimum_stock = int(daily_demand * lead_time) + safety_stock
-            
-            # Maximum stock = minimum_stock + (reorder_quantity * 2)
-            reorder_quantity = int(daily_demand * 30)  # 30 days of demand
-            maximum_stock = minimum_stock + (reorder_quantity * 2)
-            
-            # Update inventory
-            inventory.safety_stock = safety_stock
-            inventory.minimum_stock_level = minimum_stock
-            inventory.maximum_stock_level = maximum_stock
-            inventory.reorder_quantity = reorder_quantity
-            inventory.save()
-            
-            optimizations.append({
-                'product_id': str(inventory.product.id),
-                'product_name': inventory.product.name,
-                'new_minimum_stock': minimum_stock,
-                'new_maximum_stock': maximum_stock,
-                'new_safety_stock': safety_stock,
-                'new_reorder_quantity': reorder_quantity,
-            })
+        optimizations = optimize_inventory(product_ids=product_ids or None, category=category,
+                                           service_level=service_level)
         
         return Response({
             'optimized_count': len(optimizations),
@@ -79,4 +69,7 @@ class StockMovementViewSet(viewsets.ModelViewSet):
     queryset = StockMovement.objects.all()
     serializer_class = StockMovementSerializer
     permission_classes = [AllowAny]
-    ordering_fields = ['created_at']
\ No newline at end of file
+    ordering_fields = ['created_at']
+    pagination_class = KeysetPagination
+    # ?pagination=cursor pages along the (inventory, created_at) index
+    keyset_ordering = ('inventory', 'created_at')
\ No newline at end of file
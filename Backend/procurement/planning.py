@@ -0,0 +1,100 @@
+"""
+Batched procurement planning from today's forecasts.
+
+Forecasts are loaded together with their product and inventory in one
+query, suppliers are picked from an in-memory index and orders are written
+with bulk_create.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from forecasting.models import Forecast
+from .models import Supplier, ProcurementOrder
+
+ORDER_BATCH_SIZE = 1000
+
+
+class SupplierIndex:
+    """
+    Suppliers sorted by lead time, answering "most reliable supplier that can
+    deliver within N days" for many products at once.
+    """
+
+    def __init__(self, suppliers):
+        suppliers = sorted(suppliers, key=lambda s: (s.average_lead_time_days, -s.reliability_score))
+        self.suppliers = suppliers
+        self.lead_times = np.array([s.average_lead_time_days for s in suppliers])
+        reliability = np.array([s.reliability_score for s in suppliers], dtype=np.float64)
+        # best[i] = index of the most reliable supplier among the i+1 fastest
+        best = np.zeros(len(suppliers), dtype=np.int64)
+        for i in range(1, len(suppliers)):
+            best[i] = i if reliability[i] > reliability[best[i - 1]] else best[i - 1]
+        self.best = best
+
+    def __bool__(self):
+        return bool(self.suppliers)
+
+    def pick(self, max_lead_times):
+        """
+        Supplier index per product: the most reliable one delivering within the
+        product's lead time, else the fastest supplier.
+        """
+        pos = np.searchsorted(self.lead_times, np.asarray(max_lead_times), side='right') - 1
+        return np.where(pos >= 0, self.best[np.maximum(pos, 0)], 0)
+
+
+def plan_orders(forecast_date=None, batch_size=ORDER_BATCH_SIZE):
+    """Create pending orders for products whose projected stock falls to the reorder point"""
+    today = timezone.now().date()
+    forecast_date = forecast_date or today
+
+    rows = list(
+        Forecast.objects.filter(
+            status='completed',
+            forecast_date=forecast_date,
+            product__inventory_level__isnull=False,
+        ).values_list(
+            'id', 'product_id', 'predicted_demand', 'product__current_price', 'product__lead_time_days',
+            'product__inventory_level__current_stock',
+            'product__inventory_level__minimum_stock_level',
+            'product__inventory_level__reorder_quantity',
+        )
+    )
+    index = SupplierIndex(Supplier.objects.all())
+    if not rows or not index:
+        return []
+
+    forecast_ids, product_ids, demand, price, lead_time, stock, minimum, reorder = zip(*rows)
+    # Check if reordering is needed
+    projected_stock = np.array(stock, dtype=np.float64) - np.array(demand, dtype=np.float64)
+    reorder = np.array(reorder, dtype=np.int64)
+    needed = np.flatnonzero((projected_stock <= np.array(minimum)) & (reorder > 0))
+    if not len(needed):
+        return []
+
+    choice = index.pick(np.array(lead_time)[needed])
+    orders = []
+    for i, s in zip(needed, choice):
+        supplier = index.suppliers[s]
+        quantity = int(reorder[i])
+        unit_cost = Decimal(str(price[i]))
+        orders.append(ProcurementOrder(
+            product_id=product_ids[i],
+            supplier=supplier,
+            quantity=quantity,
+            unit_cost=unit_cost,
+            # bulk_create skips ProcurementOrder.save(), so compute it here
+            total_cost=quantity * unit_cost,
+            expected_delivery_date=today + timedelta(days=supplier.average_lead_time_days),
+            status='pending',
+            forecast_id=str(forecast_ids[i]),
+        ))
+
+    for start in range(0, len(orders), batch_size):
+        with transaction.atomic():
+            ProcurementOrder.objects.bulk_create(orders[start:start + batch_size])
+    return orders
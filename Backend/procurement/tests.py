@@ -1,3 +1,73 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from forecasting.models import Product, Forecast
+from inventory.models import InventoryLevel
+from .models import Supplier, ProcurementOrder
+from .planning import SupplierIndex, plan_orders
+
+
+def supplier(name, lead_time, reliability):
+    return Supplier.objects.create(name=name, contact_email=f'{name.lower()}@example.com', contact_phone='1',
+                                   location='Here', average_lead_time_days=lead_time,
+                                   reliability_score=reliability)
+
+
+class PlanOrdersTests(TestCase):
+    """Orders go to the most reliable supplier within the lead time, in bulk"""
+
+    def setUp(self):
+        self.slow = supplier('Slow', 10, 0.99)
+        self.fast = supplier('Fast', 2, 0.80)
+        self.mid = supplier('Mid', 5, 0.95)
+        self.created = 0
+
+    def add_product(self, lead_time, stock=5, minimum=10, reorder=40, demand=20.0, price='2.50'):
+        product = Product.objects.create(name=f'Product {self.created}', sku=f'SKU-{self.created}',
+                                         category='Test', current_price=Decimal(price), lead_time_days=lead_time)
+        self.created += 1
+        InventoryLevel.objects.create(product=product, current_stock=stock, minimum_stock_level=minimum,
+                                      maximum_stock_level=100, safety_stock=0, reorder_quantity=reorder,
+                                      holding_cost_per_unit=Decimal('1.00'))
+        Forecast.objects.create(product=product, algorithm='moving_avg', forecast_date=date.today(),
+                                predicted_demand=demand, confidence_interval_lower=0,
+                                confidence_interval_upper=demand, status='completed')
+        return product
+
+    def test_supplier_index(self):
+        index = SupplierIndex(Supplier.objects.all())
+        picked = [index.suppliers[i].name for i in index.pick([1, 2, 6, 30])]
+        # Nobody delivers in a day: the fastest supplier is used
+        self.assertEqual(picked, ['Fast', 'Fast', 'Mid', 'Slow'])
+
+    def test_orders_and_total_cost(self):
+        urgent = self.add_product(lead_time=3)
+        relaxed = self.add_product(lead_time=14, reorder=7, price='1.10')
+        self.add_product(lead_time=3, stock=100)  # enough stock
+        self.add_product(lead_time=3, reorder=0)  # never reordered
+
+        with CaptureQueriesContext(connection) as queries:
+            orders = plan_orders()
+        # Forecasts and suppliers, then a single INSERT (in a savepoint) for all orders
+        self.assertLessEqual(len(queries), 5)
+        self.assertEqual(len(orders), 2)
+
+        by_product = {o.product_id: o for o in ProcurementOrder.objects.all()}
+        self.assertEqual(set(by_product), {urgent.id, relaxed.id})
+        order = by_product[urgent.id]
+        self.assertEqual((order.supplier_id, order.quantity, order.status), (self.fast.id, 40, 'pending'))
+        self.assertEqual(order.total_cost, Decimal('100.00'))
+        self.assertEqual(order.expected_delivery_date, date.today() + timedelta(days=2))
+        order = by_product[relaxed.id]
+        self.assertEqual(order.supplier_id, self.slow.id)
+        self.assertEqual(order.total_cost, Decimal('7.70'))
 
-# Create your tests here.
+    def test_nothing_to_plan(self):
+        self.assertEqual(plan_orders(), [])
+        self.add_product(lead_time=3)
+        Supplier.objects.all().delete()
+        self.assertEqual(plan_orders(), [])
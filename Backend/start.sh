@@ -7,5 +7,8 @@ python manage.py migrate --noinput
 echo "Seeding historical data..."
 python manage.py seed_historical_data --days 90 || echo "Seeding skipped (may already exist)"
 
+echo "Starting forecast worker..."
+python manage.py run_forecast_worker &
+
 echo "Starting server..."
 exec gunicorn --bind 0.0.0.0:$PORT config.wsgi:application
@@ -32,7 +32,7 @@ export default function History() {
   useEffect(() => {
     async function loadHistory() {
       try {
-        const data = await apiFetch("/forecasts/");
+        const data = await apiFetch("/forecasts/?view=summary");
         const results = Array.isArray(data) ? data : data.results || [];
         setHistory(results);
       } catch (error) {
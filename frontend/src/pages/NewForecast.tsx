@@ -39,6 +39,29 @@ const scenarios = [
   { value: "promotional", label: "Promotional Period" },
 ];
 
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_MAX_INTERVAL_MS = 10000;
+const JOB_MAX_WAIT_MS = 5 * 60 * 1000;
+
+// The job outlived the wait; it keeps running on the worker
+class JobStillRunningError extends Error {}
+
+// Poll a queued forecast job until the worker has finished it, backing off between polls
+async function waitForJob(jobId: string) {
+  const deadline = Date.now() + JOB_MAX_WAIT_MS;
+  let interval = JOB_POLL_INTERVAL_MS;
+  while (true) {
+    const job = await apiFetch(`/forecast-jobs/${jobId}/`);
+    if (job.status === "completed") return job;
+    if (job.status === "failed") throw new Error(job.error_message || "Forecast job failed");
+    if (Date.now() + interval > deadline) {
+      throw new JobStillRunningError("Forecast is still running. Check History for the results.");
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+    interval = Math.min(interval * 2, JOB_POLL_MAX_INTERVAL_MS);
+  }
+}
+
 export default function NewForecast() {
   const navigate = useNavigate();
   const [isLoading, setIsLoading] = useState(false);
@@ -79,7 +102,7 @@ export default function NewForecast() {
     setIsLoading(true);
 
     try {
-      const response = await apiFetch("/forecasts/generate/", {
+      const { job_id } = await apiFetch("/forecasts/generate/", {
         method: "POST",
         body: JSON.stringify({
           algorithm: "ensemble",
@@ -87,10 +110,27 @@ export default function NewForecast() {
           product_ids: [formData.materialId],
         }),
       });
+      const job = await waitForJob(job_id);
+      if (!job.result?.total_forecasted) {
+        const reasons = (job.skipped || []).map((s: any) => `${s.product}: ${s.reason}`).join("; ");
+        throw new Error(reasons || "No forecast was generated");
+      }
+
+      const data = await apiFetch(`/forecasts/?job=${job_id}&view=summary`);
+      const forecasts = Array.isArray(data) ? data : data.results || [];
+      const response = {
+        ...job.result,
+        created_forecasts: forecasts.filter((f: any) => f.status === "completed").map((f: any) => f.id),
+        skipped: job.skipped,
+      };
 
       toast.success(`Forecast generated! Created ${response.total_forecasted} forecasts.`);
       navigate("/results", { state: { formData, result: response } });
     } catch (error: any) {
+      if (error instanceof JobStillRunningError) {
+        toast.info(error.message, { action: { label: "History", onClick: () => navigate("/history") } });
+        return;
+      }
       console.error("Forecast generation failed:", error);
       toast.error(error.message || "Failed to generate forecast");
     } finally {